@@ -0,0 +1,222 @@
+import hashlib
+import json
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .images import absolute_urls
+from .metrics import record_cache
+from .profiling import span
+from .serializers import RecipeSerializer
+from .viewer_state import ViewerState
+
+RECIPE_COUNT_NAMESPACE = 'recipes:count'
+
+
+def user_count_namespace(user_id):
+    """Пространство количеств с фильтрами по избранному и корзине."""
+
+    return f'{RECIPE_COUNT_NAMESPACE}:user:{user_id}'
+
+
+def catalog_namespace(model):
+    """Пространство версии справочника (теги, ингредиенты)."""
+
+    return f'catalog:{model._meta.label_lower}'
+
+
+def version_key(namespace):
+    """Ключ, под которым хранится текущая версия пространства кэша."""
+
+    return f'{namespace}:version'
+
+
+def get_version(namespace):
+    """Возвращает текущую версию пространства кэша.
+
+    Версия входит в ключи записей, поэтому ее увеличение мгновенно
+    делает все старые записи пространства недоступными.
+    """
+
+    return cache.get_or_set(version_key(namespace), 1, timeout=None)
+
+
+def get_modified(namespace):
+    """Время (unix, в секундах) последнего изменения пространства кэша."""
+
+    return cache.get_or_set(
+        f'{namespace}:modified', lambda: int(time.time()), timeout=None
+    )
+
+
+def bump_version(namespace):
+    """Увеличивает версию пространства кэша (инвалидация всех записей)."""
+
+    key = version_key(namespace)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 2, timeout=None)
+    cache.set(f'{namespace}:modified', int(time.time()), timeout=None)
+
+
+class RecipeCache:
+    """Кэш независимой от пользователя части ответов с рецептами.
+
+    Хранит представление каждого рецепта (RecipeSerializer с флагами
+    анонима и относительными URL изображений) и состав страниц списка:
+    id рецептов и обертку пагинации. При ответе поверх кэша
+    накладываются флаги текущего пользователя из ViewerState и
+    абсолютные URL изображений.
+
+    Записи рецептов удаляются точечно при изменении рецепта, его
+    ингредиентов, тегов или автора, а страницы списка и все записи
+    сразу — через версии пространств (см. api.signals).
+    """
+
+    payload_namespace = 'recipes:payload'
+    list_namespace = 'recipes:list'
+    viewer_filter_params = ('is_favorited', 'is_in_shopping_cart')
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def timeout(self):
+        return settings.RECIPE_CACHE_TIMEOUT
+
+    @property
+    def enabled(self):
+        return self.timeout != 0
+
+    def stats(self):
+        """Счетчики попаданий и промахов в текущем процессе."""
+
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': self.hits / total if total else 0.0,
+        }
+
+    def _count(self, hits, misses):
+        self.hits += hits
+        self.misses += misses
+        record_cache('recipes', hits, misses)
+
+    def _payload_keys(self, ids):
+        version = get_version(self.payload_namespace)
+        return {
+            recipe_id: f'{self.payload_namespace}:{version}:{recipe_id}'
+            for recipe_id in ids
+        }
+
+    def list_key(self, request):
+        """Ключ страницы списка или None, если выборка зависит от юзера."""
+
+        params = request.query_params
+        if request.user.is_authenticated and any(
+            params.get(name) for name in self.viewer_filter_params
+        ):
+            return None
+        query = sorted(
+            (name, sorted(params.getlist(name))) for name in params
+        )
+        digest = hashlib.md5(json.dumps(
+            [request.get_host(), request.path, query]
+        ).encode()).hexdigest()
+        version = get_version(self.list_namespace)
+        return f'{self.list_namespace}:{version}:{digest}'
+
+    def get_list(self, key):
+        """Возвращает (обертка пагинации, id рецептов) или None."""
+
+        entry = cache.get(key)
+        self._count(entry is not None, entry is None)
+        return entry
+
+    def set_list(self, key, envelope, ids):
+        cache.set(key, (envelope, ids), self.timeout)
+
+    def serialize(self, recipes):
+        """Сериализует рецепты без данных пользователя и кладет в кэш."""
+
+        serializer = RecipeSerializer(
+            recipes, many=True, context={'viewer_state': ViewerState()}
+        )
+        with span('serialize'):
+            payloads = [dict(payload) for payload in serializer.data]
+        keys = self._payload_keys(payload['id'] for payload in payloads)
+        cache.set_many(
+            {keys[payload['id']]: payload for payload in payloads},
+            self.timeout
+        )
+        return payloads
+
+    def get_payloads(self, ids, loader):
+        """Возвращает представления рецептов в порядке ids.
+
+        Отсутствующие в кэше рецепты загружаются одним вызовом loader
+        со списком id. Рецепты, которых уже нет в базе, пропускаются.
+        """
+
+        keys = self._payload_keys(ids)
+        found = cache.get_many(keys.values())
+        missing = [
+            recipe_id for recipe_id, key in keys.items() if key not in found
+        ]
+        self._count(len(keys) - len(missing), len(missing))
+        payloads = {
+            recipe_id: found[key]
+            for recipe_id, key in keys.items() if key in found
+        }
+        if missing:
+            for payload in self.serialize(loader(missing)):
+                payloads[payload['id']] = payload
+        return [
+            payloads[recipe_id] for recipe_id in ids if recipe_id in payloads
+        ]
+
+    def overlay(self, payload, request, viewer_state):
+        """Добавляет к представлению данные, зависящие от запроса."""
+
+        data = dict(payload)
+        author = data['author'] = dict(payload['author'])
+        data['is_favorited'] = data['id'] in viewer_state.favorite_ids
+        data['is_in_shopping_cart'] = data['id'] in viewer_state.cart_ids
+        author['is_subscribed'] = (
+            author['id'] in viewer_state.subscribed_author_ids
+        )
+        if request is not None:
+            if data['image']:
+                data['image'] = request.build_absolute_uri(data['image'])
+            if data.get('image_variants'):
+                data['image_variants'] = absolute_urls(
+                    request, data['image_variants']
+                )
+            if author['avatar']:
+                author['avatar'] = request.build_absolute_uri(
+                    author['avatar']
+                )
+            if author.get('avatar_variants'):
+                author['avatar_variants'] = absolute_urls(
+                    request, author['avatar_variants']
+                )
+        return data
+
+    def invalidate(self, ids):
+        """Удаляет представления указанных рецептов."""
+
+        cache.delete_many(list(self._payload_keys(ids).values()))
+
+    def invalidate_lists(self):
+        bump_version(self.list_namespace)
+
+    def invalidate_all(self):
+        bump_version(self.payload_namespace)
+        bump_version(self.list_namespace)
+
+
+recipe_cache = RecipeCache()
@@ -0,0 +1,131 @@
+import hashlib
+import threading
+from collections import namedtuple
+
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+from tags.models import Tag
+
+from .cache import catalog_namespace, get_modified, get_version
+from .metrics import record_cache
+from .profiling import span
+from .renderers import ORJSONRenderer
+from .serializers import TagSerializer
+
+# Неизменяемое состояние справочника одной версии; etag — ETag all.
+Snapshot = namedtuple(
+    'Snapshot', ['version', 'last_modified', 'fragments', 'all', 'etag']
+)
+
+
+def content_etag(content):
+    return quote_etag(hashlib.md5(content).hexdigest())
+
+
+class CatalogSnapshot:
+    """Заранее сериализованный справочник (теги, ингредиенты).
+
+    Список один раз рендерится в JSON-байты и отдается без
+    сериализаторов, с ETag по хэшу содержимого и Last-Modified
+    по времени последнего изменения справочника. На If-None-Match
+    и If-Modified-Since отвечает 304. ETag всего списка считается
+    при сборке снимка, на запросе хэшируются только выборки.
+
+    Снимок перестраивается лениво, когда меняется версия справочника
+    в кэше (см. api.signals). Чтобы изменения были видны во всех
+    воркерах и после manage.py, кэш должен быть общим (CACHE_BACKEND,
+    проверка api.E001 в check --deploy).
+
+    Все данные снимка собираются в локальных переменных и публикуются
+    одним присваиванием self.snapshot; читатели берут его один раз
+    и не видят смеси старой и новой версий.
+    """
+
+    renderer = ORJSONRenderer()
+    content_type = 'application/json'
+    snapshot_class = Snapshot
+
+    def __init__(self, model, serializer_class):
+        self.model = model
+        self.serializer_class = serializer_class
+        self.namespace = catalog_namespace(model)
+        self.snapshot = self.snapshot_class(
+            version=None, last_modified=None, fragments=(), all=b'[]',
+            etag=content_etag(b'[]'), **self.build_extra([], ()),
+        )
+        self.lock = threading.Lock()
+
+    def load(self):
+        return self.model.objects.order_by('pk')
+
+    def build_extra(self, objects, fragments):
+        """Дополнительные поля снимка в наследниках."""
+
+        return {}
+
+    def build(self, version):
+        """Загружает справочник одним запросом и рендерит фрагменты."""
+
+        objects = list(self.load())
+        with span('serialize'):
+            fragments = tuple(
+                self.renderer.render(item)
+                for item in self.serializer_class(objects, many=True).data
+            )
+        content = self.join(fragments, range(len(fragments)))
+        return self.snapshot_class(
+            version=version,
+            last_modified=get_modified(self.namespace),
+            fragments=fragments,
+            all=content,
+            etag=content_etag(content),
+            **self.build_extra(objects, fragments),
+        )
+
+    def ensure_fresh(self):
+        """Возвращает снимок текущей версии, при необходимости строит."""
+
+        version = get_version(self.namespace)
+        snapshot = self.snapshot
+        if version == snapshot.version:
+            record_cache(self.namespace, hits=1)
+            return snapshot
+        record_cache(self.namespace, misses=1)
+        with self.lock:
+            snapshot = self.snapshot
+            if version != snapshot.version:
+                snapshot = self.snapshot = self.build(version)
+        return snapshot
+
+    @staticmethod
+    def join(fragments, positions):
+        return b'[' + b','.join(fragments[i] for i in positions) + b']'
+
+    def select(self, snapshot, query):
+        """Содержимое ответа на запрос query; по умолчанию весь список."""
+
+        return snapshot.all
+
+    def response(self, request, query=None):
+        """Ответ на query из одного снимка, с валидаторами."""
+
+        snapshot = self.ensure_fresh()
+        content = self.select(snapshot, query)
+        if content is snapshot.all:
+            etag = snapshot.etag
+        else:
+            etag = content_etag(content)
+        response = get_conditional_response(
+            request, etag=etag, last_modified=snapshot.last_modified
+        )
+        if response is None:
+            response = HttpResponse(content, content_type=self.content_type)
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(snapshot.last_modified)
+        patch_cache_control(response, no_cache=True)
+        return response
+
+
+tag_catalog = CatalogSnapshot(Tag, TagSerializer)
@@ -0,0 +1,29 @@
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+# Бэкенды, данные которых не видны другим процессам.
+PROCESS_LOCAL_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+@register(Tags.caches, deploy=True)
+def check_shared_cache(app_configs, **kwargs):
+    """Версии пространств кэша должны быть общими для всех процессов.
+
+    Иначе сброс версии в одном воркере или в manage.py (например,
+    import_ingredients) не виден остальным воркерам, и справочники,
+    индекс ингредиентов и страницы рецептов остаются устаревшими.
+    """
+
+    backend = settings.CACHES['default']['BACKEND']
+    if backend not in PROCESS_LOCAL_CACHES:
+        return []
+    return [Error(
+        f'Кэш по умолчанию ({backend}) не общий для процессов.',
+        hint='Задайте CACHE_BACKEND и CACHE_LOCATION, например '
+             'django.core.cache.backends.redis.RedisCache и '
+             'redis://redis:6379/1.',
+        id='api.E001',
+    )]
@@ -0,0 +1,73 @@
+import json
+import uuid
+
+from django.core.files.uploadedfile import UploadedFile
+
+from drf_extra_fields.fields import Base64ImageField as BaseBase64ImageField
+from rest_framework import serializers
+from rest_framework.utils import html
+
+from .metrics import image_timer
+from .uploads import validate_image_limits
+
+
+class Base64ImageField(BaseBase64ImageField):
+    """Изображение в base64 с замером времени декодирования."""
+
+    def to_internal_value(self, data):
+        with image_timer('decode'):
+            return super().to_internal_value(data)
+
+
+class ImageUploadField(Base64ImageField):
+    """Изображение строкой base64 (JSON) или файлом (multipart).
+
+    Оба варианта проходят одни и те же проверки: лимиты размера и
+    числа пикселей, допустимые форматы и валидацию ImageField. Файлу
+    из multipart, как и декодированному из base64, дается случайное
+    имя.
+    """
+
+    def to_internal_value(self, data):
+        if isinstance(data, UploadedFile):
+            self.check_limits(data)
+            with image_timer('decode'):
+                file = serializers.ImageField.to_internal_value(self, data)
+            extension = file.image.format.lower()
+            extension = 'jpg' if extension == 'jpeg' else extension
+            if extension not in self.ALLOWED_TYPES:
+                raise serializers.ValidationError(self.INVALID_TYPE_MESSAGE)
+            file.name = f'{uuid.uuid4()}.{extension}'
+            return file
+        if not isinstance(data, str):
+            self.fail('invalid')
+        file = super().to_internal_value(data)
+        if file is not None:
+            self.check_limits(file)
+        return file
+
+    def check_limits(self, file):
+        error = validate_image_limits(file)
+        if error:
+            raise serializers.ValidationError(error)
+
+
+class JSONListField(serializers.ListField):
+    """Список; в multipart/form-data передается строкой JSON."""
+
+    default_error_messages = {
+        'invalid_json': 'Ожидается список в формате JSON.',
+    }
+
+    def get_value(self, dictionary):
+        if html.is_html_input(dictionary) and self.field_name in dictionary:
+            return dictionary.get(self.field_name)
+        return super().get_value(dictionary)
+
+    def to_internal_value(self, data):
+        if isinstance(data, str):
+            try:
+                data = json.loads(data)
+            except ValueError:
+                self.fail('invalid_json')
+        return super().to_internal_value(data)
@@ -1,8 +1,13 @@
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connections
+from django.db.models import F, Q
+
 import django_filters
 from django_filters import rest_framework as filters
 from rest_framework import filters as drf_filters
 
 from recipes.models import Recipe
+from recipes.search import SEARCH_CONFIG
 from tags.models import Tag
 
 
@@ -59,3 +64,32 @@ class IngredientSearchFilter(drf_filters.SearchFilter):
     """
 
     search_param = 'name'
+
+
+class RecipeSearchFilter(drf_filters.BaseFilterBackend):
+    """Полнотекстовый поиск рецептов по параметру 'search'.
+
+    В PostgreSQL ищет по search_vector (GIN-индекс, русская морфология)
+    и сортирует по релевантности. На других СУБД (например, SQLite
+    в тестах) ищет подстроку в названии, тексте, ингредиентах и тегах.
+    """
+
+    search_param = 'search'
+
+    def filter_queryset(self, request, queryset, view):
+        term = request.query_params.get(self.search_param, '').strip()
+        if not term:
+            return queryset
+        if connections[queryset.db].vendor == 'postgresql':
+            query = SearchQuery(
+                term, config=SEARCH_CONFIG, search_type='websearch'
+            )
+            return queryset.filter(search_vector=query).annotate(
+                rank=SearchRank(F('search_vector'), query)
+            ).order_by('-rank', '-created_at', '-id')
+        return queryset.filter(
+            Q(name__icontains=term)
+            | Q(text__icontains=term)
+            | Q(recipe_ingredients__ingredient__name__icontains=term)
+            | Q(tags__name__icontains=term)
+        ).distinct()
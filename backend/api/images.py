@@ -0,0 +1,251 @@
+"""Уменьшенные варианты изображений рецептов и аватаров.
+
+Загруженный оригинал сохраняется как раньше, а миниатюра, карточка и
+полный размер в WebP и JPEG строятся после фиксации транзакции в
+локальном пуле потоков. Готовые имена файлов записываются в
+JSON-поле модели вместе с именем исходника; пока вариантов нет или
+они построены для прежнего файла, сериализаторы отдают оригинал.
+Рецепты, загруженные без сигналов (bulk_create), догоняет команда
+build_image_variants.
+"""
+
+import io
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, transaction
+
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from recipes.models import Recipe
+from users.models import User
+
+from .metrics import image_timer
+
+logger = logging.getLogger(__name__)
+
+FORMATS = {
+    'webp': ('WEBP', 'webp', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', 'jpg', {
+        'quality': 82, 'optimize': True, 'progressive': True,
+    }),
+}
+VARIANTS_DIR = 'variants'
+IMAGE_ERRORS = (
+    OSError, ValueError, UnidentifiedImageError, Image.DecompressionBombError,
+)
+
+
+class ImageSpec:
+    """Какие варианты строить для поля изображения модели.
+
+    sizes — наибольшая сторона каждого варианта в пикселях.
+    """
+
+    def __init__(self, model, field, variants_field, sizes):
+        self.model = model
+        self.field = field
+        self.variants_field = variants_field
+        self.sizes = sizes
+
+    @property
+    def storage(self):
+        return self.model._meta.get_field(self.field).storage
+
+    def source(self, instance):
+        return getattr(instance, self.field).name or ''
+
+    def variants(self, instance):
+        return getattr(instance, self.variants_field) or {}
+
+    def is_stale(self, instance):
+        source = self.source(instance)
+        return bool(source) and self.variants(instance).get(
+            'source'
+        ) != source
+
+    def invalidate(self, pk):
+        """Сбрасывает закэшированные представления рецептов."""
+
+        # api.cache импортирует сериализаторы, которые импортируют
+        # этот модуль.
+        from .cache import recipe_cache
+
+        if self.model is Recipe:
+            recipe_cache.invalidate([pk])
+        else:
+            recipe_cache.invalidate(list(Recipe.objects.filter(
+                author_id=pk
+            ).values_list('pk', flat=True)))
+
+
+RECIPE_IMAGE = ImageSpec(
+    Recipe, 'image', 'image_variants',
+    {'thumbnail': 160, 'card': 480, 'full': 1280},
+)
+AVATAR = ImageSpec(
+    User, 'avatar', 'avatar_variants', {'thumbnail': 64, 'full': 256},
+)
+SPECS = {'recipes': RECIPE_IMAGE, 'avatars': AVATAR}
+
+
+def variant_name(source, variant, extension):
+    directory, filename = os.path.split(source)
+    stem = os.path.splitext(filename)[0]
+    return f'{directory}/{VARIANTS_DIR}/{stem}_{variant}.{extension}'
+
+
+def flatten(image):
+    """RGB без прозрачности для JPEG: прозрачное — на белом фоне."""
+
+    if image.mode in ('RGBA', 'LA', 'P'):
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+    return image.convert('RGB')
+
+
+def render_variants(spec, source, force=False):
+    """Строит варианты файла source; возвращает словарь для модели.
+
+    Уже существующие файлы вариантов не перестраиваются, поэтому
+    повторный запуск для того же исходника почти ничего не стоит.
+    С force=True они удаляются и строятся заново (поврежденные или
+    построенные с прежними настройками).
+    """
+
+    storage = spec.storage
+    # Имена вариантов выводятся из имени исходника, а не из своего
+    # содержимого: иначе их нельзя найти без перекодирования.
+    save = getattr(storage, 'save_derived', storage.save)
+    variants = {'source': source}
+    with image_timer('variants'):
+        with storage.open(source, 'rb') as stream:
+            original = ImageOps.exif_transpose(Image.open(stream))
+            original.load()
+        if original.mode not in ('RGB', 'RGBA'):
+            original = original.convert(
+                'RGBA' if 'transparency' in original.info
+                or original.mode in ('LA', 'P') else 'RGB'
+            )
+        for variant, size in spec.sizes.items():
+            resized = original.copy()
+            resized.thumbnail((size, size), Image.Resampling.LANCZOS)
+            variants[variant] = {}
+            for key, (pil_format, extension, options) in FORMATS.items():
+                name = variant_name(source, variant, extension)
+                if force and storage.exists(name):
+                    storage.delete(name)
+                if not storage.exists(name):
+                    buffer = io.BytesIO()
+                    image = resized if key == 'webp' else flatten(resized)
+                    image.save(buffer, pil_format, **options)
+                    name = save(name, ContentFile(buffer.getvalue()))
+                variants[variant][key] = name
+    return variants
+
+
+def process(spec, pk, source):
+    """Строит варианты и сохраняет их, если исходник не сменился."""
+
+    try:
+        variants = render_variants(spec, source)
+    except IMAGE_ERRORS:
+        logger.exception(
+            'Не удалось построить варианты %s для %s', source, pk
+        )
+        return False
+    updated = spec.model.objects.filter(
+        pk=pk, **{spec.field: source}
+    ).update(**{spec.variants_field: variants})
+    if updated:
+        spec.invalidate(pk)
+    return bool(updated)
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.IMAGE_VARIANT_WORKERS,
+                thread_name_prefix='image-variants',
+            )
+    return _executor
+
+
+def run_in_worker(spec, pk, source):
+    try:
+        process(spec, pk, source)
+    finally:
+        close_old_connections()
+
+
+def schedule(spec, instance):
+    """Ставит построение вариантов в очередь после фиксации транзакции.
+
+    При IMAGE_VARIANT_WORKERS = 0 варианты строятся сразу, в том же
+    потоке.
+    """
+
+    if not spec.is_stale(instance):
+        return
+    pk, source = instance.pk, spec.source(instance)
+
+    def submit():
+        if settings.IMAGE_VARIANT_WORKERS:
+            get_executor().submit(run_in_worker, spec, pk, source)
+        else:
+            process(spec, pk, source)
+
+    transaction.on_commit(submit)
+
+
+def absolute_urls(request, urls):
+    """Относительные URL вариантов из кэша — в абсолютные."""
+
+    return {
+        variant: {
+            key: request.build_absolute_uri(url)
+            for key, url in formats.items()
+        }
+        for variant, formats in urls.items()
+    }
+
+
+def variant_urls(spec, instance, request=None):
+    """URL вариантов: {вариант: {формат: URL}} или None без картинки.
+
+    Пока варианты не готовы, каждый из них указывает на оригинал.
+    Без request URL относительные (для кэша рецептов).
+    """
+
+    source = spec.source(instance)
+    if not source:
+        return None
+    storage = spec.storage
+
+    def url(name):
+        value = storage.url(name)
+        if request is not None:
+            return request.build_absolute_uri(value)
+        return value
+
+    ready = {} if spec.is_stale(instance) else spec.variants(instance)
+    original = url(source)
+    return {
+        variant: {
+            key: url(ready[variant][key]) if variant in ready else original
+            for key in FORMATS
+        }
+        for variant in spec.sizes
+    }
@@ -0,0 +1,69 @@
+from bisect import bisect_left
+from collections import namedtuple
+
+from ingridients.models import Ingredient
+
+from .catalog import CatalogSnapshot, Snapshot
+from .serializers import IngredientSerializer
+
+# Снимок каталога с отсортированными ключами поиска.
+IndexSnapshot = namedtuple(
+    'IndexSnapshot', Snapshot._fields + ('keys', 'positions')
+)
+
+
+class IngredientIndex(CatalogSnapshot):
+    """Индекс названий ингредиентов в памяти процесса.
+
+    Кроме снимка всего каталога хранит отсортированные названия
+    в нижнем регистре. Поиск по префиксу — бинарный поиск, затем
+    добавляются совпадения по подстроке. Ответ собирается из готовых
+    JSON-фрагментов без обращения к БД.
+    """
+
+    snapshot_class = IndexSnapshot
+
+    def __init__(self):
+        super().__init__(Ingredient, IngredientSerializer)
+
+    def build_extra(self, objects, fragments):
+        positions = tuple(sorted(
+            range(len(objects)),
+            key=lambda i: (objects[i].name.casefold(), objects[i].pk)
+        ))
+        return {
+            'keys': tuple(objects[i].name.casefold() for i in positions),
+            'positions': positions,
+        }
+
+    def select(self, snapshot, query):
+        """JSON-массив ингредиентов снимка, подходящих под query.
+
+        Сначала идут названия, начинающиеся с query, затем содержащие
+        его в середине; внутри групп — по алфавиту. Пустой запрос
+        возвращает весь каталог в порядке id, как и раньше.
+        """
+
+        query = ' '.join((query or '').replace(',', ' ').split()).casefold()
+        if not query:
+            return snapshot.all
+        keys = snapshot.keys
+        start = bisect_left(keys, query)
+        end = start
+        while end < len(keys) and keys[end].startswith(query):
+            end += 1
+        substring = [
+            i for i, key in enumerate(keys)
+            if query in key and not key.startswith(query)
+        ]
+        return self.join(snapshot.fragments, (
+            snapshot.positions[i] for i in [*range(start, end), *substring]
+        ))
+
+    def search(self, query):
+        """Поиск по текущему снимку (без HTTP-ответа)."""
+
+        return self.select(self.ensure_fresh(), query)
+
+
+ingredient_index = IngredientIndex()
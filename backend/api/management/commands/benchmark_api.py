@@ -0,0 +1,473 @@
+import json
+import os
+import random
+import re
+import statistics
+import subprocess
+import time
+from collections import defaultdict
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+import requests
+from rest_framework.authtoken.models import Token
+
+from recipes.models import Favorite, Ingredient, Recipe, ShoppingCart, Tag
+from users.models import Subscriptions, User
+
+DEFAULT_COLLECTION = os.path.join(
+    settings.BASE_DIR.parent,
+    'postman_collection',
+    'foodgram.postman_collection.json',
+)
+DEFAULT_WEIGHTS = {
+    'feed': 5,
+    'tags': 3,
+    'favorite': 2,
+    'subscriptions': 1,
+    'cart': 1,
+}
+VARIABLE = re.compile(r'{{(\w+)}}')
+
+
+def percentile(values, share):
+    """Перцентиль по методу ближайшего ранга; values отсортированы."""
+
+    index = max(0, min(len(values) - 1, round(share * len(values)) - 1))
+    return values[index]
+
+
+def load_collection(path):
+    """GET-запросы коллекции Postman: (название, шаблон URL, с токеном).
+
+    Пишущие запросы коллекции зависят от переменных, которые
+    выставляют ее JS-тесты, поэтому воспроизводятся только чтения.
+    """
+
+    with open(path, encoding='utf-8') as stream:
+        collection = json.load(stream)
+    requests_ = []
+
+    def walk(items):
+        for item in items:
+            if 'item' in item:
+                walk(item['item'])
+                continue
+            request = item['request']
+            if request['method'] != 'GET':
+                continue
+            url = request['url']
+            raw = url['raw'] if isinstance(url, dict) else url
+            auth = (request.get('auth') or {}).get('type')
+            requests_.append((
+                item['name'],
+                raw.replace('{{baseUrl}}', ''),
+                auth == 'apikey' or '// User' in item['name'],
+            ))
+
+    walk(collection['item'])
+    return requests_
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            capture_output=True, text=True, check=True,
+            cwd=settings.BASE_DIR,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class InProcessTransport:
+    """Запросы через django.test.Client, со счетчиком SQL-запросов."""
+
+    def __init__(self, token):
+        host = next(
+            (host for host in settings.ALLOWED_HOSTS if host != '*'),
+            'localhost',
+        ).lstrip('.')
+        self.clients = {
+            False: Client(raise_request_exception=False, SERVER_NAME=host),
+            True: Client(
+                raise_request_exception=False,
+                SERVER_NAME=host,
+                HTTP_AUTHORIZATION=f'Token {token}',
+            ),
+        }
+
+    def request(self, method, path, data, auth):
+        send = getattr(self.clients[auth], method.lower())
+        kwargs = {}
+        if data is not None:
+            kwargs = {'data': data, 'content_type': 'application/json'}
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            response = send(path, **kwargs)
+            if response.streaming:
+                b''.join(response.streaming_content)
+            elapsed = time.perf_counter() - started
+        return response.status_code, elapsed, len(queries), self.json(
+            response
+        )
+
+    @staticmethod
+    def json(response):
+        if response.get('Content-Type', '').startswith('application/json'):
+            try:
+                return json.loads(response.content)
+            except ValueError:
+                return None
+        return None
+
+
+class HTTPTransport:
+    """Запросы к запущенному серверу (например, локальному gunicorn)."""
+
+    def __init__(self, token, base_url):
+        self.base_url = base_url.rstrip('/')
+        self.session = requests.Session()
+        self.headers = {True: {'Authorization': f'Token {token}'}, False: {}}
+
+    def request(self, method, path, data, auth):
+        started = time.perf_counter()
+        try:
+            response = self.session.request(
+                method, self.base_url + path, json=data,
+                headers=self.headers[auth],
+            )
+        except requests.ConnectionError as error:
+            raise CommandError(f'Сервер недоступен: {error}')
+        elapsed = time.perf_counter() - started
+        try:
+            payload = response.json()
+        except ValueError:
+            payload = None
+        return response.status_code, elapsed, None, payload
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагрузочный прогон API: GET-запросы Postman-коллекции и '
+        'взвешенные сценарии (лента, фильтр по тегам, избранное, '
+        'подписки, корзина). Печатает p50/p95/p99, пропускную способность '
+        'и число SQL-запросов по эндпоинтам и сохраняет результат в JSON.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--iterations', type=int, default=200,
+            help='Сколько сценариев выполнить.'
+        )
+        parser.add_argument(
+            '--weight', action='append', default=[], metavar='NAME=N',
+            help='Вес сценария, например --weight cart=3; 0 отключает. '
+                 f'Сценарии: {", ".join(DEFAULT_WEIGHTS)}.'
+        )
+        parser.add_argument(
+            '--collection', default=DEFAULT_COLLECTION,
+            help='Путь к Postman-коллекции.'
+        )
+        parser.add_argument(
+            '--collection-repeat', type=int, default=5,
+            help='Сколько раз прогнать запросы коллекции; 0 — не прогонять.'
+        )
+        parser.add_argument(
+            '--warmup', type=int, default=20,
+            help='Сценариев для прогрева (не учитываются).'
+        )
+        parser.add_argument(
+            '--base-url',
+            help='Адрес запущенного сервера, например '
+                 'http://127.0.0.1:8000. По умолчанию — test client '
+                 'в этом процессе.'
+        )
+        parser.add_argument(
+            '--user', help='Email пользователя, от имени которого идут '
+                           'запросы (по умолчанию первый пользователь).'
+        )
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument(
+            '--output', help='Куда сохранить результаты в JSON.'
+        )
+        parser.add_argument(
+            '--compare', help='JSON прошлого прогона для сравнения p95.'
+        )
+
+    def get_weights(self, overrides):
+        weights = dict(DEFAULT_WEIGHTS)
+        for override in overrides:
+            name, _, value = override.partition('=')
+            if name not in weights or not value.isdigit():
+                raise CommandError(f'Некорректный вес сценария: {override}')
+            weights[name] = int(value)
+        return {name: weight for name, weight in weights.items() if weight}
+
+    def prepare(self, email):
+        users = User.objects.order_by('pk')
+        self.user = (
+            users.filter(email=email).first() if email else users.first()
+        )
+        if self.user is None:
+            raise CommandError('Нет пользователя для запросов.')
+        self.recipe_ids = list(Recipe.objects.values_list('pk', flat=True))
+        self.tag_slugs = list(Tag.objects.values_list('slug', flat=True))
+        self.author_ids = list(Recipe.objects.exclude(
+            author=self.user
+        ).values_list('author_id', flat=True).distinct())
+        if not self.recipe_ids or not self.tag_slugs:
+            raise CommandError('Нужны рецепты и теги: см. generate_fake_data.')
+        self.pages = max(1, len(self.recipe_ids) // 6)
+        token, _ = Token.objects.get_or_create(user=self.user)
+        return token.key
+
+    def collection_variables(self):
+        """Значения переменных коллекции, взятые из базы."""
+
+        tags = list(Tag.objects.order_by('pk')[:3])
+        ingredient = Ingredient.objects.order_by('pk').first()
+        variables = {
+            'userId': self.user.pk,
+            'firstRecipeId': self.recipe_ids[0],
+            'firstTagId': tags[0].pk,
+            'firstIndredientId': ingredient and ingredient.pk,
+            'ingredientNameFirstLatter': ingredient and ingredient.name[0],
+        }
+        if len(tags) == 3:
+            variables['secondTagSlug'] = tags[1].slug
+            variables['thirdTagSlug'] = tags[2].slug
+        return variables
+
+    def call(self, label, method, path, data=None, auth=True):
+        status, elapsed, queries, payload = self.transport.request(
+            method, path, data, auth
+        )
+        if self.recording:
+            stats = self.results[label]
+            stats['latencies'].append(elapsed * 1000)
+            stats['statuses'][str(status)] += 1
+            if queries is not None:
+                stats['queries'].append(queries)
+        return status, payload
+
+    def scenario_feed(self, rng):
+        auth = rng.random() < 0.5
+        page = min(self.pages, int(rng.paretovariate(1.5)))
+        _, payload = self.call(
+            'GET /api/recipes/?page={n}', 'GET',
+            f'/api/recipes/?page={page}', auth=auth
+        )
+        results = (payload or {}).get('results') or []
+        if results:
+            recipe = rng.choice(results)
+            self.call(
+                'GET /api/recipes/{id}/', 'GET',
+                f'/api/recipes/{recipe["id"]}/', auth=auth
+            )
+
+    def scenario_tags(self, rng):
+        slugs = rng.sample(self.tag_slugs, min(2, len(self.tag_slugs)))
+        query = '&'.join(f'tags={slug}' for slug in slugs)
+        self.call(
+            'GET /api/recipes/?tags={slug}', 'GET', f'/api/recipes/?{query}'
+        )
+
+    def toggle(self, name, model, rng):
+        """POST и DELETE на рецепт, которого еще нет в списке."""
+
+        taken = set(model.objects.filter(
+            user=self.user
+        ).values_list('recipe_id', flat=True))
+        recipe_id = rng.choice(self.recipe_ids)
+        if recipe_id in taken:
+            return
+        status, _ = self.call(
+            f'POST /api/recipes/{{id}}/{name}/', 'POST',
+            f'/api/recipes/{recipe_id}/{name}/'
+        )
+        if status == 201:
+            self.call(
+                f'DELETE /api/recipes/{{id}}/{name}/', 'DELETE',
+                f'/api/recipes/{recipe_id}/{name}/'
+            )
+
+    def scenario_favorite(self, rng):
+        self.call(
+            'GET /api/recipes/?is_favorited=1', 'GET',
+            '/api/recipes/?is_favorited=1'
+        )
+        self.toggle('favorite', Favorite, rng)
+
+    def scenario_subscriptions(self, rng):
+        self.call(
+            'GET /api/users/subscriptions/', 'GET',
+            '/api/users/subscriptions/?recipes_limit=3'
+        )
+        if not self.author_ids:
+            return
+        author_id = rng.choice(self.author_ids)
+        if Subscriptions.objects.filter(
+            user=self.user, author_id=author_id
+        ).exists():
+            return
+        status, _ = self.call(
+            'POST /api/users/{id}/subscribe/', 'POST',
+            f'/api/users/{author_id}/subscribe/'
+        )
+        if status == 201:
+            self.call(
+                'DELETE /api/users/{id}/subscribe/', 'DELETE',
+                f'/api/users/{author_id}/subscribe/'
+            )
+
+    def scenario_cart(self, rng):
+        self.toggle('shopping_cart', ShoppingCart, rng)
+        self.call(
+            'GET /api/recipes/download_shopping_cart/', 'GET',
+            '/api/recipes/download_shopping_cart/'
+        )
+
+    def run_collection(self, path, repeat):
+        if not repeat:
+            return
+        if not os.path.exists(path):
+            raise CommandError(f'Коллекция не найдена: {path}')
+        variables = self.collection_variables()
+        skipped = set()
+        items = load_collection(path)
+        for _ in range(repeat):
+            for name, template, auth in items:
+                names = VARIABLE.findall(template)
+                if any(variables.get(var) is None for var in names):
+                    skipped.add(name)
+                    continue
+                url = VARIABLE.sub(
+                    lambda match: str(variables[match.group(1)]), template
+                )
+                self.call(
+                    f'GET {urlsplit(template).path}'
+                    + ('' if auth else ' (anon)'),
+                    'GET', url, auth=auth,
+                )
+        if skipped:
+            self.stdout.write(
+                f'Пропущены запросы коллекции без значений переменных: '
+                f'{", ".join(sorted(skipped))}'
+            )
+
+    def run_scenarios(self, weights, iterations, rng):
+        names = list(weights)
+        chosen = rng.choices(
+            names, weights=[weights[name] for name in names], k=iterations
+        )
+        for name in chosen:
+            getattr(self, f'scenario_{name}')(rng)
+        return dict(zip(names, map(chosen.count, names)))
+
+    def summarize(self, wall_time):
+        endpoints = {}
+        for label, stats in sorted(self.results.items()):
+            latencies = sorted(stats['latencies'])
+            queries = stats['queries']
+            endpoints[label] = {
+                'count': len(latencies),
+                'statuses': dict(stats['statuses']),
+                'p50_ms': round(percentile(latencies, 0.50), 3),
+                'p95_ms': round(percentile(latencies, 0.95), 3),
+                'p99_ms': round(percentile(latencies, 0.99), 3),
+                'mean_ms': round(statistics.mean(latencies), 3),
+                'rps': round(len(latencies) / (sum(latencies) / 1000), 1),
+                'queries_mean': (
+                    round(statistics.mean(queries), 2) if queries else None
+                ),
+                'queries_max': max(queries) if queries else None,
+            }
+        total = sum(endpoint['count'] for endpoint in endpoints.values())
+        return {
+            'total_requests': total,
+            'wall_time_s': round(wall_time, 3),
+            'throughput_rps': round(total / wall_time, 1),
+            'endpoints': endpoints,
+        }
+
+    def report(self, summary, baseline=None):
+        baseline = (baseline or {}).get('endpoints', {})
+        self.stdout.write(
+            f'{"Эндпоинт":<48} {"n":>5} {"p50":>8} {"p95":>8} '
+            f'{"p99":>8} {"SQL":>6}'
+        )
+        for label, row in summary['endpoints'].items():
+            queries = row['queries_mean']
+            line = (
+                f'{label[:48]:<48} {row["count"]:>5} {row["p50_ms"]:>8.2f} '
+                f'{row["p95_ms"]:>8.2f} {row["p99_ms"]:>8.2f} '
+                f'{"-" if queries is None else f"{queries:.1f}":>6}'
+            )
+            if label in baseline:
+                before = baseline[label]['p95_ms']
+                line += f'  p95 {(row["p95_ms"] - before) / before:+.0%}'
+            errors = sum(
+                count for status, count in row['statuses'].items()
+                if status.startswith('5')
+            )
+            if errors:
+                line += f'  5xx: {errors}'
+            self.stdout.write(line)
+        self.stdout.write(self.style.SUCCESS(
+            f'Запросов: {summary["total_requests"]} за '
+            f'{summary["wall_time_s"]:.2f} с '
+            f'({summary["throughput_rps"]:.1f} запросов/с)'
+        ))
+
+    def handle(self, *args, **options):
+        weights = self.get_weights(options['weight'])
+        token = self.prepare(options['user'])
+        if options['base_url']:
+            self.transport = HTTPTransport(token, options['base_url'])
+        else:
+            self.transport = InProcessTransport(token)
+        baseline = None
+        if options['compare']:
+            with open(options['compare'], encoding='utf-8') as stream:
+                baseline = json.load(stream)
+        self.results = defaultdict(lambda: {
+            'latencies': [], 'queries': [], 'statuses': defaultdict(int),
+        })
+        rng = random.Random(options['seed'])
+
+        self.recording = False
+        if weights:
+            self.run_scenarios(weights, options['warmup'], rng)
+        self.recording = True
+        started = time.perf_counter()
+        self.run_collection(
+            options['collection'], options['collection_repeat']
+        )
+        scenarios = (
+            self.run_scenarios(weights, options['iterations'], rng)
+            if weights else {}
+        )
+        summary = self.summarize(time.perf_counter() - started)
+        if not summary['endpoints']:
+            raise CommandError('Не выполнено ни одного запроса.')
+        self.report(summary, baseline)
+
+        if options['output']:
+            summary.update({
+                'revision': git_revision(),
+                'created_at': timezone.now().isoformat(),
+                'transport': options['base_url'] or 'in-process',
+                'seed': options['seed'],
+                'scenarios': scenarios,
+                'database': connection.vendor,
+            })
+            with open(options['output'], 'w', encoding='utf-8') as stream:
+                json.dump(summary, stream, ensure_ascii=False, indent=2)
+            self.stdout.write(f'Результаты сохранены в {options["output"]}')
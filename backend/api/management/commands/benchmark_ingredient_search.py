@@ -0,0 +1,83 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from rest_framework.renderers import JSONRenderer
+
+from api.ingredient_index import IngredientIndex
+from api.serializers import IngredientSerializer
+from ingridients.models import Ingredient
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает задержку поиска ингредиентов: фильтр istartswith '
+        'в БД (как IngredientSearchFilter) против индекса в памяти.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--queries', type=int, default=500,
+            help='Количество поисковых запросов.'
+        )
+        parser.add_argument(
+            '--seed', type=int, default=42,
+            help='Seed для выбора запросов.'
+        )
+
+    def make_queries(self, count, seed):
+        """Префиксы случайных названий длиной 1–4 символа, как при вводе."""
+
+        names = list(Ingredient.objects.values_list('name', flat=True))
+        if not names:
+            raise CommandError('Каталог ингредиентов пуст.')
+        rng = random.Random(seed)
+        return [
+            rng.choice(names)[:rng.randint(1, 4)] for _ in range(count)
+        ]
+
+    def measure(self, search, queries):
+        timings = []
+        for query in queries:
+            started = time.perf_counter()
+            search(query)
+            timings.append((time.perf_counter() - started) * 1000)
+        return timings
+
+    def report(self, title, timings):
+        timings = sorted(timings)
+        p95 = timings[int(len(timings) * 0.95) - 1]
+        self.stdout.write(
+            f'{title:<10} mean {statistics.mean(timings):8.3f} ms  '
+            f'p50 {statistics.median(timings):8.3f} ms  '
+            f'p95 {p95:8.3f} ms'
+        )
+        return statistics.mean(timings)
+
+    def handle(self, *args, **options):
+        queries = self.make_queries(options['queries'], options['seed'])
+        renderer = JSONRenderer()
+
+        def database_search(query):
+            return renderer.render(IngredientSerializer(
+                Ingredient.objects.filter(name__istartswith=query), many=True
+            ).data)
+
+        index = IngredientIndex()
+        started = time.perf_counter()
+        snapshot = index.ensure_fresh()
+        build_ms = (time.perf_counter() - started) * 1000
+        self.stdout.write(
+            f'Индекс построен за {build_ms:.1f} ms '
+            f'({len(snapshot.keys)} ингредиентов), запросов: {len(queries)}'
+        )
+
+        database = self.report(
+            'БД', self.measure(database_search, queries)
+        )
+        memory = self.report('Индекс', self.measure(index.search, queries))
+        self.stdout.write(self.style.SUCCESS(
+            f'Индекс быстрее в {database / memory:.1f} раз.'
+        ))
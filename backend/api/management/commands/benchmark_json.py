@@ -0,0 +1,105 @@
+import io
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from api.parsers import ORJSONParser
+from api.renderers import ORJSONRenderer, orjson
+from api.serializers import RecipeSerializer
+from api.viewer_state import ViewerState
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает скорость JSONRenderer/JSONParser и их версий на orjson '
+        'на страницах списка рецептов (RecipeSerializer) и проверяет, '
+        'что результат совпадает побайтово.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--page-size', type=int, default=6,
+            help='Рецептов на странице.'
+        )
+        parser.add_argument(
+            '--repeat', type=int, default=500,
+            help='Количество повторов для каждой страницы.'
+        )
+
+    def make_payloads(self, page_size):
+        """Страница списка, страница побольше и один рецепт."""
+
+        queryset = Recipe.objects.select_related('author').prefetch_related(
+            'tags', 'recipe_ingredients__ingredient'
+        ).order_by('-created_at', '-id')
+        context = {'viewer_state': ViewerState()}
+        recipes = list(queryset[:page_size * 10])
+        if not recipes:
+            raise CommandError('В базе нет рецептов.')
+        page = RecipeSerializer(
+            recipes[:page_size], many=True, context=context
+        ).data
+        return [
+            ('Рецепт', RecipeSerializer(recipes[0], context=context).data),
+            (
+                f'Страница ({len(page)})',
+                {'count': len(recipes), 'results': page},
+            ),
+            (
+                f'Страница ({len(recipes)})',
+                RecipeSerializer(recipes, many=True, context=context).data,
+            ),
+        ]
+
+    def measure(self, func, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            func()
+            timings.append((time.perf_counter() - started) * 1_000_000)
+        return statistics.median(timings)
+
+    def compare(self, title, slow, fast, repeat):
+        slow_us = self.measure(slow, repeat)
+        fast_us = self.measure(fast, repeat)
+        self.stdout.write(
+            f'  {title:<8} stdlib {slow_us:9.1f} us  '
+            f'orjson {fast_us:9.1f} us  x{slow_us / fast_us:.1f}'
+        )
+
+    def handle(self, *args, **options):
+        if orjson is None:
+            self.stdout.write(self.style.WARNING(
+                'orjson не установлен: сравнивается JSONRenderer сам с собой.'
+            ))
+        renderer, fast_renderer = JSONRenderer(), ORJSONRenderer()
+        parser, fast_parser = JSONParser(), ORJSONParser()
+        mismatches = 0
+        for title, data in self.make_payloads(options['page_size']):
+            content = renderer.render(data)
+            if fast_renderer.render(data) != content:
+                mismatches += 1
+                self.stdout.write(self.style.ERROR(
+                    f'{title}: вывод отличается от JSONRenderer.'
+                ))
+            self.stdout.write(f'{title}, {len(content)} байт')
+            self.compare(
+                'render',
+                lambda: renderer.render(data),
+                lambda: fast_renderer.render(data),
+                options['repeat'],
+            )
+            self.compare(
+                'parse',
+                lambda: parser.parse(io.BytesIO(content)),
+                lambda: fast_parser.parse(io.BytesIO(content)),
+                options['repeat'],
+            )
+        if mismatches:
+            raise CommandError('Вывод рендереров различается.')
+        self.stdout.write(self.style.SUCCESS('Вывод совпадает побайтово.'))
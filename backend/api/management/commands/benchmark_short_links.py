@@ -0,0 +1,120 @@
+import random
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
+
+from api.management.commands.benchmark_api import percentile
+from api.query_budgets import make_client
+from api.short_links import short_links
+from recipes.models import Recipe
+
+FAST_PATH_MIDDLEWARE = 'api.short_links.ShortLinkMiddleware'
+# Что сбрасывается перед каждым запросом.
+CACHE_MODES = {
+    'cold': 'БД (кэши пусты)',
+    'shared': 'общий кэш',
+    'local': 'LRU процесса',
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Измеряет пропускную способность перехода по коротким ссылкам: '
+        'с ShortLinkMiddleware и через полный стек middleware, при '
+        'пустых кэшах, с общим кэшем и с LRU процесса.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--requests', type=int, default=2000,
+            help='Запросов на каждый сценарий.'
+        )
+        parser.add_argument(
+            '--links', type=int, default=250,
+            help='Сколько разных ссылок запрашивать (LocMemCache по '
+                 'умолчанию хранит не больше 300 ключей).'
+        )
+        parser.add_argument('--seed', type=int, default=42)
+
+    def sample(self, count):
+        links = dict(Recipe.objects.order_by('?').values_list(
+            'short_link', 'pk'
+        )[:count])
+        if not links:
+            raise CommandError('Нет рецептов: сначала generate_fake_data.')
+        return links
+
+    def reset(self, mode, short_link):
+        if mode == 'cold':
+            short_links.invalidate(short_link)
+        elif mode == 'shared':
+            short_links.local.discard(short_link)
+
+    def run(self, client, links, mode, requests, rng):
+        codes = list(links)
+        for short_link in codes:
+            client.get(f'/{short_link}/')
+        latencies = []
+        queries = 0
+        started = time.perf_counter()
+        for _ in range(requests):
+            short_link = rng.choice(codes)
+            self.reset(mode, short_link)
+            with CaptureQueriesContext(connection) as captured:
+                request_started = time.perf_counter()
+                response = client.get(f'/{short_link}/')
+                latencies.append(
+                    (time.perf_counter() - request_started) * 1000
+                )
+            queries += len(captured)
+            expected = f'/recipes/{links[short_link]}/'
+            if response.status_code != 302 or response.url != expected:
+                raise CommandError(
+                    f'/{short_link}/: {response.status_code} '
+                    f'{response.get("Location")}, ожидалось {expected}'
+                )
+        wall_time = time.perf_counter() - started
+        latencies.sort()
+        return {
+            'rps': requests / wall_time,
+            'p50_ms': percentile(latencies, 0.50),
+            'p99_ms': percentile(latencies, 0.99),
+            'queries': queries / requests,
+        }
+
+    def handle(self, *args, **options):
+        links = self.sample(options['links'])
+        stacks = {
+            'fast': settings.MIDDLEWARE,
+            'full': [
+                name for name in settings.MIDDLEWARE
+                if name != FAST_PATH_MIDDLEWARE
+            ],
+        }
+        self.stdout.write(
+            f'Ссылок: {len(links)}, запросов на сценарий: '
+            f'{options["requests"]}, '
+            f'кэш: {settings.CACHES["default"]["BACKEND"]}'
+        )
+        self.stdout.write(
+            f'{"Стек":<6} {"Источник":<18} {"запр./с":>9} {"p50":>7} '
+            f'{"p99":>7} {"SQL":>5}'
+        )
+        for stack, middleware in stacks.items():
+            with override_settings(MIDDLEWARE=middleware):
+                client = make_client()
+                for mode, label in CACHE_MODES.items():
+                    short_links.local.clear()
+                    row = self.run(
+                        client, links, mode, options['requests'],
+                        random.Random(options['seed']),
+                    )
+                    self.stdout.write(
+                        f'{stack:<6} {label:<18} {row["rps"]:>9.0f} '
+                        f'{row["p50_ms"]:>7.3f} {row["p99_ms"]:>7.3f} '
+                        f'{row["queries"]:>5.2f}'
+                    )
+        self.stdout.write(self.style.SUCCESS('Готово.'))
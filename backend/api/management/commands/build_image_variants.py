@@ -0,0 +1,92 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+
+from api.cache import recipe_cache
+from api.images import IMAGE_ERRORS, SPECS, render_variants
+
+
+class Command(BaseCommand):
+    help = (
+        'Строит уменьшенные варианты изображений рецептов и аватаров, '
+        'которых еще нет или которые построены для прежнего файла '
+        '(например, после bulk_create). Каждый исходный файл '
+        'обрабатывается один раз, даже если на него ссылается много '
+        'записей; файлы обрабатываются параллельно.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--only', choices=sorted(SPECS),
+            help='Только рецепты или только аватары.'
+        )
+        parser.add_argument(
+            '--force', action='store_true',
+            help='Пересчитать варианты у всех записей, перезаписав '
+                 'уже существующие файлы вариантов.'
+        )
+        parser.add_argument('--workers', type=int, default=4)
+        parser.add_argument(
+            '--chunk-size', type=int, default=2000,
+            help='Сколько записей читать из базы за раз.'
+        )
+
+    def stale_sources(self, spec, force, chunk_size):
+        """Исходные файлы записей без актуальных вариантов."""
+
+        rows = spec.model.objects.exclude(**{spec.field: ''}).exclude(
+            **{f'{spec.field}__isnull': True}
+        ).values_list(spec.field, spec.variants_field)
+        return {
+            source
+            for source, variants in rows.iterator(chunk_size=chunk_size)
+            if force or (variants or {}).get('source') != source
+        }
+
+    def render(self, spec, source, force):
+        try:
+            return source, render_variants(spec, source, force), None
+        except IMAGE_ERRORS as error:
+            return source, None, error
+        finally:
+            close_old_connections()
+
+    def handle(self, *args, **options):
+        if options['workers'] < 1:
+            raise CommandError('--workers должен быть положительным.')
+        names = [options['only']] if options['only'] else sorted(SPECS)
+        started = time.perf_counter()
+        for name in names:
+            spec = SPECS[name]
+            sources = self.stale_sources(
+                spec, options['force'], options['chunk_size']
+            )
+            done = failed = 0
+            with ThreadPoolExecutor(options['workers']) as executor:
+                results = executor.map(
+                    lambda source: self.render(
+                        spec, source, options['force']
+                    ),
+                    sources,
+                )
+                for source, variants, error in results:
+                    if error is not None:
+                        failed += 1
+                        self.stderr.write(f'{source}: {error}')
+                        continue
+                    # Варианты зависят только от файла: обновляем
+                    # все записи, которые на него ссылаются.
+                    done += spec.model.objects.filter(
+                        **{spec.field: source}
+                    ).update(**{spec.variants_field: variants})
+            self.stdout.write(
+                f'{name}: файлов {len(sources)}, записей обновлено {done}, '
+                f'ошибок {failed}'
+            )
+        # Варианты входят в закэшированные представления рецептов.
+        recipe_cache.invalidate_all()
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово за {time.perf_counter() - started:.1f} с.'
+        ))
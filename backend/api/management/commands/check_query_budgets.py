@@ -0,0 +1,179 @@
+import io
+import shutil
+import tempfile
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Count
+from django.test.utils import override_settings
+
+from rest_framework.authtoken.models import Token
+
+from api.query_budgets import (
+    BUDGETS,
+    PAGE_SIZES,
+    make_client,
+    reset_caches,
+    run_budget,
+    sample_objects,
+)
+from recipes.models import Recipe
+from users.models import User
+
+
+def int_list(value):
+    try:
+        return [int(item) for item in value.split(',') if item]
+    except ValueError:
+        raise CommandError(f'Ожидался список чисел через запятую: {value}')
+
+
+class Rollback(Exception):
+    """Откатывает транзакцию проверки после измерений."""
+
+
+class Command(BaseCommand):
+    help = (
+        'Проверяет бюджеты SQL-запросов и времени ответа эндпоинтов API '
+        '(api.query_budgets) на холодном кэше, на нескольких размерах '
+        'страницы и объемах данных. Синтетические данные создаются '
+        'generate_fake_data внутри транзакции и откатываются; '
+        'при нарушении команда завершается ошибкой и выводит '
+        'выполненные SQL-запросы.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', default='50,500',
+            help='Число рецептов в синтетических наборах через запятую.'
+        )
+        parser.add_argument(
+            '--existing', action='store_true',
+            help='Проверять на данных текущей базы, не создавая новых.'
+        )
+        parser.add_argument(
+            '--page-sizes', default=','.join(map(str, PAGE_SIZES)),
+            help='Размеры страницы (limit) для списков через запятую.'
+        )
+        parser.add_argument(
+            '--only', action='append',
+            help='Проверить только бюджет с этим именем '
+                 '(можно указать несколько раз).'
+        )
+        parser.add_argument(
+            '--time-factor', type=float, default=1.0,
+            help='Множитель бюджетов времени для медленных машин.'
+        )
+        parser.add_argument(
+            '--user',
+            help='Email пользователя, от имени которого идут запросы; '
+                 'по умолчанию автор с наибольшим числом подписок.'
+        )
+
+    def pick_user(self, email):
+        if email:
+            user = User.objects.filter(email=email).first()
+            if user is None:
+                raise CommandError(f'Пользователь {email} не найден.')
+            return user
+        user = User.objects.filter(recipes__isnull=False).annotate(
+            subscription_count=Count('subscriptions', distinct=True)
+        ).order_by('-subscription_count', 'pk').first()
+        if user is None:
+            raise CommandError('В базе нет ни одного автора рецептов.')
+        return user
+
+    def generate(self, size):
+
+        seed = 0
+        users = User.objects.all()
+        while users.filter(username__startswith=f'fake{seed}_').exists():
+            seed += 1
+        call_command(
+            'generate_fake_data',
+            users=max(10, size // 10),
+            recipes=size,
+            seed=seed,
+            stdout=io.StringIO(),
+        )
+
+    def check_budgets(self, label, budgets, options):
+        user = self.pick_user(options['user'])
+        try:
+            sample = sample_objects(user)
+        except ValueError as error:
+            raise CommandError(str(error))
+        token, _ = Token.objects.get_or_create(user=user)
+        clients = {False: make_client(), True: make_client(token.key)}
+        self.stdout.write(
+            f'{label}: рецептов {Recipe.objects.count()}, '
+            f'пользователь {user.email}'
+        )
+        failures = []
+        for budget in budgets:
+            problems = run_budget(
+                clients, budget, sample, options['page_sizes'],
+                options['time_factor'],
+            )
+            status = 'ошибка' if problems else 'ok'
+            self.stdout.write(
+                f'  {budget.name:<30} {status}'
+            )
+            failures.extend(f'[{label}] {problem}' for problem in problems)
+        return failures
+
+    def run(self, label, size, budgets, options):
+        """Проверка в транзакции, которая всегда откатывается.
+
+        Файлы, созданные за время проверки, пишутся во временный
+        MEDIA_ROOT и удаляются вместе с ним.
+        """
+
+        media_root = tempfile.mkdtemp(prefix='query-budgets-')
+        try:
+            with override_settings(MEDIA_ROOT=media_root), \
+                    transaction.atomic():
+                if size is not None:
+                    self.generate(size)
+                failures = self.check_budgets(label, budgets, options)
+                raise Rollback
+        except Rollback:
+            pass
+        finally:
+            reset_caches()
+            shutil.rmtree(media_root, ignore_errors=True)
+        return failures
+
+    def handle(self, *args, **options):
+        options['page_sizes'] = int_list(options['page_sizes'])
+        budgets = BUDGETS
+        if options['only']:
+            budgets = [
+                budget for budget in BUDGETS
+                if budget.name in options['only']
+            ]
+            unknown = set(options['only']) - {
+                budget.name for budget in budgets
+            }
+            if unknown:
+                raise CommandError(
+                    f'Нет бюджетов: {", ".join(sorted(unknown))}.'
+                )
+
+        if options['existing']:
+            runs = [('текущая база', None)]
+        else:
+            runs = [
+                (f'{size} рецептов', size)
+                for size in int_list(options['sizes'])
+            ]
+        failures = []
+        for label, size in runs:
+            failures.extend(self.run(label, size, budgets, options))
+
+        if failures:
+            for failure in failures:
+                self.stderr.write(failure)
+            raise CommandError(f'Нарушено бюджетов: {len(failures)}.')
+        self.stdout.write(self.style.SUCCESS('Все бюджеты соблюдены.'))
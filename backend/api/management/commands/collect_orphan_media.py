@@ -0,0 +1,134 @@
+import posixpath
+import time
+from datetime import timedelta
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db import models
+from django.utils import timezone
+
+from api.images import FORMATS, SPECS, variant_name
+
+
+class Command(BaseCommand):
+    help = (
+        'Удаляет медиафайлы, на которые не ссылается ни одна запись: '
+        'изображения удаленных и измененных рецептов, старые аватары и '
+        'их варианты. Просматриваются только каталоги upload_to полей '
+        'FileField; свежие файлы (--min-age) не трогаются.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только показать, что было бы удалено.'
+        )
+        parser.add_argument(
+            '--min-age', type=int, default=settings.ORPHAN_MEDIA_MIN_AGE,
+            help='Не удалять файлы моложе стольких секунд.'
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=2000,
+            help='Сколько записей читать из базы за раз.'
+        )
+
+    def file_fields(self):
+        for model in apps.get_models():
+            for field in model._meta.get_fields():
+                if (
+                    isinstance(field, models.FileField)
+                    and field.storage is default_storage
+                ):
+                    yield model, field
+
+    def referenced(self, fields, chunk_size):
+        """Имена всех файлов, на которые ссылаются записи.
+
+        Для каждого изображения сюда входят и имена его вариантов,
+        даже если они еще строятся.
+        """
+
+        specs = {(spec.model, spec.field): spec for spec in SPECS.values()}
+        names = set()
+        for model, field in fields:
+            spec = specs.get((model, field.name))
+            rows = model._default_manager.exclude(
+                **{field.attname: ''}
+            ).exclude(
+                **{f'{field.attname}__isnull': True}
+            ).values_list(field.attname, flat=True)
+            for name in rows.iterator(chunk_size=chunk_size):
+                names.add(name)
+                if spec is not None:
+                    names.update(
+                        variant_name(name, variant, extension)
+                        for variant in spec.sizes
+                        for _, extension, _ in FORMATS.values()
+                    )
+        for spec in SPECS.values():
+            rows = spec.model._default_manager.values_list(
+                spec.variants_field, flat=True
+            )
+            for variants in rows.iterator(chunk_size=chunk_size):
+                for variant, formats in (variants or {}).items():
+                    if variant != 'source':
+                        names.update(formats.values())
+        return names
+
+    def walk(self, directory):
+        """Все файлы каталога хранилища, рекурсивно."""
+
+        if not default_storage.exists(directory):
+            return
+        subdirectories, files = default_storage.listdir(directory)
+        for name in files:
+            yield posixpath.join(directory, name)
+        for subdirectory in subdirectories:
+            yield from self.walk(posixpath.join(directory, subdirectory))
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        fields = list(self.file_fields())
+        directories = sorted({
+            field.upload_to.strip('/') for _, field in fields
+            if isinstance(field.upload_to, str) and field.upload_to.strip('/')
+        })
+        referenced = self.referenced(fields, options['chunk_size'])
+        self.stdout.write(
+            f'Файлов в базе: {len(referenced)}; '
+            f'каталоги: {", ".join(directories)}'
+        )
+        threshold = timezone.now() - timedelta(seconds=options['min_age'])
+        orphans = []
+        seen = 0
+        for directory in directories:
+            for name in self.walk(directory):
+                seen += 1
+                if name in referenced:
+                    continue
+                if default_storage.get_modified_time(name) > threshold:
+                    continue
+                orphans.append(name)
+
+        freed = 0
+        deleted = 0
+        for name in orphans:
+            # Файл могли снова загрузить, пока шел обход каталогов.
+            if not default_storage.exists(name) or (
+                default_storage.get_modified_time(name) > threshold
+            ):
+                continue
+            freed += default_storage.size(name)
+            deleted += 1
+            if options['dry_run']:
+                self.stdout.write(name)
+            else:
+                default_storage.delete(name)
+        action = 'Будет удалено' if options['dry_run'] else 'Удалено'
+        self.stdout.write(self.style.SUCCESS(
+            f'Просмотрено файлов: {seen}. {action}: {deleted} '
+            f'({freed / (1024 * 1024):.1f} МБ) за '
+            f'{time.perf_counter() - started:.1f} с.'
+        ))
@@ -0,0 +1,156 @@
+"""Метрики приложения в формате Prometheus.
+
+Счетчики и гистограммы запросов по маршрутам, SQL-запросов, попаданий
+в кэши и обработки изображений отдаются по /metrics. Под gunicorn
+каждый воркер пишет значения в файлы каталога PROMETHEUS_MULTIPROC_DIR,
+а /metrics собирает их через MultiProcessCollector (см.
+gunicorn.conf.py). Без prometheus_client метрики не собираются,
+а /metrics отвечает 404.
+
+Снаружи /metrics закрыт в nginx; если задан METRICS_TOKEN, view
+требует заголовок Authorization: Bearer <METRICS_TOKEN>.
+"""
+
+import hmac
+import os
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+from django.http import Http404, HttpResponse, HttpResponseForbidden
+
+try:
+    import prometheus_client
+    from prometheus_client import multiprocess
+except ImportError:
+    prometheus_client = None
+
+UNRESOLVED_ROUTE = '<unresolved>'
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89, 144, 233)
+
+if prometheus_client is not None:
+    REQUESTS = prometheus_client.Counter(
+        'foodgram_http_requests_total',
+        'Запросы по маршрутам, методам и статусам.',
+        ('route', 'method', 'status'),
+    )
+    REQUEST_LATENCY = prometheus_client.Histogram(
+        'foodgram_http_request_duration_seconds',
+        'Время ответа по маршрутам.',
+        ('route', 'method'),
+    )
+    DB_QUERIES = prometheus_client.Histogram(
+        'foodgram_db_queries_per_request',
+        'Число SQL-запросов за запрос.',
+        ('route',),
+        buckets=QUERY_COUNT_BUCKETS,
+    )
+    DB_DURATION = prometheus_client.Histogram(
+        'foodgram_db_duration_seconds',
+        'Суммарное время SQL-запросов за запрос.',
+        ('route',),
+    )
+    CACHE_LOOKUPS = prometheus_client.Counter(
+        'foodgram_cache_lookups_total',
+        'Обращения к кэшам API: попадания и промахи.',
+        ('cache', 'result'),
+    )
+    IMAGE_DURATION = prometheus_client.Histogram(
+        'foodgram_image_processing_seconds',
+        'Время обработки изображений.',
+        ('operation',),
+    )
+
+
+def record_cache(name, hits=0, misses=0):
+    """Учитывает обращения к кэшу name; долю попаданий дает PromQL."""
+
+    if prometheus_client is None:
+        return
+    if hits:
+        CACHE_LOOKUPS.labels(name, 'hit').inc(hits)
+    if misses:
+        CACHE_LOOKUPS.labels(name, 'miss').inc(misses)
+
+
+@contextmanager
+def image_timer(operation):
+    """Измеряет обработку изображения (decode, resize и т.п.)."""
+
+    if prometheus_client is None:
+        yield
+        return
+    with IMAGE_DURATION.labels(operation).time():
+        yield
+
+
+def get_registry():
+    if 'PROMETHEUS_MULTIPROC_DIR' not in os.environ:
+        return prometheus_client.REGISTRY
+    registry = prometheus_client.CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return registry
+
+
+def metrics_view(request):
+    """Экспозиция метрик для Prometheus."""
+
+    if prometheus_client is None or not settings.METRICS_ENABLED:
+        raise Http404
+    if settings.METRICS_TOKEN and not hmac.compare_digest(
+        request.META.get('HTTP_AUTHORIZATION', '').encode(),
+        f'Bearer {settings.METRICS_TOKEN}'.encode(),
+    ):
+        return HttpResponseForbidden()
+    return HttpResponse(
+        prometheus_client.generate_latest(get_registry()),
+        content_type=prometheus_client.CONTENT_TYPE_LATEST,
+    )
+
+
+class QueryCounter:
+    """execute_wrapper: число и суммарное время SQL-запросов."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.duration += time.perf_counter() - started
+
+
+class MetricsMiddleware:
+    """Считает запросы, их время и SQL-запросы по имени маршрута.
+
+    Маршрут — url_name из resolver_match (recipes-list,
+    users-subscriptions и т.д.), поэтому число серий не зависит
+    от id в URL.
+    """
+
+    def __init__(self, get_response):
+        if prometheus_client is None or not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        queries = QueryCounter()
+        started = time.perf_counter()
+        with connection.execute_wrapper(queries):
+            response = self.get_response(request)
+        elapsed = time.perf_counter() - started
+        match = request.resolver_match
+        route = match.url_name if match and match.url_name else (
+            UNRESOLVED_ROUTE
+        )
+        REQUESTS.labels(route, request.method, response.status_code).inc()
+        REQUEST_LATENCY.labels(route, request.method).observe(elapsed)
+        DB_QUERIES.labels(route).observe(queries.count)
+        DB_DURATION.labels(route).observe(queries.duration)
+        return response
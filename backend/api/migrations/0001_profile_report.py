@@ -0,0 +1,36 @@
+# Generated by Django 4.2.7 on 2026-10-17 06:23
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProfileReport',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('method', models.CharField(max_length=10, verbose_name='Метод')),
+                ('path', models.TextField(verbose_name='Адрес')),
+                ('status_code', models.PositiveSmallIntegerField(verbose_name='Статус')),
+                ('duration_ms', models.FloatField(verbose_name='Время, мс')),
+                ('query_count', models.PositiveIntegerField(verbose_name='SQL-запросов')),
+                ('report', models.TextField(verbose_name='Отчет')),
+                ('user', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='profile_reports', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Отчет профилировщика',
+                'verbose_name_plural': 'Отчеты профилировщика',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+from django.conf import settings
+from django.db import models
+
+
+class ProfileReport(models.Model):
+    """Отчет профилировщика запроса, запущенного сотрудником."""
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        related_name='profile_reports',
+        verbose_name='Пользователь'
+    )
+    method = models.CharField(max_length=10, verbose_name='Метод')
+    path = models.TextField(verbose_name='Адрес')
+    status_code = models.PositiveSmallIntegerField(verbose_name='Статус')
+    duration_ms = models.FloatField(verbose_name='Время, мс')
+    query_count = models.PositiveIntegerField(
+        verbose_name='SQL-запросов'
+    )
+    report = models.TextField(verbose_name='Отчет')
+
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = 'Отчет профилировщика'
+        verbose_name_plural = 'Отчеты профилировщика'
+
+    def __str__(self):
+        return f'{self.method} {self.path} ({self.duration_ms:.0f} мс)'
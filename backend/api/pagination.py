@@ -1,6 +1,176 @@
-from rest_framework.pagination import PageNumberPagination
+import base64
+import binascii
+import hashlib
+import json
+from collections import OrderedDict
+from functools import cached_property, partial
 
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator as DjangoPaginator
+from django.db import connections
+from django.db.models import Q
+
+from rest_framework.exceptions import ParseError
+from rest_framework.pagination import (
+    BasePagination,
+    PageNumberPagination,
+    _positive_int,
+)
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from .cache import RECIPE_COUNT_NAMESPACE, get_version, user_count_namespace
 from .constants import PAGINATION_PAGE_SIZE
+from .metrics import record_cache
+
+
+class KeysetPagination(BasePagination):
+    """Курсорная (keyset) пагинация без COUNT(*) и OFFSET.
+
+    Следующая страница выбирается условием по значениям полей сортировки
+    последнего элемента, например (created_at, id) < (x, y), поэтому
+    глубокие страницы обходятся так же дешево, как первая.
+    Курсор непрозрачен для клиента: это base64 от JSON с позицией
+    и направлением обхода. Поля сортировки берутся из атрибута
+    keyset_ordering у view и должны однозначно упорядочивать записи.
+    """
+
+    cursor_query_param = 'cursor'
+    page_size = PAGINATION_PAGE_SIZE
+    page_size_query_param = 'limit'
+    max_page_size = None
+    ordering = ('-created_at', '-id')
+    invalid_cursor_message = 'Некорректный курсор.'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        """Возвращает страницу, начинающуюся после позиции из курсора."""
+
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.ordering = tuple(getattr(view, 'keyset_ordering', self.ordering))
+        self.fields = [
+            queryset.model._meta.get_field(name.lstrip('-'))
+            for name in self.ordering
+        ]
+        page_size = self.get_page_size(request)
+        position, reverse = self.decode_cursor(request)
+
+        ordering = self.ordering
+        if reverse:
+            ordering = tuple(self._invert(name) for name in ordering)
+        if position is not None:
+            queryset = queryset.filter(self.seek_filter(position, reverse))
+        results = list(queryset.order_by(*ordering)[:page_size + 1])
+        has_more = len(results) > page_size
+        results = results[:page_size]
+
+        if reverse:
+            results.reverse()
+            self.has_next = position is not None
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = position is not None
+        self.page = results
+        return results
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True},
+                'previous': {'type': 'string', 'nullable': True},
+                'results': schema,
+            },
+        }
+
+    def get_page_size(self, request):
+        """Размер страницы из параметра 'limit' или значение по умолчанию."""
+
+        try:
+            return _positive_int(
+                request.query_params[self.page_size_query_param],
+                strict=True,
+                cutoff=self.max_page_size,
+            )
+        except (KeyError, ValueError):
+            return self.page_size
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def seek_filter(self, position, reverse):
+        """Строит условие «после позиции» для составного ключа сортировки.
+
+        Для ключа (a, b) получается a < x OR (a = x AND b < y), где знак
+        сравнения зависит от направления сортировки поля и обхода.
+        """
+
+        condition = Q()
+        equal = Q()
+        for name, value in zip(self.ordering, position):
+            descending = name.startswith('-')
+            field = name.lstrip('-')
+            lookup = 'lt' if descending != reverse else 'gt'
+            condition |= equal & Q(**{f'{field}__{lookup}': value})
+            equal &= Q(**{field: value})
+        return condition
+
+    def encode_cursor(self, obj, reverse):
+        """Кодирует позицию объекта в ссылку с непрозрачным курсором."""
+
+        payload = {
+            'p': [field.value_to_string(obj) for field in self.fields],
+            'r': reverse,
+        }
+        cursor = base64.urlsafe_b64encode(
+            json.dumps(payload, separators=(',', ':')).encode()
+        ).decode()
+        url = remove_query_param(self.base_url, 'page')
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def decode_cursor(self, request):
+        """Возвращает позицию и направление обхода из параметра cursor."""
+
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(encoded.encode()))
+            values = payload['p']
+            if len(values) != len(self.fields):
+                raise ValueError
+            position = [
+                field.to_python(value)
+                for field, value in zip(self.fields, values)
+            ]
+            if None in position:
+                raise ValueError
+            return position, bool(payload.get('r'))
+        except (
+            TypeError, ValueError, KeyError, binascii.Error, ValidationError
+        ):
+            raise ParseError(self.invalid_cursor_message)
+
+    @staticmethod
+    def _invert(name):
+        return name[1:] if name.startswith('-') else f'-{name}'
 
 
 class PageLimitPagination(PageNumberPagination):
@@ -8,7 +178,143 @@ class PageLimitPagination(PageNumberPagination):
     По умолчанию выводит 6 элементов на страницу.
     Позволяет переопределять количество элементов через параметр 'limit'.
     Например: /api/recipes/?limit=10 вернет 10 элементов на странице.
+
+    По запросу клиента переключается на курсорную пагинацию:
+    /api/recipes/?pagination=cursor возвращает next/previous с курсором
+    и не считает общее количество записей.
     """
 
     page_size = PAGINATION_PAGE_SIZE
     page_size_query_param = "limit"
+    keyset_pagination_class = KeysetPagination
+    mode_query_param = 'pagination'
+    keyset_mode = 'cursor'
+
+    def keyset_requested(self, request):
+        """Проверяет, запросил ли клиент курсорный режим."""
+
+        cursor_param = self.keyset_pagination_class.cursor_query_param
+        return (
+            request.query_params.get(self.mode_query_param)
+            == self.keyset_mode
+            or cursor_param in request.query_params
+        )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.keyset_requested(request):
+            self.keyset = self.keyset_pagination_class()
+            return self.keyset.paginate_queryset(queryset, request, view)
+        self.keyset = None
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+
+class CountedPaginator(DjangoPaginator):
+    """Paginator, получающий общее количество через внешнюю функцию."""
+
+    def __init__(self, *args, count_loader, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.count_loader = count_loader
+
+    @cached_property
+    def count(self):
+        return self.count_loader(self.object_list)
+
+
+class CachedCountPagination(PageLimitPagination):
+    """Пагинация page/limit с кэшированием COUNT(*).
+
+    Количество кэшируется по нормализованному набору фильтров, поэтому
+    переход между страницами одной выборки не пересчитывает COUNT(*).
+    Кэш сбрасывается при записи рецептов и тегов (см. api.signals),
+    а количества с фильтрами по избранному и корзине — еще и при
+    изменении избранного или корзины их пользователя.
+    Для выборки без фильтров из большой таблицы используется оценка
+    числа строк из статистики планировщика PostgreSQL.
+    """
+
+    count_namespace = RECIPE_COUNT_NAMESPACE
+    ignored_query_params = ('page', 'limit', 'format')
+    user_filter_params = ('is_favorited', 'is_in_shopping_cart')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.django_paginator_class = partial(
+            CountedPaginator,
+            count_loader=partial(self.get_count, request=request)
+        )
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_filter_key(self, request):
+        """Нормализует параметры запроса, влияющие на выборку.
+
+        Порядок параметров и повторяющиеся значения (например, tags)
+        не влияют на ключ. Для фильтров по избранному и корзине в ключ
+        добавляется id пользователя.
+        """
+
+        params = {}
+        for name in request.query_params:
+            if name in self.ignored_query_params:
+                continue
+            values = sorted(set(filter(None, request.query_params.getlist(
+                name
+            ))))
+            if values:
+                params[name] = values
+        if request.user.is_authenticated and any(
+            name in params for name in self.user_filter_params
+        ):
+            params['user'] = [request.user.pk]
+        return params
+
+    def get_count(self, queryset, request):
+        """Возвращает количество из кэша, оценки планировщика или COUNT."""
+
+        params = self.get_filter_key(request)
+        digest = hashlib.md5(
+            json.dumps(params, sort_keys=True, default=str).encode()
+        ).hexdigest()
+        version = get_version(self.count_namespace)
+        if 'user' in params:
+            user_version = get_version(user_count_namespace(params['user'][0]))
+            version = f'{version}.{user_version}'
+        key = (
+            f'{self.count_namespace}:{version}:'
+            f'{queryset.model._meta.label_lower}:{digest}'
+        )
+        count = cache.get(key)
+        if count is not None:
+            record_cache(self.count_namespace, hits=1)
+            return count
+        record_cache(self.count_namespace, misses=1)
+        count = None if params else self.get_estimated_count(queryset)
+        if count is None:
+            count = queryset.count()
+        cache.set(key, count, settings.PAGINATION_COUNT_CACHE_TIMEOUT)
+        return count
+
+    def get_estimated_count(self, queryset):
+        """Оценка числа строк таблицы по pg_class.reltuples.
+
+        Возвращает None, если база не PostgreSQL или таблица меньше
+        порога PAGINATION_COUNT_ESTIMATE_THRESHOLD: тогда точный COUNT
+        дешев и предпочтителен.
+        """
+
+        connection = connections[queryset.db]
+        if connection.vendor != 'postgresql':
+            return None
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT reltuples::bigint FROM pg_class '
+                'WHERE oid = to_regclass(%s)',
+                [queryset.model._meta.db_table],
+            )
+            row = cursor.fetchone()
+        if not row or row[0] < settings.PAGINATION_COUNT_ESTIMATE_THRESHOLD:
+            return None
+        return row[0]
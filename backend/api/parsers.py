@@ -0,0 +1,34 @@
+import codecs
+
+from django.conf import settings
+
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+
+from .renderers import ORJSONRenderer, orjson
+
+
+class ORJSONParser(JSONParser):
+    """JSONParser на orjson.
+
+    orjson принимает только UTF-8 и не допускает NaN/Infinity, что
+    совпадает со строгим режимом DRF (STRICT_JSON). Для других
+    кодировок, нестрогого режима или без orjson разбор выполняет
+    обычный JSONParser.
+    """
+
+    renderer_class = ORJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        if (
+            orjson is None
+            or not self.strict
+            or codecs.lookup(encoding).name != 'utf-8'
+        ):
+            return super().parse(stream, media_type, parser_context)
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError('JSON parse error - %s' % str(exc))
@@ -0,0 +1,160 @@
+"""Профилирование запросов: заголовок Server-Timing и строка лога.
+
+ServerTimingMiddleware для выбранной доли запросов измеряет число и
+время SQL-запросов, время view, сериализации и рендеринга ответа.
+Участки кода отмечаются контекстным менеджером span; вне
+профилируемого запроса он ничего не делает. Интервалы могут
+перекрываться: SQL-запросы входят и во время view.
+
+При REQUEST_PROFILING = False middleware отключается при старте
+(MiddlewareNotUsed) и не добавляет накладных расходов.
+"""
+
+import json
+import logging
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+_current = ContextVar('request_profile', default=None)
+
+
+class RequestProfile:
+    """Накопленные за запрос длительности участков, в секундах."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.durations = {}
+        self.active = set()
+        self.query_count = 0
+        self.query_time = 0.0
+        self.view_started = None
+
+    def add(self, name, duration):
+        self.durations[name] = self.durations.get(name, 0.0) + duration
+
+    def execute_wrapper(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.query_count += 1
+            self.query_time += time.perf_counter() - started
+
+    def metrics(self):
+        """Пары (имя, миллисекунды, описание) для заголовка и лога."""
+
+        yield 'db', self.query_time * 1000, f'{self.query_count} queries'
+        for name, duration in self.durations.items():
+            yield name, duration * 1000, None
+        yield 'total', (time.perf_counter() - self.started) * 1000, None
+
+    def server_timing(self, metrics):
+        return ', '.join(
+            f'{name};dur={duration:.1f}'
+            + (f';desc="{description}"' if description else '')
+            for name, duration, description in metrics
+        )
+
+
+@contextmanager
+def span(name):
+    """Отмечает участок кода name в профиле текущего запроса.
+
+    Вложенные участки с тем же именем не учитываются повторно.
+    """
+
+    profile = _current.get()
+    if profile is None or name in profile.active:
+        yield
+        return
+    profile.active.add(name)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.add(name, time.perf_counter() - started)
+        profile.active.discard(name)
+
+
+class ServerTimingMiddleware:
+    """Профилирует выборку запросов к REQUEST_PROFILING_PATH_PREFIX.
+
+    Настройки: REQUEST_PROFILING включает middleware,
+    REQUEST_PROFILING_SAMPLE_RATE — доля профилируемых запросов,
+    REQUEST_PROFILING_HEADER — отдавать ли заголовок Server-Timing
+    (строка лога пишется всегда, в логгер api.profiling).
+    """
+
+    def __init__(self, get_response):
+        if not settings.REQUEST_PROFILING:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.sample_rate = settings.REQUEST_PROFILING_SAMPLE_RATE
+        self.path_prefix = settings.REQUEST_PROFILING_PATH_PREFIX
+        self.header = settings.REQUEST_PROFILING_HEADER
+
+    def sampled(self, request):
+        return request.path.startswith(self.path_prefix) and (
+            self.sample_rate >= 1 or random.random() < self.sample_rate
+        )
+
+    def __call__(self, request):
+        if not self.sampled(request):
+            return self.get_response(request)
+        profile = RequestProfile()
+        token = _current.set(profile)
+        try:
+            with connection.execute_wrapper(profile.execute_wrapper):
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        self.finish(request, response, profile)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        profile = _current.get()
+        if profile is not None:
+            profile.view_started = time.perf_counter()
+
+    def process_template_response(self, request, response):
+        """Замеряет view до рендеринга и рендеринг ответа DRF."""
+
+        profile = _current.get()
+        if profile is None:
+            return response
+        started = time.perf_counter()
+        if profile.view_started is not None:
+            profile.add('view', started - profile.view_started)
+            profile.view_started = None
+        response.add_post_render_callback(
+            lambda rendered: profile.add(
+                'render', time.perf_counter() - started
+            )
+        )
+        return response
+
+    def finish(self, request, response, profile):
+        if profile.view_started is not None:
+            # Ответ без отложенного рендеринга (HttpResponse и т.п.).
+            profile.add('view', time.perf_counter() - profile.view_started)
+        metrics = list(profile.metrics())
+        if self.header:
+            response['Server-Timing'] = profile.server_timing(metrics)
+        logger.info(json.dumps({
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'queries': profile.query_count,
+            **{
+                f'{name}_ms': round(duration, 1)
+                for name, duration, _ in metrics
+            },
+        }))
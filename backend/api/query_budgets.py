@@ -0,0 +1,339 @@
+"""Бюджеты SQL-запросов и времени ответа для эндпоинтов API.
+
+Для каждого действия RecipeViewSet, UserViewSet, TagViewSet и
+IngredientViewSet задано наибольшее допустимое число SQL-запросов и
+примерное время ответа. Бюджеты проверяются на холодном кэше, то есть
+в худшем случае; у списков — на нескольких размерах страницы, так что
+число запросов не должно зависеть ни от размера страницы, ни от объема
+данных. Число запросов проверяют тесты api.tests (manage.py test,
+в CI), время и большие объемы данных — команда check_query_budgets;
+контекстный менеджер query_budget пригоден и для отдельных проверок.
+"""
+
+import time
+from contextlib import contextmanager
+from urllib.parse import quote
+
+from django.conf import settings
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+
+from ingridients.models import Ingredient
+from recipes.models import Recipe
+from tags.models import Tag
+from users.models import User
+
+from .cache import (
+    RECIPE_COUNT_NAMESPACE,
+    bump_version,
+    catalog_namespace,
+    recipe_cache,
+)
+
+PAGE_SIZES = (6, 24, 100)
+# Точки сохранения появляются из-за внешней транзакции проверки,
+# в обычном запросе их нет, поэтому в бюджет они не входят.
+SAVEPOINT_PREFIXES = ('SAVEPOINT', 'RELEASE SAVEPOINT', 'ROLLBACK TO')
+PIXEL = (
+    'data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAIAAACQd1Pe'
+    'AAAADElEQVR4nGP4z8AAAAMBAQDJ/pLvAAAAAElFTkSuQmCC'
+)
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Запрос превысил бюджет; в сообщении перечислены его SQL-запросы."""
+
+
+class Budget:
+    """Бюджет одного действия: не больше queries запросов и ms миллисекунд.
+
+    path — шаблон URL с подстановками из выборки объектов (см.
+    sample_objects). Для списков (paginated) проверка повторяется на
+    каждом размере страницы, а к ms добавляется ms_per_row на строку.
+    queries_per_row — допуск для известных N+1, которые еще не
+    исправлены: столько запросов разрешено на каждую строку страницы.
+    """
+
+    def __init__(
+        self, name, path, queries, ms=500, method='get', auth=True,
+        data=None, paginated=False, ms_per_row=3, queries_per_row=0,
+        status=200,
+    ):
+        self.name = name
+        self.path = path
+        self.queries = queries
+        self.ms = ms
+        self.method = method
+        self.auth = auth
+        self.data = data
+        self.paginated = paginated
+        self.ms_per_row = ms_per_row
+        self.queries_per_row = queries_per_row
+        self.status = status
+
+    def urls(self, sample, page_sizes):
+        """Пары (размер страницы или None, URL) для проверки."""
+
+        url = self.path.format(**{
+            key: quote(str(value)) for key, value in sample.items()
+        })
+        if not self.paginated:
+            yield None, url
+            return
+        separator = '&' if '?' in url else '?'
+        for size in page_sizes:
+            yield size, f'{url}{separator}limit={size}'
+
+    def query_limit(self, page_size):
+        return self.queries + self.queries_per_row * (page_size or 0)
+
+    def time_limit(self, page_size, factor=1):
+        """Бюджет времени; factor=None — время не проверяется."""
+
+        if factor is None:
+            return None
+        rows = page_size or 0
+        return (self.ms + self.ms_per_row * rows) * factor
+
+
+def recipe_payload(sample):
+    return {
+        'name': 'Проверка бюджета',
+        'text': 'Рецепт для проверки бюджета запросов.',
+        'cooking_time': 10,
+        'image': PIXEL,
+        'tags': [sample['tag']],
+        'ingredients': [
+            {'id': ingredient, 'amount': 10}
+            for ingredient in sample['ingredients']
+        ],
+    }
+
+
+# Порядок важен: пишущие запросы идут парами (добавить — удалить),
+# чтобы данные между проверками оставались прежними.
+BUDGETS = (
+    Budget('tags-list', '/api/tags/', 1, auth=False),
+    Budget('tags-detail', '/api/tags/{tag}/', 1, auth=False),
+    Budget('ingredients-list', '/api/ingredients/', 1, auth=False),
+    Budget(
+        'ingredients-search', '/api/ingredients/?name={ingredient_prefix}',
+        1, auth=False,
+    ),
+    Budget(
+        'ingredients-detail', '/api/ingredients/{ingredient}/', 1,
+        auth=False,
+    ),
+    # Список без фильтров на небольшой таблице: оценка из pg_class,
+    # затем точный COUNT(*).
+    Budget('recipes-list', '/api/recipes/', 5, auth=False, paginated=True),
+    Budget('recipes-list-auth', '/api/recipes/', 9, paginated=True),
+    Budget(
+        'recipes-by-tag', '/api/recipes/?tags={tag_slug}', 5, ms=1000,
+        auth=False, paginated=True,
+    ),
+    Budget(
+        'recipes-by-author', '/api/recipes/?author={author}', 5,
+        auth=False, paginated=True,
+    ),
+    Budget(
+        'recipes-favorited', '/api/recipes/?is_favorited=1', 8,
+        paginated=True,
+    ),
+    Budget(
+        'recipes-in-cart', '/api/recipes/?is_in_shopping_cart=1', 8,
+        paginated=True,
+    ),
+    Budget(
+        'recipes-search', '/api/recipes/?search={recipe_word}', 5,
+        auth=False, paginated=True,
+    ),
+    Budget('recipes-detail', '/api/recipes/{recipe}/', 4, auth=False),
+    Budget('recipes-detail-auth', '/api/recipes/{recipe}/', 7),
+    Budget('recipes-get-link', '/api/recipes/{recipe}/get-link/', 1,
+           auth=False),
+    Budget('recipes-shopping-list', '/api/recipes/shopping_list/', 2),
+    Budget(
+        'recipes-download-cart', '/api/recipes/download_shopping_cart/', 2,
+    ),
+    Budget(
+        'recipes-favorite-add', '/api/recipes/{recipe}/favorite/', 6,
+        method='post', status=201,
+    ),
+    Budget(
+        'recipes-favorite-remove', '/api/recipes/{recipe}/favorite/', 4,
+        method='delete', status=204,
+    ),
+    # Изменения корзины блокируют строку рецепта (SELECT ... FOR UPDATE),
+    # удаление еще проверяет расхождение списка покупок перед вычитанием.
+    Budget(
+        'recipes-cart-add', '/api/recipes/{recipe}/shopping_cart/', 9,
+        method='post', status=201,
+    ),
+    Budget(
+        'recipes-cart-remove', '/api/recipes/{recipe}/shopping_cart/', 9,
+        method='delete', status=204,
+    ),
+    # Запись рецепта проверяется с тремя ингредиентами: валидация и
+    # ответ пока читают каждый ингредиент отдельным запросом.
+    Budget(
+        'recipes-create', '/api/recipes/', 18, method='post',
+        data=recipe_payload, status=201,
+    ),
+    Budget(
+        'recipes-update', '/api/recipes/{own_recipe}/', 29,
+        method='patch', data=recipe_payload,
+    ),
+    Budget('users-list', '/api/users/', 3, auth=False, paginated=True),
+    Budget('users-detail', '/api/users/{author}/', 1, auth=False),
+    Budget('users-detail-auth', '/api/users/{author}/', 3),
+    Budget('users-me', '/api/users/me/', 2),
+    Budget(
+        'users-subscriptions', '/api/users/subscriptions/', 4,
+        paginated=True,
+    ),
+    Budget(
+        'users-subscriptions-limited',
+        '/api/users/subscriptions/?recipes_limit=3', 4, paginated=True,
+    ),
+    Budget(
+        'users-subscribe', '/api/users/{author}/subscribe/', 5,
+        method='post', status=201,
+    ),
+    Budget(
+        'users-unsubscribe', '/api/users/{author}/subscribe/', 4,
+        method='delete', status=204,
+    ),
+)
+
+
+def sample_objects(user):
+    """Объекты, на которых проверяются бюджеты от имени user.
+
+    Рецепт и автор берутся такие, с которыми user еще не связан, чтобы
+    пары «добавить — удалить» проходили без конфликтов.
+    """
+
+    recipe = Recipe.objects.exclude(author=user).exclude(
+        in_favorites__user=user
+    ).exclude(in_shoppingcarts__user=user).order_by('-created_at').first()
+    own_recipe = user.recipes.order_by('-created_at').first()
+    author = User.objects.filter(recipes__isnull=False).exclude(
+        pk=user.pk
+    ).exclude(subscribers__user=user).order_by('pk').first()
+    tag = Tag.objects.order_by('pk').first()
+    ingredients = list(Ingredient.objects.order_by('pk')[:3])
+    if None in (recipe, own_recipe, author, tag) or not ingredients:
+        raise ValueError(
+            'Нужны теги, ингредиенты, рецепт пользователя, чужой рецепт '
+            'и автор, на которого он не подписан.'
+        )
+    return {
+        'recipe': recipe.pk,
+        'recipe_word': recipe.name.split()[0],
+        'own_recipe': own_recipe.pk,
+        'author': author.pk,
+        'tag': tag.pk,
+        'tag_slug': tag.slug,
+        'ingredient': ingredients[0].pk,
+        'ingredient_prefix': ingredients[0].name[:3],
+        'ingredients': [ingredient.pk for ingredient in ingredients],
+    }
+
+
+def make_client(token=None):
+    """Тестовый клиент с хостом из ALLOWED_HOSTS и токеном, если задан."""
+
+    host = next(
+        (host for host in settings.ALLOWED_HOSTS if host != '*'),
+        'localhost',
+    ).lstrip('.')
+    extra = {'HTTP_AUTHORIZATION': f'Token {token}'} if token else {}
+    return Client(raise_request_exception=False, SERVER_NAME=host, **extra)
+
+
+def reset_caches():
+    """Сбрасывает кэши API, чтобы измерить запрос в худшем случае."""
+
+    recipe_cache.invalidate_all()
+    bump_version(RECIPE_COUNT_NAMESPACE)
+    bump_version(catalog_namespace(Tag))
+    bump_version(catalog_namespace(Ingredient))
+
+
+def counted(queries):
+    return [
+        query for query in queries
+        if not query['sql'].startswith(SAVEPOINT_PREFIXES)
+    ]
+
+
+def format_queries(queries):
+    return '\n'.join(
+        f'  {number}. [{query["time"]} с] {query["sql"]}'
+        for number, query in enumerate(queries, 1)
+    )
+
+
+@contextmanager
+def query_budget(queries, ms=None, label='Запрос'):
+    """Проверяет число SQL-запросов и время выполнения блока.
+
+    При нарушении бросает QueryBudgetExceeded со списком выполненных
+    запросов; при превышении времени — в порядке убывания длительности.
+    """
+
+    with CaptureQueriesContext(connection) as captured:
+        started = time.perf_counter()
+        yield captured
+        elapsed = (time.perf_counter() - started) * 1000
+    executed = counted(captured.captured_queries)
+    problems = []
+    if len(executed) > queries:
+        problems.append(
+            f'{len(executed)} SQL-запросов при бюджете {queries}'
+        )
+    if ms is not None and elapsed > ms:
+        problems.append(f'{elapsed:.0f} мс при бюджете {ms:.0f} мс')
+        executed = sorted(
+            executed, key=lambda query: float(query['time']), reverse=True
+        )
+    if problems:
+        raise QueryBudgetExceeded(
+            f'{label}: {"; ".join(problems)}\n{format_queries(executed)}'
+        )
+
+
+def run_budget(clients, budget, sample, page_sizes, time_factor=1):
+    """Проверяет один бюджет; возвращает список сообщений о нарушениях."""
+
+    client = clients[budget.auth]
+    failures = []
+    for page_size, url in budget.urls(sample, page_sizes):
+        kwargs = {}
+        if budget.data is not None:
+            kwargs = {
+                'data': budget.data(sample),
+                'content_type': 'application/json',
+            }
+        label = f'{budget.name}: {budget.method.upper()} {url}'
+        reset_caches()
+        try:
+            with query_budget(
+                budget.query_limit(page_size),
+                budget.time_limit(page_size, time_factor),
+                label,
+            ):
+                response = getattr(client, budget.method)(url, **kwargs)
+                if response.streaming:
+                    b''.join(response.streaming_content)
+        except QueryBudgetExceeded as error:
+            failures.append(str(error))
+            continue
+        if response.status_code != budget.status:
+            failures.append(
+                f'{label}: статус {response.status_code}, '
+                f'ожидался {budget.status}'
+            )
+    return failures
@@ -0,0 +1,55 @@
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils import encoders
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class ORJSONRenderer(JSONRenderer):
+    """JSONRenderer на orjson с тем же побайтовым результатом.
+
+    Используется, когда установлен orjson и ответ рендерится
+    в компактном виде без экранирования не-ASCII (как настроен DRF
+    по умолчанию). Во всех остальных случаях — отступы для
+    BrowsableAPI, ensure_ascii, отсутствующий orjson или данные,
+    которые orjson не умеет кодировать, — работает обычный
+    JSONRenderer.
+
+    Даты и время orjson не трогает: они передаются в default
+    из encoders.JSONEncoder, чтобы формат совпадал с DRF
+    (например, 'Z' вместо '+00:00').
+    """
+
+    options = (
+        orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+        if orjson else 0
+    )
+    default = encoders.JSONEncoder().default
+
+    def can_render_fast(self, accepted_media_type, renderer_context):
+        return (
+            orjson is not None
+            and self.compact
+            and not self.ensure_ascii
+            and self.encoder_class is encoders.JSONEncoder
+            and self.get_indent(accepted_media_type, renderer_context) is None
+        )
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        renderer_context = renderer_context or {}
+        if self.can_render_fast(accepted_media_type, renderer_context):
+            try:
+                ret = orjson.dumps(
+                    data, default=self.default, option=self.options
+                )
+            except orjson.JSONEncodeError:
+                pass
+            else:
+                return ret.replace(
+                    b'\xe2\x80\xa8', b'\\u2028'
+                ).replace(b'\xe2\x80\xa9', b'\\u2029')
+        return super().render(data, accepted_media_type, renderer_context)
@@ -1,19 +1,41 @@
 from django.contrib.auth import get_user_model
-from drf_extra_fields.fields import Base64ImageField
+from django.db import transaction
 from rest_framework import serializers
 
 from ingridients.models import Ingredient
-from recipes.models import Favorite, IngredientInRecipe, Recipe, ShoppingCart
+from recipes import shopping_list
+from recipes.models import (
+    Favorite,
+    IngredientInRecipe,
+    Recipe,
+    ShoppingCart,
+    ShoppingListItem,
+)
 from tags.models import Tag
 from users.models import Subscriptions
 
+from .fields import ImageUploadField, JSONListField
+from .images import AVATAR, RECIPE_IMAGE, variant_urls
+from .viewer_state import ViewerState
+
 User = get_user_model()
 
 
+class ViewerStateMixin:
+    """Доступ к ViewerState текущего запроса из сериализатора."""
+
+    @property
+    def viewer_state(self):
+        state = self.context.get('viewer_state')
+        if state is None:
+            state = ViewerState.for_request(self.context.get('request'))
+        return state
+
+
 class AvatarSerializer(serializers.ModelSerializer):
     """Сериализатор для обновления аватара пользователя."""
 
-    avatar = Base64ImageField(required=True)
+    avatar = ImageUploadField(required=True)
 
     class Meta:
         model = User
@@ -66,8 +88,12 @@ class SubscriptionDeleteValidator(serializers.Serializer):
         return data
 
 
-class SubscriptionSerializer(serializers.ModelSerializer):
-    """Сериализатор для подписок."""
+class SubscriptionSerializer(ViewerStateMixin, serializers.ModelSerializer):
+    """Сериализатор для подписок.
+
+    Ожидает авторов из UserViewSet.get_subscription_authors: число
+    рецептов аннотировано, а первые рецепты уже загружены.
+    """
 
     is_subscribed = serializers.SerializerMethodField()
     recipes = serializers.SerializerMethodField()
@@ -84,49 +110,44 @@ class SubscriptionSerializer(serializers.ModelSerializer):
     def get_is_subscribed(self, obj):
         """Проверяет, подписан ли текущий пользователь на автора."""
 
-        request = self.context.get('request')
-        if request and request.user.is_authenticated:
-            return Subscriptions.objects.filter(
-                user=request.user,
-                author=obj
-            ).exists()
-        return False
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
+        return self.viewer_state.is_subscribed(obj)
 
     def get_recipes(self, obj):
-        """Возвращает список рецептов автора с возможностью ограничения."""
-
-        request = self.context.get("request")
-        limit = request.GET.get("recipes_limit")
-        recipes = obj.recipes.all()
-
-        if limit:
-            try:
-                limit = int(limit)
-                recipes = recipes[:limit] if limit > 0 else recipes.none()
-            except (ValueError, TypeError):
-                pass
-
-        serializer = RecipeCustomSerializer(recipes, many=True, read_only=True)
-        return serializer.data
+        """Краткие данные рецептов автора (не больше recipes_limit)."""
+
+        return [
+            {
+                'id': recipe.id,
+                'name': recipe.name,
+                'image': recipe.image.url if recipe.image else None,
+                'cooking_time': recipe.cooking_time,
+            }
+            for recipe in obj.subscription_recipes
+        ]
 
     def get_recipes_count(self, obj):
         """Возвращает общее количество рецептов автора."""
 
-        return obj.recipes.count()
+        return obj.recipes_count
 
     def get_avatar(self, obj):
-        """Возвращает URL аватара автора с использованием AvatarSerializer."""
+        """Возвращает абсолютный URL аватара автора."""
 
-        avatar_serializer = AvatarSerializer(
-            instance=obj, context=self.context
-        )
-        return avatar_serializer.data.get('avatar')
+        if not obj.avatar:
+            return None
+        request = self.context.get('request')
+        if request is not None:
+            return request.build_absolute_uri(obj.avatar.url)
+        return obj.avatar.url
 
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(ViewerStateMixin, serializers.ModelSerializer):
     """Сериализатор для пользователя с флагом подписки и аватаром."""
 
     is_subscribed = serializers.SerializerMethodField()
+    avatar_variants = serializers.SerializerMethodField()
 
     class Meta:
         model = User
@@ -137,20 +158,25 @@ class UserSerializer(serializers.ModelSerializer):
             'first_name',
             'last_name',
             'avatar',
+            'avatar_variants',
             'is_subscribed',
         )
 
+    def get_avatar_variants(self, obj):
+        """URL уменьшенных аватаров; до их готовности — оригинал."""
+
+        return variant_urls(AVATAR, obj, self.context.get('request'))
+
     def get_is_subscribed(self, obj):
-        """Проверяет, подписан ли текущий пользователь."""
+        """Проверяет, подписан ли текущий пользователь.
 
-        request = self.context.get('request')
-        return bool(
-            request
-            and request.user.is_authenticated
-            and Subscriptions.objects.filter(
-                user=request.user, author=obj
-            ).exists()
-        )
+        Если флаг уже посчитан в запросе (аннотация is_subscribed),
+        используется он, иначе — подписки из ViewerState.
+        """
+
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
+        return self.viewer_state.is_subscribed(obj)
 
 
 class TagSerializer(serializers.ModelSerializer):
@@ -190,7 +216,21 @@ class IngredientInRecipeSerializer(serializers.ModelSerializer):
         return value
 
 
-class RecipeSerializer(serializers.ModelSerializer):
+class ShoppingListItemSerializer(serializers.ModelSerializer):
+    """Сериализатор позиции списка покупок."""
+
+    id = serializers.ReadOnlyField(source='ingredient.id')
+    name = serializers.ReadOnlyField(source='ingredient.name')
+    measurement_unit = serializers.ReadOnlyField(
+        source='ingredient.measurement_unit'
+    )
+
+    class Meta:
+        model = ShoppingListItem
+        fields = ('id', 'name', 'measurement_unit', 'amount')
+
+
+class RecipeSerializer(ViewerStateMixin, serializers.ModelSerializer):
     """Сериализатор для детального отображения рецепта."""
 
     author = UserSerializer(read_only=True)
@@ -203,6 +243,7 @@ class RecipeSerializer(serializers.ModelSerializer):
     is_favorited = serializers.SerializerMethodField()
     is_in_shopping_cart = serializers.SerializerMethodField()
     image = serializers.SerializerMethodField()
+    image_variants = serializers.SerializerMethodField()
 
     class Meta:
         model = Recipe
@@ -215,10 +256,18 @@ class RecipeSerializer(serializers.ModelSerializer):
             "is_in_shopping_cart",
             "name",
             "image",
+            "image_variants",
             "text",
             "cooking_time"
         ]
 
+    def to_representation(self, instance):
+        """Передает автору флаг подписки, посчитанный в запросе."""
+
+        if hasattr(instance, 'is_author_subscribed'):
+            instance.author.is_subscribed = instance.is_author_subscribed
+        return super().to_representation(instance)
+
     def get_image(self, obj):
         """Возвращает абсолютный URL изображения рецепта."""
 
@@ -229,32 +278,29 @@ class RecipeSerializer(serializers.ModelSerializer):
             return request.build_absolute_uri(obj.image.url)
         return obj.image.url
 
+    def get_image_variants(self, obj):
+        """URL уменьшенных изображений; до их готовности — оригинал."""
+
+        return variant_urls(RECIPE_IMAGE, obj, self.context.get('request'))
+
     def get_is_favorited(self, obj):
         """Проверяет, добавлен ли рецепт в избранное."""
-        user = self.context["request"].user
-        if not user.is_authenticated:
-            return False
-        return Favorite.objects.filter(
-            user=user,
-            recipe=obj
-        ).exists()
+        if hasattr(obj, 'is_favorited'):
+            return obj.is_favorited
+        return self.viewer_state.is_favorited(obj)
 
     def get_is_in_shopping_cart(self, obj):
         """Проверяет, добавлен ли рецепт в корзину."""
-        user = self.context["request"].user
-        if not user.is_authenticated:
-            return False
-        return ShoppingCart.objects.filter(
-            user=user,
-            recipe=obj
-        ).exists()
+        if hasattr(obj, 'is_in_shopping_cart'):
+            return obj.is_in_shopping_cart
+        return self.viewer_state.is_in_shopping_cart(obj)
 
 
 class RecipeCreateUpdateSerializer(serializers.ModelSerializer):
     """Сериализатор для создания и обновления рецептов."""
 
-    image = Base64ImageField(required=True)
-    ingredients = serializers.ListField(
+    image = ImageUploadField(required=True)
+    ingredients = JSONListField(
         child=serializers.DictField(),
         write_only=True,
         required=True
@@ -345,6 +391,7 @@ class RecipeCreateUpdateSerializer(serializers.ModelSerializer):
             ) for ingredient in ingredients
         ])
 
+    @transaction.atomic
     def create(self, validated_data):
         """Создает новый рецепт."""
 
@@ -356,6 +403,7 @@ class RecipeCreateUpdateSerializer(serializers.ModelSerializer):
         self.create_ingredients(recipe, ingredients)
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         """Обновляет существующий рецепт."""
 
@@ -364,8 +412,11 @@ class RecipeCreateUpdateSerializer(serializers.ModelSerializer):
         if tags is not None:
             instance.tags.set(tags)
         if ingredients is not None:
+            shopping_list.lock_recipe(instance.pk)
+            previous_amounts = shopping_list.recipe_amounts(instance.pk)
             instance.recipe_ingredients.all().delete()
             self.create_ingredients(instance, ingredients)
+            shopping_list.sync_recipe(instance.pk, previous_amounts)
         for attr, value in validated_data.items():
             setattr(instance, attr, value)
         instance.save()
@@ -381,10 +432,11 @@ class RecipeMinifiedSerializer(serializers.ModelSerializer):
     """Сериализатор для краткого отображения рецептов."""
 
     image = serializers.SerializerMethodField()
+    image_variants = serializers.SerializerMethodField()
 
     class Meta:
         model = Recipe
-        fields = ('id', 'name', 'image', 'cooking_time')
+        fields = ('id', 'name', 'image', 'image_variants', 'cooking_time')
 
     def get_image(self, obj):
         """Возвращает URL изображения рецепта."""
@@ -396,15 +448,10 @@ class RecipeMinifiedSerializer(serializers.ModelSerializer):
             return request.build_absolute_uri(obj.image.url)
         return obj.image.url
 
+    def get_image_variants(self, obj):
+        """URL уменьшенных изображений; до их готовности — оригинал."""
 
-class RecipeCustomSerializer(serializers.ModelSerializer):
-    """Сериализатор для кастомного отображения рецептов."""
-
-    image = Base64ImageField()
-
-    class Meta:
-        model = Recipe
-        fields = ("id", "name", "image", "cooking_time")
+        return variant_urls(RECIPE_IMAGE, obj, self.context.get('request'))
 
 
 class BaseUserRecipeRelationSerializer(serializers.ModelSerializer):
@@ -438,3 +485,9 @@ class FavoriteSerializer(BaseUserRecipeRelationSerializer):
 class ShoppingCartSerializer(BaseUserRecipeRelationSerializer):
     class Meta(BaseUserRecipeRelationSerializer.Meta):
         model = ShoppingCart
+
+    @transaction.atomic
+    def create(self, validated_data):
+        """Корзина и список покупок (сигнал post_save) меняются вместе."""
+
+        return super().create(validated_data)
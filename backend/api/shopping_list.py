@@ -0,0 +1,108 @@
+import csv
+
+from rest_framework.renderers import BaseRenderer
+
+from recipes.models import ShoppingListItem
+
+from .renderers import ORJSONRenderer
+
+STREAM_CHUNK_SIZE = 200
+
+
+def shopping_list_items(user):
+    """Позиции списка покупок пользователя, упорядоченные по названию."""
+
+    return ShoppingListItem.objects.filter(user=user).order_by(
+        'ingredient__name', 'ingredient_id'
+    )
+
+
+def shopping_list_rows(user):
+    """Строки (название, единица, количество) для выгрузки.
+
+    Читаются курсором порциями, поэтому память не зависит
+    от размера списка.
+    """
+
+    return shopping_list_items(user).values_list(
+        'ingredient__name', 'ingredient__measurement_unit', 'amount'
+    ).iterator(chunk_size=STREAM_CHUNK_SIZE)
+
+
+class Echo:
+    """Буфер для csv.writer, возвращающий записанную строку."""
+
+    def write(self, value):
+        return value
+
+
+class ShoppingListRenderer(BaseRenderer):
+    """Базовый рендерер списка покупок.
+
+    stream() превращает строки (название, единица, количество)
+    в последовательность байтовых фрагментов для StreamingHttpResponse.
+    render() нужен для ответов с ошибками, которые DRF рендерит
+    выбранным рендерером.
+    """
+
+    charset = 'utf-8'
+
+    def stream(self, rows):
+        raise NotImplementedError
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, dict):
+            return '\n'.join(
+                f'{key}: {value}' for key, value in data.items()
+            ).encode()
+        return b''.join(self.stream(data))
+
+
+class TextShoppingListRenderer(ShoppingListRenderer):
+    media_type = 'text/plain'
+    format = 'txt'
+
+    def stream(self, rows):
+        yield 'Список покупок:\n\n'.encode()
+        for name, unit, total in rows:
+            yield f'{name} ({unit}) - {total}\n'.encode()
+
+
+class CSVShoppingListRenderer(ShoppingListRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+    header = ('Ингредиент', 'Единица измерения', 'Количество')
+
+    def stream(self, rows):
+        writer = csv.writer(Echo())
+        yield writer.writerow(self.header).encode()
+        for row in rows:
+            yield writer.writerow(row).encode()
+
+
+class JSONShoppingListRenderer(ORJSONRenderer):
+    format = 'json'
+
+    def stream(self, rows):
+        separator = b'['
+        for name, unit, total in rows:
+            yield separator + super().render({
+                'name': name,
+                'measurement_unit': unit,
+                'amount': total,
+            })
+            separator = b','
+        yield b']' if separator == b',' else b'[]'
+
+
+def chunked(fragments, size=STREAM_CHUNK_SIZE):
+    """Склеивает мелкие фрагменты в куски по size штук."""
+
+    buffer = []
+    for fragment in fragments:
+        buffer.append(fragment)
+        if len(buffer) >= size:
+            yield b''.join(buffer)
+            buffer = []
+    if buffer:
+        yield b''.join(buffer)
@@ -0,0 +1,133 @@
+"""Переход по короткой ссылке на рецепт.
+
+Код ссылки переводится в id рецепта через LRU в памяти процесса,
+затем общий кэш и только затем уникальный индекс в БД. Ссылка рецепта
+не меняется, поэтому записи сбрасываются только при удалении рецепта
+(в других процессах LRU может еще недолго вести на удаленный рецепт —
+фронтенд покажет 404).
+
+ShortLinkMiddleware отвечает на такие запросы сразу, минуя сессии,
+локализацию, CSRF, аутентификацию и DRF; без него тот же view
+вызывается через обычный URLconf.
+"""
+
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import Http404, HttpResponseNotAllowed, HttpResponseRedirect
+from django.urls import Resolver404, resolve
+
+from recipes.models import Recipe
+
+from .metrics import record_cache
+
+URL_NAME = 'short_link_redirect'
+CACHE_PREFIX = 'short-link'
+
+
+class LRUCache:
+    """Словарь ограниченного размера: лишним вытесняется самый старый."""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.data = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            value = self.data.get(key)
+            if value is not None:
+                self.data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        if self.maxsize <= 0:
+            return
+        with self.lock:
+            self.data[key] = value
+            self.data.move_to_end(key)
+            if len(self.data) > self.maxsize:
+                self.data.popitem(last=False)
+
+    def discard(self, key):
+        with self.lock:
+            self.data.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.data.clear()
+
+
+class ShortLinkResolver:
+    """Код короткой ссылки → id рецепта."""
+
+    def __init__(self):
+        self.local = LRUCache(settings.SHORT_LINK_LRU_SIZE)
+
+    def key(self, short_link):
+        return f'{CACHE_PREFIX}:{short_link}'
+
+    def resolve(self, short_link):
+        """Возвращает id рецепта или None, если ссылки нет."""
+
+        pk = self.local.get(short_link)
+        if pk is not None:
+            record_cache('short_links_local', hits=1)
+            return pk
+        record_cache('short_links_local', misses=1)
+        pk = cache.get(self.key(short_link))
+        if pk is None:
+            record_cache('short_links', misses=1)
+            pk = Recipe.objects.filter(
+                short_link=short_link
+            ).values_list('pk', flat=True).first()
+            if pk is None:
+                return None
+            cache.set(
+                self.key(short_link), pk, settings.SHORT_LINK_CACHE_TIMEOUT
+            )
+        else:
+            record_cache('short_links', hits=1)
+        self.local.set(short_link, pk)
+        return pk
+
+    def invalidate(self, short_link):
+        self.local.discard(short_link)
+        cache.delete(self.key(short_link))
+
+
+short_links = ShortLinkResolver()
+
+
+def short_link_redirect(request, short_link):
+    """Перенаправляет по короткой ссылке на страницу рецепта."""
+
+    if request.method not in ('GET', 'HEAD'):
+        return HttpResponseNotAllowed(['GET', 'HEAD'])
+    pk = short_links.resolve(short_link)
+    if pk is None:
+        raise Http404
+    return HttpResponseRedirect(f'/recipes/{pk}/')
+
+
+class ShortLinkMiddleware:
+    """Вызывает short_link_redirect, не проходя остальные middleware."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        path = request.path_info
+        # Короткая ссылка — единственный сегмент пути: /<код>/.
+        if path.count('/') != 2 or not path.endswith('/'):
+            return self.get_response(request)
+        try:
+            match = resolve(path)
+        except Resolver404:
+            return self.get_response(request)
+        if match.url_name != URL_NAME:
+            return self.get_response(request)
+        request.resolver_match = match
+        return match.func(request, *match.args, **match.kwargs)
@@ -0,0 +1,140 @@
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from ingridients.models import Ingredient
+from recipes.models import Favorite, IngredientInRecipe, Recipe, ShoppingCart
+from tags.models import Tag
+from users.models import User
+
+from . import images
+from .cache import (
+    RECIPE_COUNT_NAMESPACE,
+    bump_version,
+    catalog_namespace,
+    recipe_cache,
+    user_count_namespace,
+)
+from .short_links import short_links
+
+AUTHOR_PAYLOAD_FIELDS = {
+    'email', 'username', 'first_name', 'last_name', 'avatar'
+}
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def invalidate_recipe_counts(sender, **kwargs):
+    """Сбрасывает все закэшированные количества рецептов."""
+
+    if kwargs.get('action', 'post_').startswith('post_'):
+        transaction.on_commit(
+            lambda: bump_version(RECIPE_COUNT_NAMESPACE)
+        )
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_delete, sender=Favorite)
+@receiver(post_save, sender=ShoppingCart)
+@receiver(post_delete, sender=ShoppingCart)
+def invalidate_user_recipe_counts(sender, instance, **kwargs):
+    """Сбрасывает количества с фильтрами is_favorited и is_in_shopping_cart.
+
+    Избранное и корзина влияют только на выборки своего пользователя.
+    """
+
+    transaction.on_commit(
+        lambda: bump_version(user_count_namespace(instance.user_id))
+    )
+
+
+def invalidate_recipes_on_commit(ids, lists=False):
+    """Сбрасывает кэш рецептов после фиксации транзакции.
+
+    Пока транзакция не зафиксирована, другие запросы видят старые
+    данные и могли бы снова положить их в кэш.
+    """
+
+    def invalidate():
+        recipe_cache.invalidate(ids)
+        if lists:
+            recipe_cache.invalidate_lists()
+
+    transaction.on_commit(invalidate)
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def invalidate_recipe(sender, instance, **kwargs):
+    invalidate_recipes_on_commit([instance.pk], lists=True)
+
+
+@receiver(post_delete, sender=Recipe)
+def invalidate_short_link(sender, instance, **kwargs):
+    transaction.on_commit(lambda: short_links.invalidate(instance.short_link))
+
+
+@receiver(post_save, sender=IngredientInRecipe)
+@receiver(post_delete, sender=IngredientInRecipe)
+def invalidate_recipe_ingredients(sender, instance, **kwargs):
+    invalidate_recipes_on_commit([instance.recipe_id])
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def invalidate_recipe_tags(sender, instance, action, reverse, pk_set,
+                           **kwargs):
+    if not action.startswith('post_'):
+        return
+    if not reverse:
+        invalidate_recipes_on_commit([instance.pk], lists=True)
+    elif pk_set:
+        invalidate_recipes_on_commit(list(pk_set), lists=True)
+    else:
+        transaction.on_commit(recipe_cache.invalidate_all)
+
+
+@receiver(post_save, sender=User)
+def invalidate_author_recipes(sender, instance, created, update_fields,
+                              **kwargs):
+    """Сбрасывает рецепты автора при изменении его публичных данных."""
+
+    if created or update_fields is not None and not (
+        AUTHOR_PAYLOAD_FIELDS & set(update_fields)
+    ):
+        return
+    ids = list(instance.recipes.values_list('pk', flat=True))
+    if ids:
+        invalidate_recipes_on_commit(ids)
+
+
+@receiver(post_save, sender=Recipe)
+def schedule_recipe_image_variants(sender, instance, **kwargs):
+    images.schedule(images.RECIPE_IMAGE, instance)
+
+
+@receiver(post_save, sender=User)
+def schedule_avatar_variants(sender, instance, **kwargs):
+    images.schedule(images.AVATAR, instance)
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def invalidate_catalog_names(sender, **kwargs):
+    """Названия тегов и ингредиентов входят во все представления."""
+
+    transaction.on_commit(recipe_cache.invalidate_all)
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def bump_catalog_version(sender, **kwargs):
+    """Меняет версию справочника, чтобы перестроить его индексы."""
+
+    transaction.on_commit(lambda: bump_version(catalog_namespace(sender)))
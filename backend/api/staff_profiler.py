@@ -0,0 +1,244 @@
+"""Профилирование отдельного запроса по требованию сотрудника.
+
+Запрос профилируется, если в заголовке X-Profile или параметре
+?profile= передан PROFILER_TOKEN, а пользователь (по токену API или
+сессии) — сотрудник. Код view выполняется под cProfile, каждый
+SQL-запрос записывается и после ответа повторяется через
+EXPLAIN (ANALYZE) в транзакции, которая откатывается. Отчет
+сохраняется в ProfileReport (ссылка на админку — в заголовке
+X-Profile-Report) или, при X-Profile-Output: attachment /
+?profile_output=attachment, возвращается файлом вместо ответа.
+
+Отчеты видят все сотрудники в админке, поэтому в них не попадают ни
+параметры SQL-запросов, ни токен из адреса, а запросы к токенам,
+сессиям и паролям не объясняются: в планах видны значения условий.
+Потоковый ответ (StreamingHttpResponse) читается целиком внутри
+профилировщика, иначе запросы, сделанные при его отдаче, выполнились
+бы уже после записи отчета.
+"""
+
+import cProfile
+import hmac
+import io
+import pstats
+import time
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DatabaseError, connection, transaction
+from django.http import HttpResponse
+from django.urls import reverse
+
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.exceptions import AuthenticationFailed
+
+from .models import ProfileReport
+
+MAX_EXPLAINED_QUERIES = 50
+PROFILE_STATS_LIMIT = 40
+SKIPPED_PREFIXES = (
+    'SAVEPOINT', 'RELEASE', 'ROLLBACK', 'BEGIN', 'COMMIT', 'SET',
+)
+# Таблицы, значения из которых нельзя показывать даже в планах.
+SENSITIVE_TABLES = ('authtoken_token', 'django_session')
+
+
+class QueryRecorder:
+    """execute_wrapper: сохраняет SQL, параметры и длительность."""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append(
+                (sql, params, many, time.perf_counter() - started)
+            )
+
+
+def explain_prefix():
+    if connection.vendor == 'postgresql':
+        return connection.ops.explain_query_prefix(analyze=True, buffers=True)
+    return connection.ops.explain_query_prefix()
+
+
+def explain(sql, params):
+    """План запроса; транзакцию откатывает вызывающий."""
+
+    try:
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(f'{explain_prefix()} {sql}', params)
+            return '\n'.join(
+                ' '.join(str(column) for column in row)
+                for row in cursor.fetchall()
+            )
+    except DatabaseError as error:
+        return f'EXPLAIN не выполнен: {error}'
+
+
+def is_sensitive(sql):
+    """Запрос к токенам или сессиям либо запись пароля."""
+
+    lowered = sql.lower()
+    if any(table in lowered for table in SENSITIVE_TABLES):
+        return True
+    return '"password"' in lowered and not lowered.lstrip().startswith(
+        'select'
+    )
+
+
+def explain_queries(queries):
+    """Строки отчета о SQL-запросах с планами выполнения.
+
+    Одинаковые запросы с одинаковыми параметрами объясняются один раз.
+    Пишущие запросы тоже выполняются (ANALYZE), поэтому все EXPLAIN
+    идут в одной транзакции, которая затем откатывается. Параметры
+    используются только для EXPLAIN и в отчет не пишутся.
+    """
+
+    seen = {}
+    for sql, params, many, duration in queries:
+        if sql.lstrip().upper().startswith(SKIPPED_PREFIXES):
+            continue
+        key = (sql, repr(params))
+        if key in seen:
+            seen[key]['count'] += 1
+            seen[key]['duration'] += duration
+            continue
+        seen[key] = {
+            'sql': sql, 'params': params, 'many': many,
+            'count': 1, 'duration': duration,
+        }
+    lines = []
+    with transaction.atomic():
+        for number, item in enumerate(seen.values(), 1):
+            lines.append(
+                f'#{number} ×{item["count"]}, '
+                f'{item["duration"] * 1000:.2f} мс\n{item["sql"]}'
+            )
+            if is_sensitive(item['sql']):
+                plan = 'EXPLAIN пропущен: запрос с учетными данными.'
+            elif item['many']:
+                plan = 'executemany: EXPLAIN не выполнялся.'
+            elif number > MAX_EXPLAINED_QUERIES:
+                plan = 'EXPLAIN пропущен: слишком много запросов.'
+            else:
+                plan = explain(item['sql'], item['params'])
+            lines.append(f'{plan}\n')
+        transaction.set_rollback(True)
+    return lines
+
+
+class StaffProfilerMiddleware:
+    """Включает профилировщик для запроса сотрудника с PROFILER_TOKEN."""
+
+    header = 'HTTP_X_PROFILE'
+    param = 'profile'
+    output_header = 'HTTP_X_PROFILE_OUTPUT'
+    output_param = 'profile_output'
+
+    def __init__(self, get_response):
+        if not settings.PROFILER_TOKEN:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.token = settings.PROFILER_TOKEN.encode()
+
+    def requested(self, request):
+        token = request.META.get(self.header) or request.GET.get(self.param)
+        return bool(token) and hmac.compare_digest(
+            token.encode(), self.token
+        )
+
+    def get_staff_user(self, request):
+        try:
+            credentials = TokenAuthentication().authenticate(request)
+        except AuthenticationFailed:
+            return None
+        user = credentials[0] if credentials else getattr(
+            request, 'user', None
+        )
+        if user is not None and user.is_authenticated and user.is_staff:
+            return user
+        return None
+
+    def profiled_path(self, request):
+        """Путь запроса без параметров профилировщика."""
+
+        query = request.GET.copy()
+        for name in (self.param, self.output_param):
+            query.pop(name, None)
+        if not query:
+            return request.path
+        return f'{request.path}?{query.urlencode()}'
+
+    def __call__(self, request):
+        if not self.requested(request):
+            return self.get_response(request)
+        user = self.get_staff_user(request)
+        if user is None:
+            return self.get_response(request)
+
+        recorder = QueryRecorder()
+        profiler = cProfile.Profile()
+        started = time.perf_counter()
+        with connection.execute_wrapper(recorder):
+            profiler.enable()
+            try:
+                response = self.get_response(request)
+                if response.streaming:
+                    response.streaming_content = [
+                        b''.join(response.streaming_content)
+                    ]
+            finally:
+                profiler.disable()
+        elapsed = (time.perf_counter() - started) * 1000
+
+        report = ProfileReport.objects.create(
+            user=user,
+            method=request.method,
+            path=self.profiled_path(request),
+            status_code=response.status_code,
+            duration_ms=elapsed,
+            query_count=len(recorder.queries),
+            report=self.build_report(
+                request, response, profiler, recorder.queries, elapsed
+            ),
+        )
+        output = (
+            request.META.get(self.output_header)
+            or request.GET.get(self.output_param)
+        )
+        if output == 'attachment':
+            attachment = HttpResponse(
+                report.report, content_type='text/plain; charset=utf-8'
+            )
+            attachment['Content-Disposition'] = (
+                f'attachment; filename="profile-{report.pk}.txt"'
+            )
+            return attachment
+        response['X-Profile-Report'] = reverse(
+            'admin:api_profilereport_change', args=[report.pk]
+        )
+        return response
+
+    def build_report(self, request, response, profiler, queries, elapsed):
+        stats_stream = io.StringIO()
+        stats = pstats.Stats(profiler, stream=stats_stream)
+        stats.strip_dirs().sort_stats('cumulative').print_stats(
+            PROFILE_STATS_LIMIT
+        )
+        sql_time = sum(duration for *_, duration in queries) * 1000
+        return '\n'.join([
+            f'{request.method} {self.profiled_path(request)} '
+            f'→ {response.status_code}',
+            f'Время: {elapsed:.1f} мс, SQL: {len(queries)} запросов, '
+            f'{sql_time:.1f} мс',
+            '',
+            '== cProfile (по накопленному времени) ==',
+            stats_stream.getvalue(),
+            '== SQL и планы выполнения ==',
+            *explain_queries(queries),
+        ])
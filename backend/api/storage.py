@@ -0,0 +1,56 @@
+"""Хранилище медиафайлов с именами по содержимому.
+
+Файл сохраняется как <каталог upload_to>/<sha256 содержимого><расширение>,
+поэтому одинаковые загрузки хранятся один раз, а повторное сохранение
+только обновляет время изменения уже существующего файла и возвращает
+его имя: так collect_orphan_media не удалит старый файл, который
+снова начал использоваться. Один файл может
+принадлежать нескольким записям, поэтому код приложения файлы не
+удаляет: неиспользуемые убирает команда collect_orphan_media.
+"""
+
+import hashlib
+import os
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """FileSystemStorage, который называет файлы хэшем содержимого."""
+
+    def hashed_name(self, name, content):
+        digest = hashlib.sha256()
+        content.seek(0)
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content.seek(0)
+        directory = os.path.dirname(name)
+        extension = os.path.splitext(name)[1].lower()
+        return os.path.join(directory, digest.hexdigest() + extension)
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = self.hashed_name(name, content)
+        if self.exists(name):
+            try:
+                os.utime(self.path(name))
+                return name
+            except FileNotFoundError:
+                # Файл успели удалить: сохраняем заново.
+                pass
+        # При одновременной загрузке одинаковых файлов второй получит
+        # суффикс от get_available_name: лишняя копия, но не ошибка.
+        return super().save(name, content, max_length)
+
+    def save_derived(self, name, content, max_length=None):
+        """Сохраняет под заданным именем, без хэширования.
+
+        Для файлов, имя которых уже выведено из хэшированного
+        исходника (варианты изображений).
+        """
+
+        return super().save(name, content, max_length)
@@ -0,0 +1,702 @@
+import base64
+import hashlib
+import io
+import json
+import os
+import shutil
+import tempfile
+import time
+from datetime import timedelta
+from unittest import mock, skipIf, skipUnless
+from urllib.parse import parse_qs, urlsplit
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import Count
+from django.test import TestCase, override_settings
+from django.test.client import BOUNDARY, MULTIPART_CONTENT, encode_multipart
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from PIL import Image
+from rest_framework.authtoken.models import Token
+
+from ingridients.models import Ingredient
+from recipes.models import Favorite, IngredientInRecipe, Recipe
+from recipes.search import update_search_vectors
+from tags.models import Tag
+from users.models import User
+
+from .cache import bump_version, catalog_namespace
+from .catalog import content_etag
+from .ingredient_index import ingredient_index
+from .management.commands import collect_orphan_media
+from .query_budgets import (
+    BUDGETS,
+    PAGE_SIZES,
+    make_client,
+    reset_caches,
+    run_budget,
+    sample_objects,
+)
+from .short_links import LRUCache, short_links
+
+
+def create_user(username, **fields):
+    return User.objects.create(
+        username=username, email=f'{username}@example.com', **fields
+    )
+
+
+def create_recipe(author, **fields):
+    fields = {
+        'name': 'Рецепт', 'text': 'Описание', 'cooking_time': 10,
+        'image': 'recipes/test.png', **fields,
+    }
+    return Recipe.objects.create(author=author, **fields)
+
+
+class TemporaryMediaTestCase(TestCase):
+    """Тесты с MEDIA_ROOT во временном каталоге."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.media_root = tempfile.mkdtemp(prefix='foodgram-tests-')
+        cls.addClassCleanup(
+            shutil.rmtree, cls.media_root, ignore_errors=True
+        )
+        media = override_settings(MEDIA_ROOT=cls.media_root)
+        media.enable()
+        cls.addClassCleanup(media.disable)
+        super().setUpClass()
+
+
+class FakeDataTestCase(TemporaryMediaTestCase):
+    """Синтетические данные generate_fake_data во временном MEDIA_ROOT.
+
+    Запросы идут от имени автора с наибольшим числом подписок. Кэши
+    API сбрасываются перед каждым тестом: после отката транзакции
+    в них могли остаться данные предыдущего.
+    """
+
+    recipes = max(PAGE_SIZES) + 20
+
+    @classmethod
+    def setUpTestData(cls):
+        call_command(
+            'generate_fake_data', users=20, recipes=cls.recipes, seed=0,
+            stdout=io.StringIO(),
+        )
+        cls.user = User.objects.filter(recipes__isnull=False).annotate(
+            subscription_count=Count('subscriptions', distinct=True)
+        ).order_by('-subscription_count', 'pk').first()
+        cls.token = Token.objects.create(user=cls.user)
+
+    def setUp(self):
+        reset_caches()
+        self.clients = {
+            False: make_client(),
+            True: make_client(self.token.key),
+        }
+
+
+class QueryBudgetTests(FakeDataTestCase):
+    """Бюджеты SQL-запросов из api.query_budgets.
+
+    Списки проверяются на всех PAGE_SIZES. Время ответа зависит от
+    машины и проверяется только командой check_query_budgets.
+    """
+
+    def test_budgets(self):
+        sample = sample_objects(self.user)
+        for budget in BUDGETS:
+            with self.subTest(budget=budget.name):
+                failures = run_budget(
+                    self.clients, budget, sample, PAGE_SIZES,
+                    time_factor=None,
+                )
+                if failures:
+                    self.fail('\n'.join(failures))
+
+
+class GenerateFakeDataTests(FakeDataTestCase):
+    """Даты рецептов generate_fake_data и поле created_at модели."""
+
+    def test_dates_are_spread(self):
+        dates = list(Recipe.objects.values_list('created_at', flat=True))
+        self.assertEqual(len(set(dates)), self.recipes)
+        self.assertLess(min(dates), timezone.now() - timedelta(days=7))
+
+    def test_auto_now_add_is_kept(self):
+        self.assertTrue(Recipe._meta.get_field('created_at').auto_now_add)
+        recipe = create_recipe(self.user)
+        self.assertGreater(
+            recipe.created_at, timezone.now() - timedelta(minutes=1)
+        )
+
+
+class RecipeListQueryCountTests(FakeDataTestCase):
+    """Список рецептов выполняет одно и то же число запросов.
+
+    Флаги is_favorited и is_in_shopping_cart, теги и ингредиенты не
+    должны добавлять запросов на каждый рецепт страницы.
+    """
+
+    page_sizes = (6, 50)
+
+    def assert_list_queries(self, client, queries):
+        # На PostgreSQL точному COUNT(*) предшествует оценка из pg_class.
+        if connection.vendor == 'postgresql':
+            queries += 1
+        for limit in self.page_sizes:
+            with self.subTest(limit=limit):
+                reset_caches()
+                with self.assertNumQueries(queries):
+                    response = client.get(f'/api/recipes/?limit={limit}')
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(len(response.json()['results']), limit)
+
+    def test_anonymous_list(self):
+        # COUNT, страница, теги, ингредиенты.
+        self.assert_list_queries(self.clients[False], 4)
+
+    def test_authenticated_list(self):
+        # Плюс токен и избранное, корзина и подписки пользователя.
+        self.assert_list_queries(self.clients[True], 8)
+
+
+class CollectOrphanMediaTests(TemporaryMediaTestCase):
+    """collect_orphan_media удаляет только старые неиспользуемые файлы."""
+
+    def save_old(self, name, content, age=7 * 24 * 60 * 60):
+        name = default_storage.save(name, ContentFile(content))
+        timestamp = time.time() - age
+        os.utime(default_storage.path(name), (timestamp, timestamp))
+        return name
+
+    def collect(self):
+        call_command('collect_orphan_media', stdout=io.StringIO())
+
+    def test_deletes_old_orphan(self):
+        name = self.save_old('recipes/orphan.png', b'orphan')
+        self.collect()
+        self.assertFalse(default_storage.exists(name))
+
+    def test_keeps_referenced_file(self):
+        name = self.save_old('avatars/avatar.png', b'avatar')
+        User.objects.create(
+            username='owner', email='owner@example.com', avatar=name
+        )
+        self.collect()
+        self.assertTrue(default_storage.exists(name))
+
+    def test_keeps_recent_file(self):
+        name = self.save_old('recipes/recent.png', b'recent', age=60)
+        self.collect()
+        self.assertTrue(default_storage.exists(name))
+
+    def test_reuse_refreshes_modified_time(self):
+        name = self.save_old('recipes/reused.png', b'reused')
+        before = os.path.getmtime(default_storage.path(name))
+        reused = default_storage.save('recipes/other.png', ContentFile(
+            b'reused'
+        ))
+        self.assertEqual(reused, name)
+        self.assertGreater(
+            os.path.getmtime(default_storage.path(name)), before
+        )
+
+    def test_keeps_old_file_reused_during_collection(self):
+        """Файл загрузили снова после чтения ссылок из базы."""
+
+        name = self.save_old('recipes/race.png', b'race')
+        command = collect_orphan_media.Command
+        walk = command.walk
+
+        def walk_and_upload(command, directory):
+            default_storage.save(
+                'recipes/upload.png', ContentFile(b'race')
+            )
+            yield from walk(command, directory)
+
+        with mock.patch.object(command, 'walk', walk_and_upload):
+            self.collect()
+        self.assertTrue(default_storage.exists(name))
+
+
+class ShortLinkTests(TestCase):
+    """Переход по короткой ссылке и кэши ShortLinkResolver."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.recipe = create_recipe(create_user('author'))
+
+    def setUp(self):
+        short_links.local.clear()
+        reset_caches()
+        self.client = make_client()
+
+    def test_redirects_to_recipe(self):
+        response = self.client.get(f'/{self.recipe.short_link}/')
+        self.assertRedirects(
+            response, f'/recipes/{self.recipe.pk}/',
+            fetch_redirect_response=False,
+        )
+
+    def test_unknown_link_is_404(self):
+        self.assertEqual(self.client.get('/unknown123/').status_code, 404)
+        self.assertIsNone(short_links.local.get('unknown123'))
+
+    def test_second_resolve_uses_process_cache(self):
+        short_links.invalidate(self.recipe.short_link)
+        with self.assertNumQueries(1):
+            short_links.resolve(self.recipe.short_link)
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                short_links.resolve(self.recipe.short_link), self.recipe.pk
+            )
+
+    def test_delete_invalidates_caches(self):
+        short_link = self.recipe.short_link
+        short_links.resolve(short_link)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.recipe.delete()
+        self.assertIsNone(short_links.local.get(short_link))
+        self.assertEqual(self.client.get(f'/{short_link}/').status_code, 404)
+
+    def test_lru_evicts_least_recently_used(self):
+        lru = LRUCache(2)
+        lru.set('a', 1)
+        lru.set('b', 2)
+        lru.get('a')
+        lru.set('c', 3)
+        self.assertEqual(
+            (lru.get('a'), lru.get('b'), lru.get('c')), (1, None, 3)
+        )
+
+    def test_benchmark_runs_both_stacks(self):
+        stdout = io.StringIO()
+        call_command(
+            'benchmark_short_links', requests=5, links=1, stdout=stdout
+        )
+        rows = [
+            line.split()[0] for line in stdout.getvalue().splitlines()
+        ]
+        self.assertEqual(rows.count('fast'), 3)
+        self.assertEqual(rows.count('full'), 3)
+
+
+class RecipeSearchTests(TestCase):
+    """Параметр ?search= списка рецептов на обеих ветках фильтра."""
+
+    @classmethod
+    def setUpTestData(cls):
+        author = create_user('author')
+        flour, rice_flour = Ingredient.objects.bulk_create([
+            Ingredient(name='мука', measurement_unit='г'),
+            Ingredient(name='мука рисовая', measurement_unit='г'),
+        ])
+        cls.pancakes = create_recipe(
+            author, name='Блины', text='Тонкие, на молоке.'
+        )
+        cls.fritters = create_recipe(
+            author, name='Оладьи', text='Пышнее, чем блины.'
+        )
+        create_recipe(author, name='Сырники', text='Из творога.')
+        IngredientInRecipe.objects.bulk_create([
+            IngredientInRecipe(
+                recipe=cls.pancakes, ingredient=ingredient, amount=100
+            )
+            for ingredient in (flour, rice_flour)
+        ])
+        update_search_vectors()
+
+    def setUp(self):
+        reset_caches()
+        self.client = make_client()
+
+    def search(self, term):
+        response = self.client.get('/api/recipes/', {'search': term})
+        self.assertEqual(response.status_code, 200)
+        return [recipe['name'] for recipe in response.json()['results']]
+
+    @skipUnless(connection.vendor == 'postgresql', 'websearch — PostgreSQL')
+    def test_ranks_name_above_text(self):
+        self.assertEqual(self.search('блинами'), ['Блины', 'Оладьи'])
+
+    @skipUnless(connection.vendor == 'postgresql', 'websearch — PostgreSQL')
+    def test_websearch_syntax(self):
+        self.assertEqual(self.search('блины -оладьи'), ['Блины'])
+        self.assertEqual(self.search('"из творога"'), ['Сырники'])
+
+    @skipIf(connection.vendor == 'postgresql', 'icontains — не PostgreSQL')
+    def test_substring_fallback(self):
+        # LIKE в SQLite не сворачивает регистр кириллицы.
+        self.assertEqual(self.search('лин'), ['Оладьи', 'Блины'])
+
+    def test_ingredient_match_is_not_duplicated(self):
+        self.assertEqual(self.search('мука'), ['Блины'])
+
+
+class CatalogSnapshotTests(TestCase):
+    """Валидаторы ответов справочников: ETag и Last-Modified."""
+
+    @classmethod
+    def setUpTestData(cls):
+        Tag.objects.bulk_create([
+            Tag(name='Завтрак', slug='breakfast'),
+            Tag(name='Обед', slug='lunch'),
+        ])
+        Ingredient.objects.bulk_create([
+            Ingredient(name='мука', measurement_unit='г'),
+            Ingredient(name='молоко', measurement_unit='мл'),
+        ])
+
+    def setUp(self):
+        reset_caches()
+        self.client = make_client()
+
+    def test_validators(self):
+        response = self.client.get('/api/tags/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['ETag'], content_etag(response.content))
+        self.assertIn('Last-Modified', response)
+        self.assertEqual(len(response.json()), 2)
+
+    def test_if_none_match(self):
+        etag = self.client.get('/api/tags/')['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get(
+                '/api/tags/', HTTP_IF_NONE_MATCH=etag
+            )
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(response.content, b'')
+
+    def test_if_modified_since(self):
+        last_modified = self.client.get('/api/tags/')['Last-Modified']
+        response = self.client.get(
+            '/api/tags/', HTTP_IF_MODIFIED_SINCE=last_modified
+        )
+        self.assertEqual(response.status_code, 304)
+
+    def test_full_list_is_not_hashed_per_request(self):
+        self.client.get('/api/tags/')
+        with mock.patch('api.catalog.hashlib.md5', wraps=hashlib.md5) as md5:
+            response = self.client.get('/api/tags/')
+        self.assertEqual(response.status_code, 200)
+        md5.assert_not_called()
+
+    def test_subset_has_own_etag(self):
+        full = self.client.get('/api/ingredients/')
+        subset = self.client.get('/api/ingredients/', {'name': 'мук'})
+        self.assertEqual(
+            [item['name'] for item in subset.json()], ['мука']
+        )
+        self.assertEqual(subset['ETag'], content_etag(subset.content))
+        self.assertNotEqual(subset['ETag'], full['ETag'])
+        response = self.client.get(
+            '/api/ingredients/', {'name': 'мук'},
+            HTTP_IF_NONE_MATCH=subset['ETag'],
+        )
+        self.assertEqual(response.status_code, 304)
+
+    def test_change_replaces_etag(self):
+        etag = self.client.get('/api/tags/')['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            Tag.objects.create(name='Ужин', slug='dinner')
+        response = self.client.get('/api/tags/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()), 3)
+        self.assertNotEqual(response['ETag'], etag)
+
+
+class IngredientIndexTests(TestCase):
+    """Поиск ingredient_index и замена устаревшего снимка."""
+
+    @classmethod
+    def setUpTestData(cls):
+        Ingredient.objects.bulk_create([
+            Ingredient(name=name, measurement_unit='г')
+            for name in (
+                'сахар', 'Молоко', 'мука', 'сгущенное молоко',
+                'молоко топленое', 'соль',
+            )
+        ])
+
+    def setUp(self):
+        reset_caches()
+
+    def names(self, query):
+        return [item['name'] for item in json.loads(
+            ingredient_index.search(query)
+        )]
+
+    def test_prefix_then_substring(self):
+        self.assertEqual(self.names('молоко'), [
+            'Молоко', 'молоко топленое', 'сгущенное молоко',
+        ])
+
+    def test_query_is_normalized(self):
+        self.assertEqual(self.names('  МУ '), ['мука'])
+        self.assertEqual(self.names('молоко,  топленое'), [
+            'молоко топленое',
+        ])
+
+    def test_empty_query_returns_catalog_by_id(self):
+        self.assertEqual(self.names(''), list(
+            Ingredient.objects.order_by('pk').values_list('name', flat=True)
+        ))
+
+    def test_bump_replaces_stale_snapshot(self):
+        stale = ingredient_index.ensure_fresh()
+        Ingredient.objects.bulk_create([
+            Ingredient(name='молоко козье', measurement_unit='мл'),
+        ])
+        self.assertIs(ingredient_index.ensure_fresh(), stale)
+        self.assertNotIn('молоко козье', self.names('молоко'))
+
+        bump_version(catalog_namespace(Ingredient))
+
+        fresh = ingredient_index.ensure_fresh()
+        self.assertIsNot(fresh, stale)
+        self.assertGreater(fresh.version, stale.version)
+        self.assertIn('молоко козье', self.names('молоко'))
+
+
+class KeysetPaginationTests(TestCase):
+    """Курсорный режим списка рецептов: ?pagination=cursor."""
+
+    @classmethod
+    def setUpTestData(cls):
+        author = create_user('author')
+        cls.recipes = [
+            create_recipe(author, name=f'Рецепт {number}')
+            for number in range(5)
+        ]
+        # Одинаковое время создания: порядок решает id.
+        Recipe.objects.filter(pk__in=[
+            recipe.pk for recipe in cls.recipes[1:4]
+        ]).update(created_at=cls.recipes[2].created_at)
+        cls.expected = list(Recipe.objects.order_by(
+            '-created_at', '-id'
+        ).values_list('pk', flat=True))
+
+    def setUp(self):
+        reset_caches()
+        self.client = make_client()
+
+    def get(self, url, params=None):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def pks(self, page):
+        return [recipe['id'] for recipe in page['results']]
+
+    @staticmethod
+    def cursor(payload):
+        return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+
+    def test_walks_forward_and_back_without_gaps(self):
+        pages = [self.get(
+            '/api/recipes/', {'pagination': 'cursor', 'limit': 2}
+        )]
+        self.assertIsNone(pages[0]['previous'])
+        while pages[-1]['next']:
+            pages.append(self.get(pages[-1]['next']))
+        self.assertEqual(
+            [pk for page in pages for pk in self.pks(page)], self.expected
+        )
+        self.assertEqual(len(pages), 3)
+        previous = self.get(pages[-1]['previous'])
+        self.assertEqual(self.pks(previous), self.pks(pages[1]))
+        self.assertEqual(
+            self.pks(self.get(previous['previous'])), self.pks(pages[0])
+        )
+
+    def test_cursor_is_base64_json_position(self):
+        page = self.get(
+            '/api/recipes/', {'pagination': 'cursor', 'limit': 2}
+        )
+        cursor = parse_qs(urlsplit(page['next']).query)['cursor'][0]
+        payload = json.loads(base64.urlsafe_b64decode(cursor))
+        last = Recipe.objects.get(pk=self.pks(page)[-1])
+        self.assertEqual(payload, {
+            'p': [last.created_at.isoformat(), str(last.pk)], 'r': False,
+        })
+
+    def test_seek_filter_breaks_ties_by_id(self):
+        tied = Recipe.objects.get(pk=self.expected[2])
+        page = self.get('/api/recipes/', {'limit': 10, 'cursor': self.cursor(
+            {'p': [tied.created_at.isoformat(), tied.pk], 'r': False}
+        )})
+        self.assertEqual(self.pks(page), self.expected[3:])
+
+    def test_invalid_cursor_is_400(self):
+        cursors = {
+            'not base64': '%%%',
+            'not json': base64.urlsafe_b64encode(b'\xff').decode(),
+            'list': self.cursor([1, 2]),
+            'short position': self.cursor({'p': ['2024-01-01']}),
+            'null position': self.cursor({'p': [None, None]}),
+            'bad date': self.cursor({'p': ['вчера', 1]}),
+        }
+        for case, cursor in cursors.items():
+            with self.subTest(case=case):
+                response = self.client.get(
+                    '/api/recipes/', {'cursor': cursor}
+                )
+                self.assertEqual(response.status_code, 400)
+
+    def test_page_number_output_unchanged(self):
+        page = self.get('/api/recipes/', {'limit': 2, 'page': 2})
+        self.assertEqual(
+            list(page), ['count', 'next', 'previous', 'results']
+        )
+        self.assertEqual(page['count'], len(self.expected))
+        self.assertEqual(self.pks(page), self.expected[2:4])
+        self.assertIn('page=3', page['next'])
+
+
+class CachedCountTests(TestCase):
+    """Кэш COUNT(*) списка рецептов и его сброс."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = create_user('author')
+        cls.reader = create_user('reader')
+        cls.recipes = [
+            create_recipe(cls.author, name=f'Рецепт {number}')
+            for number in range(3)
+        ]
+        Favorite.objects.bulk_create([
+            Favorite(user=cls.author, recipe=recipe)
+            for recipe in cls.recipes[:2]
+        ] + [Favorite(user=cls.reader, recipe=cls.recipes[2])])
+        cls.tokens = {
+            user: Token.objects.create(user=user).key
+            for user in (cls.author, cls.reader)
+        }
+
+    def setUp(self):
+        reset_caches()
+        self.clients = {
+            user: make_client(token) for user, token in self.tokens.items()
+        }
+
+    def count(self, client, **params):
+        """Количество из ответа и признак выполненного COUNT(*)."""
+
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get('/api/recipes/', params)
+        self.assertEqual(response.status_code, 200)
+        counted = any(
+            'COUNT(' in query['sql'].upper() for query in queries
+        )
+        return response.json()['count'], counted
+
+    def test_count_is_cached(self):
+        client = self.clients[self.reader]
+        self.assertEqual(self.count(client, limit=2), (3, True))
+        self.assertEqual(self.count(client, limit=2, page=2), (3, False))
+
+    def test_create_and_delete_invalidate(self):
+        client = self.clients[self.reader]
+        self.count(client)
+        # Варианты изображения к счетчику не относятся.
+        with mock.patch('api.images.schedule'), \
+                self.captureOnCommitCallbacks(execute=True):
+            recipe = create_recipe(self.author)
+        self.assertEqual(self.count(client), (4, True))
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe.delete()
+        self.assertEqual(self.count(client), (3, True))
+
+    def test_favorite_counts_are_per_user(self):
+        author, reader = self.clients[self.author], self.clients[self.reader]
+        self.assertEqual(self.count(author, is_favorited=1), (2, True))
+        self.assertEqual(self.count(reader, is_favorited=1), (1, True))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = reader.post(
+                f'/api/recipes/{self.recipes[0].pk}/favorite/'
+            )
+        self.assertEqual(response.status_code, 201)
+
+        self.assertEqual(self.count(reader, is_favorited=1), (2, True))
+        self.assertEqual(self.count(author, is_favorited=1), (2, False))
+
+
+def png_file(size=(20, 10), name='image.png'):
+    buffer = io.BytesIO()
+    Image.new('RGB', size, 'orange').save(buffer, 'PNG')
+    return SimpleUploadedFile(name, buffer.getvalue(), 'image/png')
+
+
+class MultipartUploadTests(TemporaryMediaTestCase):
+    """Загрузка изображений файлом в multipart/form-data."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('author')
+        cls.token = Token.objects.create(user=cls.user)
+        cls.tag = Tag.objects.create(name='Завтрак', slug='breakfast')
+        cls.ingredient = Ingredient.objects.create(
+            name='мука', measurement_unit='г'
+        )
+
+    def setUp(self):
+        self.client = make_client(self.token.key)
+
+    def create_recipe(self, image):
+        return self.client.post('/api/recipes/', {
+            'name': 'Блины', 'text': 'Описание', 'cooking_time': 10,
+            'tags': [self.tag.pk],
+            'ingredients': json.dumps(
+                [{'id': self.ingredient.pk, 'amount': 100}]
+            ),
+            'image': image,
+        })
+
+    def test_create_recipe(self):
+        response = self.create_recipe(png_file())
+        self.assertEqual(response.status_code, 201, response.content)
+        recipe = Recipe.objects.get(pk=response.json()['id'])
+        self.assertTrue(recipe.image.name.endswith('.png'))
+        self.assertTrue(default_storage.exists(recipe.image.name))
+        self.assertEqual(recipe.recipe_ingredients.get().amount, 100)
+
+    @override_settings(IMAGE_MAX_PIXELS=100)
+    def test_too_many_pixels(self):
+        response = self.create_recipe(png_file())
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('мегапикселей', response.json()['image'][0])
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_not_an_image(self):
+        response = self.create_recipe(SimpleUploadedFile(
+            'image.png', b'not an image', 'image/png'
+        ))
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('image', response.json())
+
+    @override_settings(IMAGE_UPLOAD_MAX_SIZE=64)
+    def test_too_large(self):
+        response = self.create_recipe(png_file())
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('Файл больше', response.json()['image'][0])
+
+    def test_avatar_put(self):
+        response = self.client.put(
+            '/api/users/me/avatar/',
+            encode_multipart(BOUNDARY, {'avatar': png_file()}),
+            content_type=MULTIPART_CONTENT,
+        )
+        self.assertEqual(response.status_code, 200, response.content)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.avatar.name.startswith('avatars/'))
+        self.assertTrue(default_storage.exists(self.user.avatar.name))
@@ -0,0 +1,128 @@
+"""Загрузка изображений через multipart/form-data.
+
+Файл пишется во временный файл по мере чтения тела запроса
+(TemporaryFileUploadHandler), а LimitedImageUploadHandler перед ним
+считает байты и по первым фрагментам разбирает заголовок картинки:
+слишком большой файл, слишком много пикселей или не изображение
+отклоняются ошибкой валидации, не дочитывая тело. Те же лимиты
+validate_image_limits применяет и к изображениям в base64.
+"""
+
+import io
+
+from django.conf import settings
+from django.core.files.uploadhandler import (
+    FileUploadHandler,
+    TemporaryFileUploadHandler,
+)
+
+from PIL import Image
+from rest_framework.exceptions import ValidationError
+
+# Сколько байт файла читать в поисках заголовка изображения.
+HEADER_LIMIT = 1024 * 1024
+
+TOO_LARGE_MESSAGE = 'Файл больше {limit:g} МБ.'
+TOO_MANY_PIXELS_MESSAGE = 'Изображение больше {limit:g} мегапикселей.'
+NOT_AN_IMAGE_MESSAGE = 'Загрузите корректное изображение.'
+
+
+def size_error():
+    return TOO_LARGE_MESSAGE.format(
+        limit=round(settings.IMAGE_UPLOAD_MAX_SIZE / (1024 * 1024), 1)
+    )
+
+
+def pixels_error():
+    return TOO_MANY_PIXELS_MESSAGE.format(
+        limit=round(settings.IMAGE_MAX_PIXELS / 1_000_000, 1)
+    )
+
+
+def validate_image_limits(file):
+    """Проверяет размер файла и число пикселей по заголовку.
+
+    Возвращает текст ошибки или None.
+    """
+
+    if file.size > settings.IMAGE_UPLOAD_MAX_SIZE:
+        return size_error()
+    position = file.tell()
+    try:
+        with Image.open(file) as image:
+            width, height = image.size
+    except Image.DecompressionBombError:
+        return pixels_error()
+    except OSError:
+        return NOT_AN_IMAGE_MESSAGE
+    finally:
+        file.seek(position)
+    if width * height > settings.IMAGE_MAX_PIXELS:
+        return pixels_error()
+    return None
+
+
+class LimitedImageUploadHandler(FileUploadHandler):
+    """Отклоняет загрузку, как только нарушен лимит.
+
+    Сам файл не сохраняет: фрагменты передаются следующему
+    обработчику.
+    """
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.received = 0
+        self.header = bytearray()
+
+    def reject(self, message):
+        raise ValidationError({self.field_name: [message]})
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received > settings.IMAGE_UPLOAD_MAX_SIZE:
+            self.reject(size_error())
+        if self.header is not None:
+            self.read_header(raw_data)
+        return raw_data
+
+    def read_header(self, raw_data):
+        """Пытается узнать размеры картинки по уже прочитанным байтам.
+
+        Image.open читает только заголовок и не декодирует пиксели.
+        """
+
+        self.header += raw_data
+        try:
+            with Image.open(io.BytesIO(self.header)) as image:
+                width, height = image.size
+        except Image.DecompressionBombError:
+            self.reject(pixels_error())
+        except OSError:
+            if len(self.header) > HEADER_LIMIT:
+                self.reject(NOT_AN_IMAGE_MESSAGE)
+            return
+        if width * height > settings.IMAGE_MAX_PIXELS:
+            self.reject(pixels_error())
+        # Заголовок разобран, дальше только считаем байты.
+        self.header = None
+
+    def file_complete(self, file_size):
+        if self.header is not None:
+            self.reject(NOT_AN_IMAGE_MESSAGE)
+        return None
+
+
+class ImageUploadMixin:
+    """Потоковая загрузка изображений для ViewSet.
+
+    Файлы из multipart/form-data пишутся на диск, а не в память, и
+    проверяются по мере чтения.
+    """
+
+    def initialize_request(self, request, *args, **kwargs):
+        if not hasattr(request, '_files'):
+            request.upload_handlers = [
+                LimitedImageUploadHandler(request),
+                TemporaryFileUploadHandler(request),
+            ]
+        return super().initialize_request(request, *args, **kwargs)
@@ -0,0 +1,60 @@
+from functools import cached_property
+
+from recipes.models import Favorite, ShoppingCart
+from users.models import Subscriptions
+
+
+class ViewerState:
+    """Избранное, корзина и подписки текущего пользователя.
+
+    Каждый набор id загружается одним запросом при первом обращении
+    и дальше используется для всех объектов ответа, поэтому флаги
+    is_favorited, is_in_shopping_cart и is_subscribed не требуют
+    запросов на каждую строку. Для анонима все наборы пустые.
+    """
+
+    request_attribute = '_viewer_state'
+
+    def __init__(self, user=None):
+        self.user = user
+        self.is_authenticated = bool(user and user.is_authenticated)
+
+    @classmethod
+    def for_request(cls, request):
+        """Возвращает состояние, общее для всех сериализаторов запроса."""
+
+        if request is None:
+            return cls()
+        state = getattr(request, cls.request_attribute, None)
+        if state is None:
+            state = cls(request.user)
+            setattr(request, cls.request_attribute, state)
+        return state
+
+    def _ids(self, queryset, field):
+        if not self.is_authenticated:
+            return frozenset()
+        return frozenset(
+            queryset.filter(user=self.user).values_list(field, flat=True)
+        )
+
+    @cached_property
+    def favorite_ids(self):
+        return self._ids(Favorite.objects, 'recipe_id')
+
+    @cached_property
+    def cart_ids(self):
+        return self._ids(ShoppingCart.objects, 'recipe_id')
+
+    @cached_property
+    def subscribed_author_ids(self):
+        return self._ids(Subscriptions.objects, 'author_id')
+
+    def is_favorited(self, recipe):
+        return recipe.pk in self.favorite_ids
+
+    def is_in_shopping_cart(self, recipe):
+        return recipe.pk in self.cart_ids
+
+    def is_subscribed(self, author):
+        return author.pk in self.subscribed_author_ids
@@ -1,10 +1,18 @@
-from django.db.models import Sum
-from django.http import HttpResponse, HttpResponseRedirect
+from django.db.models import (
+    Count,
+    Exists,
+    OuterRef,
+    Prefetch,
+    Subquery,
+    Value,
+)
+from django.db.models.functions import Coalesce
+from django.http import Http404, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser.views import UserViewSet as DjoserUserViewSet
-from rest_framework import filters, permissions, status, viewsets
+from rest_framework import permissions, status, viewsets
 from rest_framework.decorators import action
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
@@ -19,9 +27,17 @@ from recipes.models import (
 )
 from users.models import Subscriptions, User
 
-from .filters import IngredientSearchFilter, RecipeFilter
-from .pagination import PageLimitPagination
+from .cache import recipe_cache
+from .catalog import tag_catalog
+from .filters import (
+    IngredientSearchFilter,
+    RecipeFilter,
+    RecipeSearchFilter,
+)
+from .ingredient_index import ingredient_index
+from .pagination import CachedCountPagination, PageLimitPagination
 from .permissions import IsAuthorOrReadOnly
+from .profiling import span
 from .serializers import (
     AvatarSerializer,
     FavoriteSerializer,
@@ -29,20 +45,43 @@ from .serializers import (
     RecipeCreateUpdateSerializer,
     RecipeSerializer,
     ShoppingCartSerializer,
+    ShoppingListItemSerializer,
     SubscriptionCreateSerializer,
     SubscriptionDeleteValidator,
     SubscriptionSerializer,
     TagSerializer,
     UserSerializer,
 )
+from .shopping_list import (
+    CSVShoppingListRenderer,
+    JSONShoppingListRenderer,
+    TextShoppingListRenderer,
+    chunked,
+    shopping_list_items,
+    shopping_list_rows,
+)
+from .uploads import ImageUploadMixin
+from .viewer_state import ViewerState
+
 
+class ViewerStateContextMixin:
+    """Добавляет в контекст сериализаторов ViewerState запроса."""
 
-class UserViewSet(DjoserUserViewSet):
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['viewer_state'] = ViewerState.for_request(self.request)
+        return context
+
+
+class UserViewSet(
+    ImageUploadMixin, ViewerStateContextMixin, DjoserUserViewSet
+):
     """ViewSet для работы с пользователями."""
 
     queryset = User.objects.all()
     serializer_class = UserSerializer
     pagination_class = PageLimitPagination
+    keyset_ordering = ('id',)
 
     def get_permissions(self):
         """Определяет права доступа в зависимости от действия.
@@ -86,10 +125,49 @@ class UserViewSet(DjoserUserViewSet):
 
         user = request.user
         if user.avatar:
-            user.avatar.delete()
-            user.save()
+            # Файл может быть общим с другими пользователями (хранилище
+            # по содержимому); неиспользуемые удаляет collect_orphan_media.
+            user.avatar = None
+            user.avatar_variants = {}
+            user.save(update_fields=['avatar', 'avatar_variants'])
         return Response(status=status.HTTP_204_NO_CONTENT)
 
+    def get_recipes_limit(self):
+        """recipes_limit из запроса; None — без ограничения."""
+
+        try:
+            return max(int(self.request.query_params['recipes_limit']), 0)
+        except (KeyError, ValueError):
+            return None
+
+    def get_subscription_authors(self):
+        """Авторы с числом рецептов и первыми recipes_limit рецептами.
+
+        Рецепты всех авторов страницы читаются одним запросом: срез
+        в Prefetch Django выполняет через ROW_NUMBER() OVER
+        (PARTITION BY author_id), поэтому число запросов не зависит
+        ни от размера страницы, ни от recipes_limit.
+        """
+
+        recipes = Recipe.objects.order_by('-created_at', '-id').only(
+            'id', 'name', 'image', 'cooking_time', 'author'
+        )
+        limit = self.get_recipes_limit()
+        if limit is not None:
+            recipes = recipes[:limit]
+        # Подзапрос, а не Count('recipes'): без GROUP BY подсчет
+        # авторов для пагинации не соединяется с рецептами.
+        recipes_count = Recipe.objects.filter(
+            author=OuterRef('pk')
+        ).order_by().values('author').annotate(
+            count=Count('pk')
+        ).values('count')
+        return User.objects.annotate(
+            recipes_count=Coalesce(Subquery(recipes_count), 0)
+        ).prefetch_related(Prefetch(
+            'recipes', queryset=recipes, to_attr='subscription_recipes'
+        ))
+
     @action(
         detail=True,
         methods=['post'],
@@ -99,15 +177,16 @@ class UserViewSet(DjoserUserViewSet):
     def subscribe(self, request, id=None):
         """Добавляет подписку на пользователя."""
 
-        author = get_object_or_404(User, id=id)
+        author = get_object_or_404(self.get_subscription_authors(), id=id)
         serializer = SubscriptionCreateSerializer(
             data=request.data,
             context={'request': request, 'author': author}
         )
         serializer.is_valid(raise_exception=True)
         serializer.save()
+        author.is_subscribed = True
         response_serializer = SubscriptionSerializer(
-            author, context={'request': request}
+            author, context=self.get_serializer_context()
         )
         return Response(
             response_serializer.data, status=status.HTTP_201_CREATED
@@ -135,12 +214,16 @@ class UserViewSet(DjoserUserViewSet):
         """Возвращает список подписок текущего пользователя."""
 
         user = request.user
-        queryset = User.objects.filter(subscribers__user=user)
+        queryset = self.get_subscription_authors().filter(
+            subscribers__user=user
+        ).annotate(is_subscribed=Value(True))
         pages = self.paginate_queryset(queryset)
         serializer = SubscriptionSerializer(
-            pages, many=True, context={"request": request}
+            pages, many=True, context=self.get_serializer_context()
         )
-        return self.get_paginated_response(serializer.data)
+        with span('serialize'):
+            data = serializer.data
+        return self.get_paginated_response(data)
 
 
 class TagViewSet(viewsets.ReadOnlyModelViewSet):
@@ -150,6 +233,11 @@ class TagViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = TagSerializer
     pagination_class = None
 
+    def list(self, request, *args, **kwargs):
+        """Отдает заранее сериализованный список тегов с ETag."""
+
+        return tag_catalog.response(request)
+
 
 class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
     """ViewSet для работы с ингридиентами."""
@@ -160,8 +248,21 @@ class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
     filter_backends = [IngredientSearchFilter]
     search_fields = ['^name']
 
+    def list(self, request, *args, **kwargs):
+        """Ищет ингредиенты по индексу в памяти, без запросов к БД.
+
+        Ответ содержит ETag и Last-Modified и может вернуть 304.
+        """
+
+        name = request.query_params.get(
+            IngredientSearchFilter.search_param, ''
+        )
+        return ingredient_index.response(request, name)
 
-class RecipeViewSet(viewsets.ModelViewSet):
+
+class RecipeViewSet(
+    ImageUploadMixin, ViewerStateContextMixin, viewsets.ModelViewSet
+):
     """ViewSet для работы с рецептами."""
 
     queryset = Recipe.objects.all()
@@ -170,10 +271,104 @@ class RecipeViewSet(viewsets.ModelViewSet):
         permissions.IsAuthenticatedOrReadOnly,
         IsAuthorOrReadOnly,
     ]
-    pagination_class = PageLimitPagination
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter]
+    pagination_class = CachedCountPagination
+    keyset_ordering = ('-created_at', '-id')
+    filter_backends = [DjangoFilterBackend, RecipeSearchFilter]
     filterset_class = RecipeFilter
 
+    def get_public_queryset(self):
+        """Возвращает рецепты со всеми данными для сериализации.
+
+        Автор подтягивается через JOIN, теги и ингредиенты — через
+        prefetch. Количество запросов не зависит от размера страницы.
+        search_vector нужен только фильтру поиска и не загружается.
+        """
+
+        return Recipe.objects.defer('search_vector').select_related(
+            'author'
+        ).prefetch_related(
+            'tags',
+            Prefetch(
+                'recipe_ingredients',
+                queryset=IngredientInRecipe.objects.select_related(
+                    'ingredient'
+                )
+            ),
+        )
+
+    def get_queryset(self):
+        """Добавляет к рецептам флаги текущего пользователя.
+
+        Избранное, корзина и подписка на автора считаются подзапросами
+        Exists в том же SQL-запросе.
+        """
+
+        user = self.request.user
+        queryset = self.get_public_queryset()
+        if not user.is_authenticated:
+            return queryset.annotate(
+                is_favorited=Value(False),
+                is_in_shopping_cart=Value(False),
+                is_author_subscribed=Value(False),
+            )
+        return queryset.annotate(
+            is_favorited=Exists(Favorite.objects.filter(
+                user=user, recipe=OuterRef('pk')
+            )),
+            is_in_shopping_cart=Exists(ShoppingCart.objects.filter(
+                user=user, recipe=OuterRef('pk')
+            )),
+            is_author_subscribed=Exists(Subscriptions.objects.filter(
+                user=user, author=OuterRef('author')
+            )),
+        )
+
+    def list(self, request, *args, **kwargs):
+        """Список рецептов из кэша с флагами текущего пользователя."""
+
+        if not recipe_cache.enabled:
+            return super().list(request, *args, **kwargs)
+        key = recipe_cache.list_key(request)
+        entry = recipe_cache.get_list(key) if key else None
+        if entry is None:
+            queryset = self.filter_queryset(self.get_public_queryset())
+            page = self.paginate_queryset(queryset)
+            payloads = recipe_cache.serialize(page)
+            envelope = dict(self.get_paginated_response([]).data)
+            if key:
+                recipe_cache.set_list(
+                    key, envelope, [payload['id'] for payload in payloads]
+                )
+        else:
+            envelope, ids = entry
+            payloads = recipe_cache.get_payloads(ids, self._load_recipes)
+        viewer_state = ViewerState.for_request(request)
+        with span('serialize'):
+            envelope['results'] = [
+                recipe_cache.overlay(payload, request, viewer_state)
+                for payload in payloads
+            ]
+        return Response(envelope)
+
+    def retrieve(self, request, *args, **kwargs):
+        """Рецепт из кэша с флагами текущего пользователя."""
+
+        if not recipe_cache.enabled:
+            return super().retrieve(request, *args, **kwargs)
+        try:
+            pk = int(kwargs[self.lookup_url_kwarg or self.lookup_field])
+        except ValueError:
+            raise Http404
+        payloads = recipe_cache.get_payloads([pk], self._load_recipes)
+        if not payloads:
+            raise Http404
+        return Response(recipe_cache.overlay(
+            payloads[0], request, ViewerState.for_request(request)
+        ))
+
+    def _load_recipes(self, ids):
+        return self.get_public_queryset().filter(pk__in=ids)
+
     def get_serializer_class(self):
         """Определяет сериализатор в зависимости от действия."""
 
@@ -240,35 +435,47 @@ class RecipeViewSet(viewsets.ModelViewSet):
         detail=False,
         methods=['get'],
         permission_classes=[IsAuthenticated],
-        url_path='download_shopping_cart'
+        url_path='shopping_list'
     )
+    def shopping_list(self, request):
+        """Список покупок: суммарное количество ингредиентов из корзины."""
+
+        serializer = ShoppingListItemSerializer(
+            shopping_list_items(request.user).select_related('ingredient'),
+            many=True,
+        )
+        with span('serialize'):
+            data = serializer.data
+        return Response(data)
+
     @action(
         detail=False,
         methods=['get'],
         permission_classes=[IsAuthenticated],
-        url_path='download_shopping_cart'
+        url_path='download_shopping_cart',
+        renderer_classes=[
+            TextShoppingListRenderer,
+            CSVShoppingListRenderer,
+            JSONShoppingListRenderer,
+        ],
     )
     def download_shopping_cart(self, request):
-        """Генерирует текстовый файл со списком покупок."""
-
-        ingredients = IngredientInRecipe.objects.filter(
-            recipe__in=ShoppingCart.objects.filter(
-                user=request.user
-            ).values('recipe')
-        ).values(
-            'ingredient__name',
-            'ingredient__measurement_unit'
-        ).annotate(total=Sum('amount'))
-        text = 'Список покупок:\n\n'
-        for ing in ingredients:
-            text += (
-                f"{ing['ingredient__name']} "
-                f"({ing['ingredient__measurement_unit']}) - "
-                f"{ing['total']}\n"
-            )
-        response = HttpResponse(text, content_type='text/plain')
+        """Потоково отдает список покупок в формате txt, csv или json.
+
+        Формат выбирается параметром ?format= или заголовком Accept,
+        по умолчанию txt.
+        """
+
+        renderer = request.accepted_renderer
+        content_type = renderer.media_type
+        if renderer.charset:
+            content_type = f'{content_type}; charset={renderer.charset}'
+        response = StreamingHttpResponse(
+            chunked(renderer.stream(shopping_list_rows(request.user))),
+            content_type=content_type,
+        )
         response['Content-Disposition'] = (
-            'attachment; filename="shopping_list.txt"'
+            f'attachment; filename="shopping_list.{renderer.format}"'
         )
         return response
 
@@ -279,23 +486,8 @@ class RecipeViewSet(viewsets.ModelViewSet):
         url_path='get-link'
     )
     def get_link(self, request, pk=None):
-        recipe = get_object_or_404(Recipe, id=pk)
-        if not recipe.short_link:
-            recipe.short_link = recipe.generate_short_link()
-            recipe.save()
+        recipe = get_object_or_404(Recipe.objects.only('short_link'), id=pk)
         short_link = f'{request.get_host()}/{recipe.short_link}/'
         return Response({
             'short-link': short_link
         })
-
-    @action(
-        detail=False,
-        methods=['get'],
-        permission_classes=[AllowAny],
-        url_path='short-link-redirect'
-    )
-    def short_link_redirect(self, request, short_link=None):
-        """Перенаправление по короткой ссылке на рецепт."""
-
-        recipe = get_object_or_404(Recipe, short_link=short_link)
-        return HttpResponseRedirect(f'/recipes/{recipe.pk}/')
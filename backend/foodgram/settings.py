@@ -22,6 +22,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'rest_framework.authtoken',
     'django_filters',
@@ -34,7 +35,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.metrics.MetricsMiddleware',
+    'api.profiling.ServerTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'api.short_links.ShortLinkMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.locale.LocaleMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -42,6 +46,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'api.staff_profiler.StaffProfilerMiddleware',
 ]
 
 ROOT_URLCONF = 'foodgram.urls'
@@ -106,10 +111,76 @@ REST_FRAMEWORK = {
         "django_filters.rest_framework.DjangoFilterBackend",
         "rest_framework.filters.OrderingFilter",
     ),
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'api.parsers.ORJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
     "DEFAULT_PAGINATION_CLASS": "rest_framework.pagination.LimitOffsetPagination",
     "PAGE_SIZE": 6,
 }
 
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION', 'foodgram'),
+    }
+}
+
+RECIPE_CACHE_TIMEOUT = int(os.getenv('RECIPE_CACHE_TIMEOUT', 300))
+PAGINATION_COUNT_CACHE_TIMEOUT = int(
+    os.getenv('PAGINATION_COUNT_CACHE_TIMEOUT', 60)
+)
+PAGINATION_COUNT_ESTIMATE_THRESHOLD = int(
+    os.getenv('PAGINATION_COUNT_ESTIMATE_THRESHOLD', 100000)
+)
+
+REQUEST_PROFILING = os.getenv('REQUEST_PROFILING', 'False').lower() == 'true'
+REQUEST_PROFILING_SAMPLE_RATE = float(
+    os.getenv('REQUEST_PROFILING_SAMPLE_RATE', 1.0)
+)
+REQUEST_PROFILING_PATH_PREFIX = os.getenv(
+    'REQUEST_PROFILING_PATH_PREFIX', '/api/'
+)
+REQUEST_PROFILING_HEADER = (
+    os.getenv('REQUEST_PROFILING_HEADER', 'True').lower() == 'true'
+)
+PROFILER_TOKEN = os.getenv('PROFILER_TOKEN', '')
+
+IMAGE_VARIANT_WORKERS = int(os.getenv('IMAGE_VARIANT_WORKERS', 2))
+IMAGE_UPLOAD_MAX_SIZE = int(
+    os.getenv('IMAGE_UPLOAD_MAX_SIZE', 15 * 1024 * 1024)
+)
+IMAGE_MAX_PIXELS = int(os.getenv('IMAGE_MAX_PIXELS', 40_000_000))
+SHORT_LINK_LRU_SIZE = int(os.getenv('SHORT_LINK_LRU_SIZE', 10000))
+SHORT_LINK_CACHE_TIMEOUT = int(
+    os.getenv('SHORT_LINK_CACHE_TIMEOUT', 24 * 60 * 60)
+)
+
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'True').lower() == 'true'
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'api.profiling': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
+
 STATIC_URL = 'static/'
 STATIC_ROOT = os.path.join(BASE_DIR, 'collected_static')
 
@@ -118,6 +189,19 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+STORAGES = {
+    'default': {
+        'BACKEND': 'api.storage.ContentAddressedStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+    },
+}
+# Файлы моложе этого возраста collect_orphan_media не удаляет: запись,
+# которая на них ссылается, может быть еще не зафиксирована. Повторная
+# загрузка того же содержимого обновляет время изменения файла.
+ORPHAN_MEDIA_MIN_AGE = int(os.getenv('ORPHAN_MEDIA_MIN_AGE', 24 * 60 * 60))
+
 DJOSER = {
     'LOGIN_FIELD': 'email',
     'HIDE_USERS': False,
@@ -3,14 +3,15 @@ from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import include, path
 
-from api.views import RecipeViewSet
+from api.metrics import metrics_view
+from api.short_links import short_link_redirect
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('api.urls')),
-    path('<str:short_link>/',
-         RecipeViewSet.as_view(
-             {'get': 'short_link_redirect'}), name="short_link_redirect"),
+    path('metrics', metrics_view, name='metrics'),
+    path('<str:short_link>/', short_link_redirect,
+         name="short_link_redirect"),
 ]
 
 if settings.DEBUG:
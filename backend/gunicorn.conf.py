@@ -0,0 +1,29 @@
+"""Настройки gunicorn: число воркеров и общий каталог метрик для них.
+
+Воркеров по умолчанию 2 × CPU + 1 (GUNICORN_WORKERS).
+Если задан PROMETHEUS_MULTIPROC_DIR, каталог очищается при старте
+мастера, а файлы метрик завершившихся воркеров помечаются мертвыми,
+чтобы их gauge-значения не попадали в /metrics.
+"""
+
+import multiprocessing
+import os
+import shutil
+
+workers = int(
+    os.getenv('GUNICORN_WORKERS', multiprocessing.cpu_count() * 2 + 1)
+)
+
+
+def on_starting(server):
+    path = os.getenv('PROMETHEUS_MULTIPROC_DIR')
+    if path:
+        shutil.rmtree(path, ignore_errors=True)
+        os.makedirs(path, exist_ok=True)
+
+
+def child_exit(server, worker):
+    if os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+
+        multiprocess.mark_process_dead(worker.pid)
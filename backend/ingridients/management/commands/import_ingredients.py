@@ -1,38 +1,273 @@
 import csv
+import io
+import json
 import os
+import sys
+import time
+from itertools import islice
 
 from django.conf import settings
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
 
+from api.cache import bump_version, catalog_namespace
+from api.constants import (
+    INGREDIENT_MAX_LENGTH_NAME,
+    MAX_LENGTH_MEASUREMENT_UNIT,
+)
 from ingridients.models import Ingredient
 
+DEFAULT_PATH = os.path.join(settings.BASE_DIR, 'fixtures/ingredients.csv')
+FORMATS = ('csv', 'json')
+JSON_CHUNK_SIZE = 64 * 1024
 
-class Command(BaseCommand):
-    help = 'Импортирует ингредиенты из CSV-файла'
 
-    def handle(self, *args, **kwargs):
-        file_path = os.path.join(settings.BASE_DIR, 'fixtures/ingredients.csv')
+def read_csv(stream):
+    """Строки CSV с заголовком name,measurement_unit."""
+
+    reader = csv.DictReader(stream)
+    missing = {'name', 'measurement_unit'} - set(reader.fieldnames or ())
+    if missing:
+        raise CommandError(
+            f'В CSV нет колонок: {", ".join(sorted(missing))}.'
+        )
+    for row in reader:
+        yield row['name'], row['measurement_unit']
+
+
+def iter_json_values(stream):
+    """Потоково разбирает JSON-массив или JSON Lines.
+
+    Файл читается кусками, объекты декодируются по одному через
+    raw_decode, поэтому весь массив в память не загружается.
+    """
 
-        if not os.path.exists(file_path):
-            self.stdout.write(self.style.ERROR(f'Файл не найден: {file_path}'))
+    decoder = json.JSONDecoder()
+    buffer, position, eof = '', 0, False
+    in_array = None
+    while True:
+        while position < len(buffer) and buffer[position] in ' \t\r\n,':
+            position += 1
+        if position == len(buffer):
+            if eof:
+                break
+            buffer, position = stream.read(JSON_CHUNK_SIZE), 0
+            eof = not buffer
+            continue
+        if in_array is None:
+            in_array = buffer[position] == '['
+            position += in_array
+            continue
+        if in_array and buffer[position] == ']':
             return
+        try:
+            value, position = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError as error:
+            if eof:
+                raise CommandError(f'Некорректный JSON: {error}')
+            chunk = stream.read(JSON_CHUNK_SIZE)
+            buffer, position, eof = buffer[position:] + chunk, 0, not chunk
+            continue
+        yield value
+    if in_array:
+        raise CommandError('Некорректный JSON: массив не закрыт.')
+
+
+def read_json(stream):
+    """Объекты {"name": ..., "measurement_unit": ...} из JSON."""
+
+    for item in iter_json_values(stream):
+        if not isinstance(item, dict):
+            raise CommandError('Ожидался объект с name и measurement_unit.')
+        yield item.get('name'), item.get('measurement_unit')
+
+
+READERS = {'csv': read_csv, 'json': read_json}
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+class Command(BaseCommand):
+    help = (
+        'Импортирует ингредиенты из CSV или JSON (массив или JSON Lines) '
+        'пачками: из файла, по умолчанию fixtures/ingredients.csv, '
+        'или из stdin («-»). Повторы отбрасываются в памяти, '
+        'существующие ингредиенты пропускаются.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', nargs='?', default=DEFAULT_PATH,
+            help='Путь к файлу или «-» для stdin.'
+        )
+        parser.add_argument(
+            '--format', choices=FORMATS,
+            help='Формат данных; по умолчанию по расширению файла, '
+                 'для stdin — csv.'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Размер пачки.'
+        )
+        parser.add_argument(
+            '--copy', action='store_true',
+            help='Загрузить через COPY во временную таблицу '
+                 '(только PostgreSQL).'
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только посчитать, что будет добавлено.'
+        )
+        parser.add_argument(
+            '--progress', action='store_true',
+            help='Печатать прогресс после каждой пачки.'
+        )
+
+    def open_stream(self, path):
+        if path == '-':
+            return io.TextIOWrapper(
+                sys.stdin.buffer, encoding='utf-8', newline=''
+            )
+        if not os.path.exists(path):
+            raise CommandError(f'Файл не найден: {path}')
+        return open(path, newline='', encoding='utf-8')
+
+    def get_format(self, path, fmt):
+        if fmt:
+            return fmt
+        extension = os.path.splitext(path)[1].lstrip('.').lower()
+        if extension in ('json', 'jsonl', 'ndjson'):
+            return 'json'
+        return 'csv'
+
+    def clean_rows(self, rows):
+        """Нормализует строки, отбрасывает повторы и некорректные."""
 
-        with open(file_path, newline='', encoding='utf-8') as csvfile:
-            reader = csv.DictReader(csvfile)
-            added = 0
-            skipped = 0
-            for row in reader:
-                name = row['name']
-                unit = row['measurement_unit']
-                obj, created = Ingredient.objects.get_or_create(
-                    name=name, measurement_unit=unit
+        seen = set()
+        for name, unit in rows:
+            self.stats['read'] += 1
+            name = (name or '').strip()
+            unit = (unit or '').strip()
+            if (
+                not name or not unit
+                or len(name) > INGREDIENT_MAX_LENGTH_NAME
+                or len(unit) > MAX_LENGTH_MEASUREMENT_UNIT
+            ):
+                self.stats['invalid'] += 1
+                continue
+            if (name, unit) in seen:
+                self.stats['duplicates'] += 1
+                continue
+            seen.add((name, unit))
+            yield name, unit
+
+    def existing_keys(self, batch):
+        names = {name for name, _ in batch}
+        return set(Ingredient.objects.filter(name__in=names).values_list(
+            'name', 'measurement_unit'
+        ))
+
+    def import_bulk(self, rows, batch_size, dry_run):
+        for batch in batched(rows, batch_size):
+            existing = self.existing_keys(batch)
+            new = [key for key in batch if key not in existing]
+            self.stats['skipped'] += len(batch) - len(new)
+            if not dry_run:
+                Ingredient.objects.bulk_create(
+                    [
+                        Ingredient(name=name, measurement_unit=unit)
+                        for name, unit in new
+                    ],
+                    ignore_conflicts=True,
                 )
-                if created:
-                    added += 1
-                else:
-                    skipped += 1
-        self.stdout.write(
-            self.style.SUCCESS(
-                f'Импорт завершён: добавлено {added}, пропущено {skipped}.'
+            self.stats['added'] += len(new)
+            self.report_progress()
+
+    def import_copy(self, rows, batch_size, dry_run):
+        """COPY во временную таблицу и один INSERT ... ON CONFLICT."""
+
+        if connection.vendor != 'postgresql':
+            raise CommandError('--copy поддерживается только PostgreSQL.')
+        table = connection.ops.quote_name(Ingredient._meta.db_table)
+        total = 0
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(
+                'CREATE TEMP TABLE ingredient_import '
+                '(name text, measurement_unit text) ON COMMIT DROP'
             )
+            for batch in batched(rows, batch_size):
+                buffer = io.StringIO()
+                csv.writer(buffer).writerows(batch)
+                buffer.seek(0)
+                cursor.copy_expert(
+                    'COPY ingredient_import (name, measurement_unit) '
+                    'FROM STDIN WITH (FORMAT csv)',
+                    buffer,
+                )
+                total += len(batch)
+                self.report_progress()
+            if dry_run:
+                cursor.execute(
+                    f'SELECT count(*) FROM ingredient_import s '
+                    f'WHERE NOT EXISTS (SELECT 1 FROM {table} i '
+                    f'WHERE i.name = s.name '
+                    f'AND i.measurement_unit = s.measurement_unit)'
+                )
+                added = cursor.fetchone()[0]
+            else:
+                cursor.execute(
+                    f'INSERT INTO {table} (name, measurement_unit) '
+                    f'SELECT name, measurement_unit FROM ingredient_import '
+                    f'ON CONFLICT (name, measurement_unit) DO NOTHING'
+                )
+                added = cursor.rowcount
+        self.stats['added'] = added
+        self.stats['skipped'] = total - added
+
+    def report_progress(self):
+        if not self.progress:
+            return
+        elapsed = time.perf_counter() - self.started
+        self.stdout.write(
+            f'Прочитано {self.stats["read"]}, '
+            f'добавлено {self.stats["added"]}, '
+            f'{self.stats["read"] / elapsed:.0f} строк/с'
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size должен быть положительным.')
+        reader = READERS[self.get_format(path, options['format'])]
+        dry_run = options['dry_run']
+        self.progress = options['progress']
+        self.stats = dict.fromkeys(
+            ('read', 'added', 'skipped', 'duplicates', 'invalid'), 0
         )
+        self.started = time.perf_counter()
+
+        with self.open_stream(path) as stream:
+            rows = self.clean_rows(reader(stream))
+            if options['copy']:
+                self.import_copy(rows, options['batch_size'], dry_run)
+            else:
+                self.import_bulk(rows, options['batch_size'], dry_run)
+
+        if self.stats['added'] and not dry_run:
+            # bulk_create не отправляет сигналы: сбрасываем снимок
+            # справочника явно.
+            bump_version(catalog_namespace(Ingredient))
+        elapsed = time.perf_counter() - self.started
+        prefix = 'Пробный запуск' if dry_run else 'Импорт завершён'
+        self.stdout.write(self.style.SUCCESS(
+            f'{prefix}: добавлено {self.stats["added"]}, '
+            f'пропущено {self.stats["skipped"]}, '
+            f'повторов {self.stats["duplicates"]}, '
+            f'некорректных {self.stats["invalid"]}. '
+            f'{self.stats["read"]} строк за {elapsed:.2f} с '
+            f'({self.stats["read"] / max(elapsed, 1e-9):.0f} строк/с).'
+        ))
@@ -1,6 +1,7 @@
 from django.contrib import admin
 from django.core.exceptions import ValidationError
 
+from recipes import shopping_list
 from recipes.models import Recipe, IngredientInRecipe
 
 
@@ -25,3 +26,14 @@ class RecipeAdmin(admin.ModelAdmin):
         if not obj.image:
             raise ValidationError("Нельзя сохранить рецепт без изображения.")
         super().save_model(request, obj, form, change)
+
+    def save_related(self, request, form, formsets, change):
+        """Переносит изменения ингредиентов в списки покупок."""
+
+        previous_amounts = {}
+        if change:
+            shopping_list.lock_recipe(form.instance.pk)
+            previous_amounts = shopping_list.recipe_amounts(form.instance.pk)
+        super().save_related(request, form, formsets, change)
+        if change:
+            shopping_list.sync_recipe(form.instance.pk, previous_amounts)
@@ -0,0 +1,165 @@
+import re
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from recipes.models import Favorite, Recipe, ShoppingCart
+from users.models import Subscriptions
+
+FEED_ORDERING = ('-created_at', '-id')
+FEED_PAGE_SIZE = 6
+
+
+class Command(BaseCommand):
+    help = (
+        'Выполняет EXPLAIN для основных запросов API и проверяет, что '
+        'таблицы читаются по индексу, а не полным сканированием. '
+        'Проверку имеет смысл запускать на большом наборе данных: '
+        'на маленьких таблицах планировщик честно выбирает Seq Scan.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--analyze',
+            action='store_true',
+            help='Выполнить EXPLAIN ANALYZE (только PostgreSQL).',
+        )
+        parser.add_argument(
+            '--strict',
+            action='store_true',
+            help='Завершиться с ошибкой, если найдено полное сканирование.',
+        )
+        parser.add_argument(
+            '--verbose-plans',
+            action='store_true',
+            help='Печатать планы целиком.',
+        )
+
+    def get_samples(self):
+        """Берет из базы реальные значения для параметров запросов."""
+
+        recipe = Recipe.objects.first()
+        favorite = Favorite.objects.first()
+        cart = ShoppingCart.objects.first()
+        subscription = Subscriptions.objects.first()
+        tag = recipe.tags.first() if recipe else None
+        if not all((recipe, favorite, cart, subscription, tag)):
+            raise CommandError(
+                'Недостаточно данных: нужны рецепты с тегами, избранное, '
+                'корзина и подписки.'
+            )
+        return recipe, favorite, cart, subscription, tag
+
+    def get_checks(self):
+        """Список (название, queryset, таблицы, которые нельзя сканировать)."""
+
+        recipe, favorite, cart, subscription, tag = self.get_samples()
+        feed = Recipe.objects.order_by(*FEED_ORDERING)
+        recipe_table = Recipe._meta.db_table
+        tags_table = Recipe.tags.through._meta.db_table
+        favorite_table = Favorite._meta.db_table
+        cart_table = ShoppingCart._meta.db_table
+        subscription_table = Subscriptions._meta.db_table
+        return [
+            (
+                'Лента рецептов',
+                feed[:FEED_PAGE_SIZE],
+                [recipe_table],
+            ),
+            (
+                'Рецепты автора',
+                feed.filter(author_id=recipe.author_id)[:FEED_PAGE_SIZE],
+                [recipe_table],
+            ),
+            (
+                'Фильтр по тегу',
+                feed.filter(tags__slug=tag.slug)[:FEED_PAGE_SIZE],
+                [tags_table],
+            ),
+            (
+                'Проверка избранного (user, recipe)',
+                Favorite.objects.filter(
+                    user_id=favorite.user_id, recipe_id=favorite.recipe_id
+                )[:1],
+                [favorite_table],
+            ),
+            (
+                'Избранное пользователя',
+                feed.filter(
+                    in_favorites__user_id=favorite.user_id
+                )[:FEED_PAGE_SIZE],
+                [favorite_table],
+            ),
+            (
+                'Проверка корзины (user, recipe)',
+                ShoppingCart.objects.filter(
+                    user_id=cart.user_id, recipe_id=cart.recipe_id
+                )[:1],
+                [cart_table],
+            ),
+            (
+                'Корзина пользователя',
+                feed.filter(
+                    in_shoppingcarts__user_id=cart.user_id
+                )[:FEED_PAGE_SIZE],
+                [cart_table],
+            ),
+            (
+                'Подписчики автора',
+                Subscriptions.objects.filter(
+                    author_id=subscription.author_id
+                ).values('user_id'),
+                [subscription_table],
+            ),
+            (
+                'Короткая ссылка',
+                Recipe.objects.filter(
+                    short_link=recipe.short_link
+                ).values_list('pk', flat=True),
+                [recipe_table],
+            ),
+        ]
+
+    def find_full_scans(self, plan, tables):
+        """Возвращает таблицы из tables, которые план читает целиком."""
+
+        if connection.vendor == 'postgresql':
+            pattern = r'Seq Scan on "?{}"?\b'
+        else:
+            pattern = r'\bSCAN "?{}"?(?! USING)(?:\s|$)'
+        return [
+            table for table in tables
+            if re.search(pattern.format(re.escape(table)), plan)
+        ]
+
+    def handle(self, *args, **options):
+        explain_options = {}
+        if options['analyze']:
+            if connection.vendor != 'postgresql':
+                raise CommandError('ANALYZE поддерживается только PostgreSQL.')
+            explain_options = {'analyze': True, 'buffers': True}
+
+        checks = self.get_checks()
+        failures = []
+        for name, queryset, tables in checks:
+            plan = queryset.explain(**explain_options)
+            full_scans = self.find_full_scans(plan, tables)
+            if full_scans:
+                failures.append(name)
+                self.stdout.write(self.style.ERROR(
+                    f'[SEQ]   {name}: полное сканирование '
+                    f'{", ".join(full_scans)}'
+                ))
+            else:
+                self.stdout.write(self.style.SUCCESS(f'[INDEX] {name}'))
+            if options['verbose_plans'] or full_scans:
+                self.stdout.write(plan)
+
+        if failures and options['strict']:
+            raise CommandError(
+                f'Полное сканирование в запросах: {", ".join(failures)}'
+            )
+        self.stdout.write(
+            f'Проверено запросов: {len(checks)}, '
+            f'без индекса: {len(failures)}.'
+        )
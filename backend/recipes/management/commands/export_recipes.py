@@ -0,0 +1,101 @@
+import json
+import os
+import shutil
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes.models import Recipe
+
+RECIPES_FILE = 'recipes.ndjson'
+IMAGES_DIR = 'images'
+
+
+def recipe_record(recipe, image):
+    """Рецепт в виде строки NDJSON: связи — по естественным ключам."""
+
+    return {
+        'name': recipe.name,
+        'text': recipe.text,
+        'cooking_time': recipe.cooking_time,
+        'author': recipe.author.email,
+        'tags': [tag.slug for tag in recipe.tags.all()],
+        'ingredients': [
+            {
+                'name': item.ingredient.name,
+                'measurement_unit': item.ingredient.measurement_unit,
+                'amount': item.amount,
+            }
+            for item in recipe.recipe_ingredients.all()
+        ],
+        'image': image,
+        'created_at': recipe.created_at.isoformat(),
+        'short_link': recipe.short_link,
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        'Выгружает рецепты в каталог: recipes.ndjson (рецепт на строку) '
+        'и изображения отдельными файлами в images/. '
+        'Результат загружается командой import_recipes.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('output', help='Каталог для выгрузки.')
+        parser.add_argument(
+            '--author', action='append', dest='authors',
+            help='Email автора (можно указать несколько раз).'
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=500,
+            help='Сколько рецептов читать из базы за раз.'
+        )
+
+    def copy_image(self, recipe, images_dir):
+        """Копирует изображение рецепта, возвращает относительный путь."""
+
+        if not recipe.image:
+            return None
+        filename = os.path.basename(recipe.image.name)
+        try:
+            with recipe.image.open('rb') as source, open(
+                os.path.join(images_dir, filename), 'wb'
+            ) as target:
+                shutil.copyfileobj(source, target)
+        except FileNotFoundError:
+            self.stderr.write(
+                f'Нет файла изображения {recipe.image.name} '
+                f'у рецепта {recipe.pk}.'
+            )
+            return None
+        return f'{IMAGES_DIR}/{filename}'
+
+    def handle(self, *args, **options):
+        output = options['output']
+        images_dir = os.path.join(output, IMAGES_DIR)
+        os.makedirs(images_dir, exist_ok=True)
+        recipes = Recipe.objects.select_related('author').prefetch_related(
+            'tags', 'recipe_ingredients__ingredient'
+        ).order_by('created_at', 'pk')
+        if options['authors']:
+            recipes = recipes.filter(author__email__in=options['authors'])
+        if options['chunk_size'] < 1:
+            raise CommandError('--chunk-size должен быть положительным.')
+
+        started = time.perf_counter()
+        count = 0
+        with open(
+            os.path.join(output, RECIPES_FILE), 'w', encoding='utf-8'
+        ) as stream:
+            for recipe in recipes.iterator(chunk_size=options['chunk_size']):
+                record = recipe_record(
+                    recipe, self.copy_image(recipe, images_dir)
+                )
+                stream.write(json.dumps(record, ensure_ascii=False) + '\n')
+                count += 1
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Выгружено рецептов: {count} в {output} за {elapsed:.2f} с '
+            f'({count / max(elapsed, 1e-9):.0f} рецептов/с).'
+        ))
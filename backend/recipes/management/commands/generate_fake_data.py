@@ -0,0 +1,310 @@
+import base64
+import io
+import random
+import time
+from datetime import timedelta
+from itertools import accumulate
+
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from PIL import Image
+
+from api.cache import RECIPE_COUNT_NAMESPACE, bump_version, recipe_cache
+from api.constants import SHORT_LINK_MAX_LENGTH
+from ingridients.models import Ingredient
+from recipes import shopping_list
+from recipes.models import (
+    Favorite,
+    IngredientInRecipe,
+    Recipe,
+    ShoppingCart,
+)
+from recipes.search import update_search_vectors
+from tags.models import Tag
+from users.models import Subscriptions, User
+
+DEFAULT_TAGS = ('Завтрак', 'Обед', 'Ужин', 'Десерт', 'Выпечка', 'Салат')
+ADJECTIVES = (
+    'Домашний', 'Быстрый', 'Праздничный', 'Бабушкин', 'Легкий',
+    'Пряный', 'Летний', 'Сытный', 'Нежный', 'Острый',
+)
+DISHES = (
+    'суп', 'салат', 'пирог', 'рагу', 'омлет', 'соус', 'запеканка',
+    'плов', 'десерт', 'гарнир',
+)
+STEPS = (
+    'Нарежьте все ингредиенты.',
+    'Разогрейте сковороду с маслом.',
+    'Доведите до кипения и убавьте огонь.',
+    'Перемешайте и дайте настояться.',
+    'Запекайте до золотистой корочки.',
+    'Посолите и поперчите по вкусу.',
+    'Подавайте горячим.',
+)
+FIRST_NAMES = ('Анна', 'Иван', 'Мария', 'Петр', 'Ольга', 'Сергей', 'Елена')
+LAST_NAMES = ('Иванов', 'Смирнов', 'Кузнецов', 'Попов', 'Соколов', 'Лебедев')
+PASSWORD = 'fake-password'
+DATE_SPREAD = timedelta(days=365)
+
+
+def zipf_weights(count, exponent=1.0):
+    """Накопленные веса закона Ципфа для rng.choices(cum_weights=...)."""
+
+    return list(accumulate(
+        1 / rank ** exponent for rank in range(1, count + 1)
+    ))
+
+
+class Command(BaseCommand):
+    help = (
+        'Создает синтетические данные для нагрузочного тестирования: '
+        'пользователей, рецепты с ингредиентами и тегами из справочников, '
+        'избранное, корзины и подписки со степенным распределением. '
+        'Все вставки выполняются пачками через bulk_create, результат '
+        'определяется --seed.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--recipes', type=int, default=10000)
+        parser.add_argument(
+            '--favorites', type=float, default=10,
+            help='Среднее число рецептов в избранном у пользователя.'
+        )
+        parser.add_argument(
+            '--carts', type=float, default=3,
+            help='Среднее число рецептов в корзине у пользователя.'
+        )
+        parser.add_argument(
+            '--subscriptions', type=float, default=5,
+            help='Среднее число подписок у пользователя.'
+        )
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def log(self, label, count, started):
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f'{label}: {count} за {elapsed:.1f} с '
+            f'({count / max(elapsed, 1e-9):.0f} строк/с)'
+        )
+
+    def insert(self, model, objects):
+        """bulk_create пачками из генератора; возвращает число строк."""
+
+        count = 0
+        batch = []
+        for obj in objects:
+            batch.append(obj)
+            if len(batch) >= self.batch_size:
+                model.objects.bulk_create(batch, ignore_conflicts=True)
+                count += len(batch)
+                batch = []
+        if batch:
+            model.objects.bulk_create(batch, ignore_conflicts=True)
+            count += len(batch)
+        return count
+
+    def prepare_catalogs(self):
+        if not Ingredient.objects.exists():
+            call_command('import_ingredients', stdout=io.StringIO())
+        for name in DEFAULT_TAGS:
+            if not Tag.objects.filter(name=name).exists():
+                Tag.objects.create(name=name)
+        self.ingredient_ids = list(
+            Ingredient.objects.order_by('pk').values_list('pk', flat=True)
+        )
+        self.ingredient_names = dict(Ingredient.objects.values_list(
+            'pk', 'name'
+        ))
+        self.tag_ids = list(
+            Tag.objects.order_by('pk').values_list('pk', flat=True)
+        )
+        # Популярность ингредиентов и тегов — по Ципфу в случайном,
+        # но воспроизводимом порядке.
+        self.rng.shuffle(self.ingredient_ids)
+        self.rng.shuffle(self.tag_ids)
+        self.ingredient_weights = zipf_weights(len(self.ingredient_ids))
+        self.tag_weights = zipf_weights(len(self.tag_ids), 0.7)
+
+    def placeholder_image(self):
+        """Одна общая картинка для всех рецептов."""
+
+        buffer = io.BytesIO()
+        Image.new('RGB', (64, 64), (230, 160, 80)).save(buffer, 'PNG')
+        field = Recipe._meta.get_field('image')
+        return field.storage.save(
+            field.generate_filename(None, f'fake_{self.seed}.png'),
+            ContentFile(buffer.getvalue()),
+        )
+
+    def create_users(self, count):
+        started = time.perf_counter()
+        prefix = f'fake{self.seed}_'
+        if User.objects.filter(username__startswith=prefix).exists():
+            raise CommandError(
+                f'Данные с seed {self.seed} уже созданы: выберите другой.'
+            )
+        password = make_password(PASSWORD)
+        rng = self.rng
+        self.insert(User, (
+            User(
+                username=f'{prefix}{i}',
+                email=f'{prefix}{i}@example.com',
+                first_name=rng.choice(FIRST_NAMES),
+                last_name=rng.choice(LAST_NAMES),
+                password=password,
+            )
+            for i in range(count)
+        ))
+        self.user_ids = list(User.objects.filter(
+            username__startswith=prefix
+        ).order_by('pk').values_list('pk', flat=True))
+        self.log('Пользователи', len(self.user_ids), started)
+
+    def make_recipe(self, author_id, now):
+        rng = self.rng
+        ingredients = set(rng.choices(
+            self.ingredient_ids, cum_weights=self.ingredient_weights,
+            k=rng.randint(3, 12)
+        ))
+        tags = set(rng.choices(
+            self.tag_ids, cum_weights=self.tag_weights, k=rng.randint(1, 3)
+        ))
+        main = self.ingredient_names[next(iter(ingredients))]
+        recipe = Recipe(
+            name=f'{rng.choice(ADJECTIVES)} {rng.choice(DISHES)} '
+                 f'({main})'[:Recipe._meta.get_field('name').max_length],
+            text=' '.join(rng.sample(STEPS, rng.randint(2, len(STEPS)))),
+            cooking_time=rng.randint(5, 180),
+            author_id=author_id,
+            image=self.image,
+        )
+        recipe.short_link = base64.urlsafe_b64encode(
+            rng.randbytes(8)
+        ).decode()[:SHORT_LINK_MAX_LENGTH]
+        recipe.created_at = now - DATE_SPREAD * rng.random()
+        return recipe, ingredients, tags
+
+    def create_recipes(self, count):
+        """Рецепты пачками: авторы тоже распределены по Ципфу."""
+
+        started = time.perf_counter()
+        rng = self.rng
+        authors = rng.sample(self.user_ids, len(self.user_ids))
+        author_weights = zipf_weights(len(authors))
+        now = timezone.now()
+        self.recipe_ids = []
+        links = 0
+        for start in range(0, count, self.batch_size):
+            size = min(self.batch_size, count - start)
+            rows = [
+                self.make_recipe(author_id, now)
+                for author_id in rng.choices(
+                    authors, cum_weights=author_weights, k=size
+                )
+            ]
+            dates = [recipe.created_at for recipe, _, _ in rows]
+            with transaction.atomic():
+                recipes = Recipe.objects.bulk_create(
+                    [recipe for recipe, _, _ in rows]
+                )
+                # auto_now_add перезаписывает дату при вставке, поэтому
+                # сгенерированные даты восстанавливаем отдельным UPDATE.
+                for recipe, created_at in zip(recipes, dates):
+                    recipe.created_at = created_at
+                Recipe.objects.bulk_update(recipes, ['created_at'])
+                links += self.insert(IngredientInRecipe, (
+                    IngredientInRecipe(
+                        recipe_id=recipe.pk, ingredient_id=ingredient_id,
+                        amount=rng.randint(1, 500),
+                    )
+                    for recipe, ingredients, _ in rows
+                    for ingredient_id in ingredients
+                ))
+                links += self.insert(Recipe.tags.through, (
+                    Recipe.tags.through(recipe_id=recipe.pk, tag_id=tag_id)
+                    for recipe, _, tags in rows
+                    for tag_id in tags
+                ))
+                update_search_vectors([recipe.pk for recipe in recipes])
+            self.recipe_ids.extend(recipe.pk for recipe in recipes)
+        self.log('Рецепты', len(self.recipe_ids), started)
+        self.log('Ингредиенты и теги рецептов', links, started)
+
+    def pareto_count(self, mean, limit):
+        """Число связей пользователя: тяжелый хвост со средним mean."""
+
+        alpha = 2.0
+        return min(limit, int(self.rng.paretovariate(alpha) * mean / 2))
+
+    def create_relations(self, model, mean):
+        started = time.perf_counter()
+        rng = self.rng
+        recipes = rng.sample(self.recipe_ids, len(self.recipe_ids))
+        weights = zipf_weights(len(recipes))
+
+        def rows():
+            for user_id in self.user_ids:
+                k = self.pareto_count(mean, len(recipes))
+                for recipe_id in set(rng.choices(
+                    recipes, cum_weights=weights, k=k
+                )):
+                    yield model(user_id=user_id, recipe_id=recipe_id)
+
+        count = self.insert(model, rows())
+        self.log(model._meta.verbose_name_plural, count, started)
+
+    def create_subscriptions(self, mean):
+        """Граф подписок: число подписчиков автора убывает по Ципфу."""
+
+        started = time.perf_counter()
+        rng = self.rng
+        authors = list(Recipe.objects.filter(
+            pk__in=self.recipe_ids
+        ).order_by('author_id').values_list('author_id', flat=True).distinct())
+        rng.shuffle(authors)
+        weights = zipf_weights(len(authors), 1.2)
+
+        def rows():
+            for user_id in self.user_ids:
+                k = self.pareto_count(mean, len(authors))
+                for author_id in set(rng.choices(
+                    authors, cum_weights=weights, k=k
+                )) - {user_id}:
+                    yield Subscriptions(user_id=user_id, author_id=author_id)
+
+        count = self.insert(Subscriptions, rows())
+        self.log('Подписки', count, started)
+
+    def handle(self, *args, **options):
+        self.seed = options['seed']
+        self.rng = random.Random(self.seed)
+        self.batch_size = options['batch_size']
+        if options['users'] < 1:
+            raise CommandError('Нужен хотя бы один пользователь.')
+        started = time.perf_counter()
+
+        self.prepare_catalogs()
+        self.image = self.placeholder_image()
+        self.create_users(options['users'])
+        self.create_recipes(options['recipes'])
+        if self.recipe_ids:
+            self.create_relations(Favorite, options['favorites'])
+            self.create_relations(ShoppingCart, options['carts'])
+            self.create_subscriptions(options['subscriptions'])
+            # Корзины вставлены без сигналов: пересобираем списки покупок
+            # созданных пользователей.
+            shopping_list.rebuild(user_ids=self.user_ids)
+
+        recipe_cache.invalidate_all()
+        bump_version(RECIPE_COUNT_NAMESPACE)
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово за {time.perf_counter() - started:.1f} с, '
+            f'seed {self.seed}, пароль пользователей: {PASSWORD}'
+        ))
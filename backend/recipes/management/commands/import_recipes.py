@@ -0,0 +1,292 @@
+import json
+import os
+import re
+import time
+from itertools import islice
+
+from django.core.files import File
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, transaction
+from django.utils.dateparse import parse_datetime
+
+from api.cache import RECIPE_COUNT_NAMESPACE, bump_version, recipe_cache
+from api.constants import SHORT_LINK_MAX_LENGTH
+from ingridients.models import Ingredient
+from recipes.management.commands.export_recipes import RECIPES_FILE
+from recipes.models import IngredientInRecipe, Recipe, generate_short_link
+from recipes.search import update_search_vectors
+from tags.models import Tag
+from users.models import User
+
+SHORT_LINK_PATTERN = re.compile(
+    rf'[A-Za-z0-9_-]{{1,{SHORT_LINK_MAX_LENGTH}}}'
+)
+
+# Верхняя граница PositiveSmallIntegerField (smallint в PostgreSQL);
+# SQLite ее не проверяет, поэтому граница задана явно.
+MAX_SMALL_INTEGER = 32767
+
+
+class InvalidRecord(ValueError):
+    """Строку NDJSON нельзя превратить в рецепт."""
+
+
+class Command(BaseCommand):
+    help = (
+        'Загружает рецепты из NDJSON, созданного export_recipes. '
+        'Теги и ингредиенты сопоставляются по slug и (название, единица) '
+        'через заранее загруженные словари, рецепты и связи вставляются '
+        'пачками через bulk_create, каждая пачка — в своей транзакции.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'source',
+            help='Каталог выгрузки или путь к файлу NDJSON; изображения '
+                 'ищутся относительно файла.'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=200,
+            help='Рецептов в одной транзакции.'
+        )
+        parser.add_argument(
+            '--author',
+            help='Email пользователя, которому назначить все рецепты.'
+        )
+        parser.add_argument(
+            '--progress', action='store_true',
+            help='Печатать прогресс после каждой пачки.'
+        )
+
+    def get_paths(self, source):
+        path = source
+        if os.path.isdir(source):
+            path = os.path.join(source, RECIPES_FILE)
+        if not os.path.exists(path):
+            raise CommandError(f'Файл не найден: {path}')
+        return path, os.path.dirname(os.path.abspath(path))
+
+    def load_maps(self, author):
+        """Словари тегов и ингредиентов; автор по умолчанию, если задан."""
+
+        self.tags = dict(Tag.objects.values_list('slug', 'id'))
+        self.ingredients = {
+            (name, unit): pk
+            for pk, name, unit in Ingredient.objects.values_list(
+                'id', 'name', 'measurement_unit'
+            )
+        }
+        self.authors = {}
+        self.default_author = None
+        if author:
+            self.default_author = User.objects.filter(
+                email=author
+            ).values_list('id', flat=True).first()
+            if self.default_author is None:
+                raise CommandError(f'Пользователь {author} не найден.')
+
+    def read_records(self, stream):
+        for line_number, line in enumerate(stream, 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as error:
+                self.reject(line_number, f'некорректный JSON: {error}')
+                continue
+            if not isinstance(record, dict):
+                self.reject(line_number, 'ожидался объект рецепта')
+                continue
+            yield line_number, record
+
+    def reject(self, line_number, message):
+        self.stats['invalid'] += 1
+        if self.stats['invalid'] <= 20:
+            self.stderr.write(f'Строка {line_number}: {message}')
+
+    def resolve_authors(self, batch):
+        """Догружает id авторов пачки одним запросом."""
+
+        if self.default_author is not None:
+            return
+        emails = {
+            record.get('author') for _, record in batch
+        } - self.authors.keys()
+        self.authors.update(User.objects.filter(
+            email__in=emails
+        ).values_list('email', 'id'))
+
+    def build(self, record, base_dir):
+        """Проверяет запись и возвращает рецепт, его связи и картинку."""
+
+        author_id = self.default_author or self.authors.get(
+            record.get('author')
+        )
+        if author_id is None:
+            raise InvalidRecord(f'автор {record.get("author")} не найден')
+        try:
+            tag_ids = [self.tags[slug] for slug in record['tags']]
+        except KeyError as error:
+            raise InvalidRecord(f'нет тега или поля {error}')
+        amounts = {}
+        for item in record.get('ingredients') or ():
+            key = (item.get('name'), item.get('measurement_unit'))
+            if key not in self.ingredients:
+                raise InvalidRecord(f'нет ингредиента {key[0]} ({key[1]})')
+            if key in amounts:
+                raise InvalidRecord(f'ингредиент {key[0]} повторяется')
+            amount = item.get('amount')
+            if not isinstance(amount, int) or not (
+                1 <= amount <= MAX_SMALL_INTEGER
+            ):
+                raise InvalidRecord(f'некорректное количество {key[0]}')
+            amounts[key] = amount
+        if not amounts or not tag_ids:
+            raise InvalidRecord('нужны хотя бы один тег и один ингредиент')
+        cooking_time = record.get('cooking_time')
+        if not isinstance(cooking_time, int) or not (
+            1 <= cooking_time <= MAX_SMALL_INTEGER
+        ):
+            raise InvalidRecord('некорректное время приготовления')
+        name = record.get('name')
+        if not name or not record.get('text'):
+            raise InvalidRecord('нет названия или текста')
+        if len(name) > Recipe._meta.get_field('name').max_length:
+            raise InvalidRecord('слишком длинное название')
+        image = record.get('image')
+        image_path = image and os.path.join(base_dir, image)
+        if not image_path or not os.path.isfile(image_path):
+            raise InvalidRecord(f'нет файла изображения {image}')
+        short_link = record.get('short_link') or generate_short_link()
+        if not isinstance(short_link, str) or not (
+            SHORT_LINK_PATTERN.fullmatch(short_link)
+        ):
+            raise InvalidRecord(f'некорректная короткая ссылка {short_link}')
+        created_at = record.get('created_at')
+        recipe = Recipe(
+            name=name,
+            text=record['text'],
+            cooking_time=cooking_time,
+            author_id=author_id,
+            short_link=short_link,
+        )
+        return {
+            'recipe': recipe,
+            'created_at': created_at and parse_datetime(created_at),
+            'ingredients': [
+                (self.ingredients[key], amount)
+                for key, amount in amounts.items()
+            ],
+            'tags': set(tag_ids),
+            'image': image_path,
+        }
+
+    def assign_short_links(self, recipes):
+        """Сохраняет короткие ссылки из выгрузки, если они свободны."""
+
+        wanted = [recipe.short_link for recipe in recipes]
+        taken = set(Recipe.objects.filter(
+            short_link__in=wanted
+        ).values_list('short_link', flat=True))
+        for recipe in recipes:
+            if recipe.short_link in taken:
+                recipe.short_link = generate_short_link()
+            taken.add(recipe.short_link)
+
+    def save_images(self, items):
+        field = Recipe._meta.get_field('image')
+        for item in items:
+            name = field.generate_filename(
+                None, os.path.basename(item['image'])
+            )
+            with open(item['image'], 'rb') as image:
+                item['recipe'].image.name = field.storage.save(
+                    name, File(image)
+                )
+
+    @transaction.atomic
+    def import_batch(self, items):
+        recipes = [item['recipe'] for item in items]
+        self.assign_short_links(recipes)
+        self.save_images(items)
+        Recipe.objects.bulk_create(recipes)
+        dated = []
+        for item in items:
+            if item['created_at']:
+                item['recipe'].created_at = item['created_at']
+                dated.append(item['recipe'])
+        # auto_now_add перезаписывает дату при вставке, поэтому
+        # исходную дату выгрузки восстанавливаем отдельным UPDATE.
+        Recipe.objects.bulk_update(dated, ['created_at'])
+        IngredientInRecipe.objects.bulk_create([
+            IngredientInRecipe(
+                recipe=item['recipe'], ingredient_id=ingredient_id,
+                amount=amount
+            )
+            for item in items
+            for ingredient_id, amount in item['ingredients']
+        ])
+        Recipe.tags.through.objects.bulk_create([
+            Recipe.tags.through(recipe_id=item['recipe'].pk, tag_id=tag_id)
+            for item in items
+            for tag_id in item['tags']
+        ])
+        update_search_vectors([recipe.pk for recipe in recipes])
+
+    def import_and_count(self, items, line_number):
+        """Загружает пачку; ошибка базы отклоняет только ее.
+
+        Транзакция пачки откатывается, а предыдущие пачки и сброс
+        кэша в конце handle не затрагиваются. Сохраненные картинки
+        отката не видят: их подберет collect_orphan_media.
+        """
+
+        try:
+            self.import_batch(items)
+        except DatabaseError as error:
+            self.stats['failed'] += len(items)
+            self.stderr.write(
+                f'Пачка со строки {line_number} не загружена: {error}'
+            )
+        else:
+            self.stats['imported'] += len(items)
+
+    def handle(self, *args, **options):
+        path, base_dir = self.get_paths(options['source'])
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size должен быть положительным.')
+        self.load_maps(options['author'])
+        self.stats = {'imported': 0, 'invalid': 0, 'failed': 0}
+        started = time.perf_counter()
+
+        with open(path, encoding='utf-8') as stream:
+            records = self.read_records(stream)
+            while batch := list(islice(records, options['batch_size'])):
+                self.resolve_authors(batch)
+                items = []
+                for line_number, record in batch:
+                    try:
+                        items.append(self.build(record, base_dir))
+                    except (ValueError, AttributeError, TypeError) as error:
+                        self.reject(line_number, str(error))
+                if items:
+                    self.import_and_count(items, batch[0][0])
+                if options['progress']:
+                    elapsed = time.perf_counter() - started
+                    self.stdout.write(
+                        f'Загружено {self.stats["imported"]}, '
+                        f'{self.stats["imported"] / elapsed:.0f} рецептов/с'
+                    )
+
+        if self.stats['imported']:
+            # bulk_create не отправляет сигналы: сбрасываем кэш списков
+            # и количества рецептов явно.
+            recipe_cache.invalidate_lists()
+            bump_version(RECIPE_COUNT_NAMESPACE)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Загружено рецептов: {self.stats["imported"]}, '
+            f'отклонено: {self.stats["invalid"]}, '
+            f'ошибок базы: {self.stats["failed"]} за {elapsed:.2f} с '
+            f'({self.stats["imported"] / max(elapsed, 1e-9):.0f} рецептов/с).'
+        ))
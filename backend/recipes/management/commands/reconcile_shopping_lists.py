@@ -0,0 +1,58 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes import shopping_list
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересобирает материализованные списки покупок из корзин '
+        'и проверяет, что они совпадают с суммой ингредиентов рецептов.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Только проверить расхождения, ничего не меняя.',
+        )
+        parser.add_argument(
+            '--user',
+            type=int,
+            action='append',
+            dest='user_ids',
+            help='id пользователя (можно указать несколько раз).',
+        )
+
+    def report(self, mismatches, limit=10):
+        for user_id, rows in list(mismatches.items())[:limit]:
+            self.stdout.write(self.style.WARNING(
+                f'Пользователь {user_id}: ' + ', '.join(
+                    f'ингредиент {ingredient_id} '
+                    f'ожидается {expected}, хранится {stored}'
+                    for ingredient_id, expected, stored in rows
+                )
+            ))
+        if len(mismatches) > limit:
+            self.stdout.write(f'... и еще {len(mismatches) - limit}')
+
+    def handle(self, *args, **options):
+        user_ids = options['user_ids']
+        mismatches = shopping_list.find_mismatches(user_ids)
+        self.report(mismatches)
+        if options['check']:
+            if mismatches:
+                raise CommandError(
+                    f'Расхождения у пользователей: {len(mismatches)}.'
+                )
+            self.stdout.write(self.style.SUCCESS('Расхождений нет.'))
+            return
+
+        count = shopping_list.rebuild(user_ids)
+        remaining = shopping_list.find_mismatches(user_ids)
+        if remaining:
+            self.report(remaining)
+            raise CommandError('После пересборки остались расхождения.')
+        self.stdout.write(self.style.SUCCESS(
+            f'Пересобрано позиций: {count}, исправлено пользователей: '
+            f'{len(mismatches)}.'
+        ))
@@ -0,0 +1,74 @@
+# Generated by Django 4.2.7 on 2026-10-17 05:50
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ingridients', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('recipes', '0003_alter_favorite_recipe_alter_favorite_user_and_more'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='favorite',
+            options={'default_related_name': 'in_%(class)ss', 'verbose_name': 'Избранное', 'verbose_name_plural': 'Избранное'},
+        ),
+        migrations.AlterModelOptions(
+            name='shoppingcart',
+            options={'default_related_name': 'in_%(class)ss', 'verbose_name': 'Корзина покупок', 'verbose_name_plural': 'Корзины покупок'},
+        ),
+        migrations.AlterField(
+            model_name='favorite',
+            name='recipe',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='recipes.recipe'),
+        ),
+        migrations.AlterField(
+            model_name='favorite',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='ingredientinrecipe',
+            name='ingredient',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='ingridients.ingredient', verbose_name='Ингридиент'),
+        ),
+        migrations.AlterField(
+            model_name='recipe',
+            name='image',
+            field=models.ImageField(default='', upload_to='recipes/'),
+        ),
+        migrations.AlterField(
+            model_name='shoppingcart',
+            name='recipe',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='recipes.recipe'),
+        ),
+        migrations.AlterField(
+            model_name='shoppingcart',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['-created_at', '-id'], name='recipe_created_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['author', '-created_at', '-id'], name='recipe_author_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(condition=models.Q(('short_link__isnull', False)), fields=['short_link'], name='recipe_short_link_idx'),
+        ),
+        migrations.RunSQL(
+            sql=(
+                'CREATE INDEX recipe_tags_tag_recipe_idx '
+                'ON recipes_recipe_tags (tag_id, recipe_id);'
+            ),
+            reverse_sql='DROP INDEX recipe_tags_tag_recipe_idx;',
+        ),
+    ]
@@ -0,0 +1,84 @@
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations
+from django.db.models import OuterRef, Subquery
+
+SEARCH_INDEX = django.contrib.postgres.indexes.GinIndex(
+    fields=['search_vector'], name='recipe_search_vector_idx'
+)
+
+
+def add_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.add_index(apps.get_model('recipes', 'Recipe'), SEARCH_INDEX)
+
+
+def remove_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.remove_index(
+        apps.get_model('recipes', 'Recipe'), SEARCH_INDEX
+    )
+
+
+def names_subquery(queryset, name_field):
+    return Subquery(
+        queryset.filter(recipe=OuterRef('pk')).values('recipe').annotate(
+            names=StringAgg(name_field, delimiter=' ')
+        ).values('names')
+    )
+
+
+def fill_search_vectors(apps, schema_editor):
+    """Заполняет search_vector по историческим моделям.
+
+    Копия recipes.search.recipe_search_vector на момент миграции:
+    живой модуль может измениться вместе с моделями.
+    """
+
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    Recipe = apps.get_model('recipes', 'Recipe')
+    IngredientInRecipe = apps.get_model('recipes', 'IngredientInRecipe')
+    tag_names = names_subquery(Recipe.tags.through.objects, 'tag__name')
+    ingredient_names = names_subquery(
+        IngredientInRecipe.objects, 'ingredient__name'
+    )
+    Recipe.objects.using(schema_editor.connection.alias).update(
+        search_vector=(
+            SearchVector('name', weight='A', config='russian')
+            + SearchVector(tag_names, weight='B', config='russian')
+            + SearchVector(ingredient_names, weight='B', config='russian')
+            + SearchVector('text', weight='C', config='russian')
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0004_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(
+                editable=False, null=True, verbose_name='Поисковый вектор'
+            ),
+        ),
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AddIndex(model_name='recipe', index=SEARCH_INDEX),
+            ],
+            database_operations=[
+                migrations.RunPython(add_search_index, remove_search_index),
+            ],
+        ),
+        migrations.RunPython(fill_search_vectors, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 4.2.7 on 2026-10-17 06:31
+
+from django.db import migrations, models
+
+from recipes.models import generate_short_link
+
+
+def backfill_short_links(apps, schema_editor):
+    """Выдает ссылки рецептам без них и разводит повторяющиеся.
+
+    Раньше ссылки создавались лениво и без проверки уникальности.
+    """
+
+    alias = schema_editor.connection.alias
+    Recipe = apps.get_model('recipes', 'Recipe')
+    recipes = Recipe.objects.using(alias)
+    duplicates = recipes.values('short_link').annotate(
+        count=models.Count('pk')
+    ).filter(count__gt=1).exclude(short_link=None).exclude(short_link='')
+    stale = []
+    for link in duplicates.values_list('short_link', flat=True):
+        # Первый рецепт сохраняет ссылку, остальные получают новые.
+        stale.extend(recipes.filter(short_link=link).order_by(
+            'pk'
+        ).values_list('pk', flat=True)[1:])
+    stale.extend(recipes.filter(
+        models.Q(short_link=None) | models.Q(short_link='')
+    ).values_list('pk', flat=True).iterator())
+    batch = []
+    for pk in stale:
+        batch.append(Recipe(pk=pk, short_link=generate_short_link()))
+        if len(batch) >= 1000:
+            Recipe.objects.using(alias).bulk_update(batch, ['short_link'])
+            batch = []
+    Recipe.objects.using(alias).bulk_update(batch, ['short_link'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0007_recipe_image_variants'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_short_links, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-17 06:32
+
+from django.db import migrations, models
+import recipes.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0008_backfill_short_links'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='recipe',
+            name='recipe_short_link_idx',
+        ),
+        migrations.AlterField(
+            model_name='recipe',
+            name='short_link',
+            field=models.CharField(default=recipes.models.generate_short_link, max_length=10, unique=True, verbose_name='Короткая ссылка'),
+        ),
+    ]
@@ -2,6 +2,8 @@ import base64
 import uuid
 
 from django.conf import settings
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import MinValueValidator
 from django.db import models
 
@@ -15,6 +17,15 @@ from tags.models import Tag
 from users.models import User
 
 
+def generate_short_link():
+    """Случайный код короткой ссылки (60 бит)."""
+
+    short_link = base64.urlsafe_b64encode(
+        uuid.uuid4().bytes
+    ).decode('utf-8').rstrip('=')
+    return short_link[:SHORT_LINK_MAX_LENGTH]
+
+
 class Recipe(models.Model):
     name = models.CharField(max_length=RECIPE_MAX_LENGTH_NAME)
     text = models.TextField()
@@ -38,23 +49,41 @@ class Recipe(models.Model):
 
     short_link = models.CharField(
         max_length=SHORT_LINK_MAX_LENGTH,
-        blank=True,
-        null=True,
+        unique=True,
+        default=generate_short_link,
         verbose_name='Короткая ссылка'
     )
-
-    def generate_short_link(self):
-        uuid_bytes = uuid.uuid4().bytes
-        short_link = base64.urlsafe_b64encode(
-            uuid_bytes
-        ).decode('utf-8').rstrip('=')
-        return short_link[:SHORT_LINK_MAX_LENGTH]
+    search_vector = SearchVectorField(
+        null=True,
+        editable=False,
+        verbose_name='Поисковый вектор'
+    )
+    image_variants = models.JSONField(
+        default=dict,
+        blank=True,
+        editable=False,
+        verbose_name='Варианты изображения'
+    )
 
     class Meta:
         """Мета-класс для настройки порядка и отображения рецептов."""
         ordering = ['-created_at']
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
+        indexes = [
+            models.Index(
+                fields=['-created_at', '-id'],
+                name='recipe_created_id_idx'
+            ),
+            models.Index(
+                fields=['author', '-created_at', '-id'],
+                name='recipe_author_created_idx'
+            ),
+            GinIndex(
+                fields=['search_vector'],
+                name='recipe_search_vector_idx'
+            ),
+        ]
 
     def __str__(self):
         """Возвращает строковое представление рецепта."""
@@ -122,3 +151,39 @@ class ShoppingCart(UserRecipeRelation):
     class Meta(UserRecipeRelation.Meta):
         verbose_name = 'Корзина покупок'
         verbose_name_plural = 'Корзины покупок'
+
+
+class ShoppingListItem(models.Model):
+    """Итоговое количество ингредиента в списке покупок пользователя.
+
+    Материализованная сумма IngredientInRecipe по рецептам из корзины.
+    Поддерживается инкрементально (см. recipes.shopping_list) и может
+    быть пересобрана командой reconcile_shopping_lists.
+    """
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='shopping_list_items',
+        verbose_name='Пользователь'
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        related_name='shopping_list_items',
+        verbose_name='Ингредиент'
+    )
+    amount = models.PositiveIntegerField(verbose_name='Количество')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'ingredient'],
+                name='unique_shopping_list_item'
+            )
+        ]
+        verbose_name = 'Позиция списка покупок'
+        verbose_name_plural = 'Списки покупок'
+
+    def __str__(self):
+        return f'{self.ingredient} — {self.amount} ({self.user})'
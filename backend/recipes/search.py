@@ -0,0 +1,52 @@
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import SearchVector
+from django.db import connections
+from django.db.models import OuterRef, Subquery
+
+from recipes.models import IngredientInRecipe, Recipe
+
+SEARCH_CONFIG = 'russian'
+
+
+def _names_subquery(queryset, name_field):
+    """Подзапрос с названиями связанных объектов рецепта через пробел."""
+
+    return Subquery(
+        queryset.filter(recipe=OuterRef('pk')).values('recipe').annotate(
+            names=StringAgg(name_field, delimiter=' ')
+        ).values('names')
+    )
+
+
+def recipe_search_vector():
+    """Выражение tsvector рецепта с весами полей.
+
+    Название важнее всего (A), затем теги и ингредиенты (B),
+    затем текст рецепта (C).
+    """
+
+    tag_names = _names_subquery(Recipe.tags.through.objects, 'tag__name')
+    ingredient_names = _names_subquery(
+        IngredientInRecipe.objects, 'ingredient__name'
+    )
+    return (
+        SearchVector('name', weight='A', config=SEARCH_CONFIG)
+        + SearchVector(tag_names, weight='B', config=SEARCH_CONFIG)
+        + SearchVector(ingredient_names, weight='B', config=SEARCH_CONFIG)
+        + SearchVector('text', weight='C', config=SEARCH_CONFIG)
+    )
+
+
+def update_search_vectors(recipe_ids=None, using='default'):
+    """Пересчитывает search_vector одним UPDATE.
+
+    Без recipe_ids пересчитываются все рецепты. На других СУБД
+    ничего не делает: поиск там работает через icontains.
+    """
+
+    if connections[using].vendor != 'postgresql':
+        return 0
+    queryset = Recipe.objects.using(using)
+    if recipe_ids is not None:
+        queryset = queryset.filter(pk__in=recipe_ids)
+    return queryset.update(search_vector=recipe_search_vector())
@@ -0,0 +1,257 @@
+import logging
+import operator
+from collections import defaultdict
+from functools import reduce
+
+from django.db import connections, transaction
+from django.db.models import Case, F, IntegerField, Q, Sum, Value, When
+from django.db.models.functions import Greatest
+
+from recipes.models import (
+    IngredientInRecipe,
+    Recipe,
+    ShoppingCart,
+    ShoppingListItem,
+)
+
+USER_BATCH_SIZE = 500
+
+logger = logging.getLogger(__name__)
+
+
+def lock_recipe(recipe_id):
+    """Блокирует строку рецепта до конца транзакции.
+
+    Изменения корзины и ингредиентов одного рецепта выполняются по
+    очереди: иначе при READ COMMITTED правка ингредиентов не видит
+    незафиксированную запись корзины, а добавление в корзину читает
+    старые количества, и одна из разниц теряется.
+    """
+
+    list(Recipe.objects.select_for_update().filter(
+        pk=recipe_id
+    ).order_by().values_list('pk', flat=True))
+
+
+def recipe_amounts(recipe_id):
+    """Количество каждого ингредиента рецепта: {ingredient_id: amount}."""
+
+    return dict(IngredientInRecipe.objects.filter(
+        recipe_id=recipe_id
+    ).values_list('ingredient_id', 'amount'))
+
+
+def upsert_amounts(rows):
+    """Прибавляет количества rows [(user_id, ingredient_id, amount)].
+
+    INSERT ... ON CONFLICT DO UPDATE: недостающая строка создается,
+    существующая увеличивается в той же команде, поэтому одновременные
+    добавления одного ингредиента не конфликтуют.
+    """
+
+    connection = connections[ShoppingListItem.objects.db]
+    quote_name = connection.ops.quote_name
+    table = quote_name(ShoppingListItem._meta.db_table)
+    fields = ['user_id', 'ingredient_id', 'amount']
+    batch_size = connection.ops.bulk_batch_size(fields, rows)
+    with connection.cursor() as cursor:
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start:start + batch_size]
+            values = ', '.join(['(%s, %s, %s)'] * len(batch))
+            cursor.execute(
+                f'INSERT INTO {table} (user_id, ingredient_id, amount) '
+                f'VALUES {values} ON CONFLICT (user_id, ingredient_id) '
+                f'DO UPDATE SET amount = {table}.amount + EXCLUDED.amount',
+                [value for row in batch for value in row],
+            )
+
+
+def subtract_amounts(user_ids, deltas):
+    """Вычитает deltas ({ingredient_id: количество > 0}) у users.
+
+    Обнулившиеся строки удаляются. Если хранится меньше вычитаемого,
+    таблица уже разошлась с корзинами: расхождение пишется в лог,
+    строка обнуляется, а исправляет его reconcile_shopping_lists.
+    """
+
+    items = ShoppingListItem.objects.filter(
+        user_id__in=user_ids, ingredient_id__in=deltas
+    )
+    drifted = list(items.filter(reduce(operator.or_, (
+        Q(ingredient_id=ingredient_id, amount__lt=delta)
+        for ingredient_id, delta in deltas.items()
+    ))).values_list('user_id', 'ingredient_id', 'amount'))
+    for user_id, ingredient_id, amount in drifted:
+        logger.warning(
+            'Список покупок пользователя %s разошелся с корзиной: '
+            'ингредиент %s, хранится %s, вычитается %s.',
+            user_id, ingredient_id, amount, deltas[ingredient_id],
+        )
+    items.update(amount=Case(*(
+        When(
+            ingredient_id=ingredient_id,
+            then=Greatest(F('amount') - delta, Value(0)),
+        )
+        for ingredient_id, delta in deltas.items()
+    ), default=F('amount'), output_field=IntegerField()))
+    items.filter(amount=0).delete()
+
+
+@transaction.atomic
+def apply_deltas(user_ids, deltas):
+    """Прибавляет deltas ({ingredient_id: количество}) к спискам users.
+
+    Положительные изменения применяются upsert'ом, отрицательные —
+    одним UPDATE на пачку пользователей; строки не читаются в Python.
+    Вызывается в транзакции, записывающей саму корзину или рецепт.
+    """
+
+    added = sorted(
+        (ingredient_id, delta)
+        for ingredient_id, delta in deltas.items() if delta > 0
+    )
+    subtracted = {
+        ingredient_id: -delta
+        for ingredient_id, delta in deltas.items() if delta < 0
+    }
+    user_ids = sorted(user_ids)
+    for start in range(0, len(user_ids), USER_BATCH_SIZE):
+        batch = user_ids[start:start + USER_BATCH_SIZE]
+        if added:
+            upsert_amounts([
+                (user_id, ingredient_id, delta)
+                for user_id in batch
+                for ingredient_id, delta in added
+            ])
+        if subtracted:
+            subtract_amounts(batch, subtracted)
+
+
+@transaction.atomic
+def add_recipe(user_id, recipe_id):
+    """Учитывает рецепт, добавленный в корзину."""
+
+    lock_recipe(recipe_id)
+    apply_deltas([user_id], recipe_amounts(recipe_id))
+
+
+@transaction.atomic
+def remove_recipe(user_id, recipe_id):
+    """Вычитает рецепт, удаленный из корзины."""
+
+    lock_recipe(recipe_id)
+    apply_deltas([user_id], {
+        ingredient_id: -amount
+        for ingredient_id, amount in recipe_amounts(recipe_id).items()
+    })
+
+
+def sync_recipe(recipe_id, previous_amounts):
+    """Переносит изменение ингредиентов рецепта в списки покупок.
+
+    previous_amounts — результат recipe_amounts до изменения, снятый
+    после lock_recipe в той же транзакции.
+    Разница применяется ко всем пользователям, у которых рецепт
+    лежит в корзине.
+    """
+
+    current_amounts = recipe_amounts(recipe_id)
+    deltas = {
+        ingredient_id: (
+            current_amounts.get(ingredient_id, 0)
+            - previous_amounts.get(ingredient_id, 0)
+        )
+        for ingredient_id in current_amounts.keys() | previous_amounts.keys()
+    }
+    if not any(deltas.values()):
+        return
+    apply_deltas(
+        ShoppingCart.objects.filter(
+            recipe_id=recipe_id
+        ).values_list('user_id', flat=True),
+        deltas,
+    )
+
+
+def totals_queryset(user_ids=None):
+    """Агрегат корзин: строки (user_id, ingredient_id, total)."""
+
+    carts = ShoppingCart.objects.all()
+    if user_ids is not None:
+        carts = carts.filter(user_id__in=user_ids)
+    return carts.filter(
+        recipe__recipe_ingredients__isnull=False
+    ).values(
+        'user_id',
+        ingredient_id=F('recipe__recipe_ingredients__ingredient_id'),
+    ).annotate(
+        total=Sum('recipe__recipe_ingredients__amount')
+    ).values_list('user_id', 'ingredient_id', 'total')
+
+
+def expected_totals(user_ids=None):
+    """Эталонные суммы из корзин: {(user_id, ingredient_id): amount}."""
+
+    return {
+        (user_id, ingredient_id): total
+        for user_id, ingredient_id, total
+        in totals_queryset(user_ids).iterator()
+    }
+
+
+def stored_totals(user_ids=None):
+    """Текущее содержимое таблицы: {(user_id, ingredient_id): amount}."""
+
+    items = ShoppingListItem.objects.all()
+    if user_ids is not None:
+        items = items.filter(user_id__in=user_ids)
+    return {
+        (user_id, ingredient_id): amount
+        for user_id, ingredient_id, amount in items.values_list(
+            'user_id', 'ingredient_id', 'amount'
+        ).iterator()
+    }
+
+
+def find_mismatches(user_ids=None):
+    """Расхождения таблицы с корзинами.
+
+    Возвращает {user_id: [(ingredient_id, ожидается, хранится), ...]},
+    отсутствующая строка считается нулем.
+    """
+
+    expected = expected_totals(user_ids)
+    stored = stored_totals(user_ids)
+    mismatches = defaultdict(list)
+    for user_id, ingredient_id in sorted(expected.keys() | stored.keys()):
+        key = (user_id, ingredient_id)
+        if expected.get(key, 0) != stored.get(key, 0):
+            mismatches[user_id].append(
+                (ingredient_id, expected.get(key, 0), stored.get(key, 0))
+            )
+    return dict(mismatches)
+
+
+@transaction.atomic
+def rebuild(user_ids=None):
+    """Пересобирает списки покупок из корзин с нуля.
+
+    Агрегат вставляется одним INSERT ... SELECT, без загрузки
+    строк в Python.
+    """
+
+    items = ShoppingListItem.objects.all()
+    if user_ids is not None:
+        items = items.filter(user_id__in=user_ids)
+    items.delete()
+    queryset = totals_queryset(user_ids).order_by()
+    sql, params = queryset.query.sql_with_params()
+    connection = connections[queryset.db]
+    quote_name = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {quote_name(ShoppingListItem._meta.db_table)} '
+            f'(user_id, ingredient_id, amount) {sql}',
+            params,
+        )
+        return cursor.rowcount
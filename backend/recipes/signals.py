@@ -0,0 +1,86 @@
+from django.db import transaction
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+    pre_delete,
+)
+from django.dispatch import receiver
+
+from ingridients.models import Ingredient
+from recipes import shopping_list
+from recipes.models import IngredientInRecipe, Recipe, ShoppingCart
+from recipes.search import update_search_vectors
+from tags.models import Tag
+
+
+def update_search_vectors_on_commit(recipe_ids):
+    """Пересчитывает поисковый индекс после фиксации транзакции.
+
+    К этому моменту теги и ингредиенты рецепта, записанные
+    в той же транзакции через bulk_create, уже на месте.
+    """
+
+    transaction.on_commit(lambda: update_search_vectors(recipe_ids))
+
+
+@receiver(post_save, sender=Recipe)
+def index_recipe(sender, instance, **kwargs):
+    update_search_vectors_on_commit([instance.pk])
+
+
+@receiver(post_save, sender=IngredientInRecipe)
+@receiver(post_delete, sender=IngredientInRecipe)
+def index_recipe_ingredients(sender, instance, **kwargs):
+    update_search_vectors_on_commit([instance.recipe_id])
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def index_recipe_tags(sender, instance, action, reverse, pk_set, **kwargs):
+    if not action.startswith('post_'):
+        return
+    if not reverse:
+        update_search_vectors_on_commit([instance.pk])
+    elif pk_set:
+        update_search_vectors_on_commit(list(pk_set))
+
+
+@receiver(post_save, sender=Tag)
+def index_tag_recipes(sender, instance, created, **kwargs):
+    if not created:
+        update_search_vectors_on_commit(
+            list(instance.recipes.values_list('pk', flat=True))
+        )
+
+
+@receiver(post_save, sender=Ingredient)
+def index_ingredient_recipes(sender, instance, created, **kwargs):
+    if not created:
+        update_search_vectors_on_commit(list(
+            IngredientInRecipe.objects.filter(
+                ingredient=instance
+            ).values_list('recipe_id', flat=True)
+        ))
+
+
+@receiver(post_save, sender=ShoppingCart)
+def add_to_shopping_list(sender, instance, created, **kwargs):
+    """Прибавляет рецепт в транзакции, создающей запись корзины.
+
+    Вызывающий код (ShoppingCartSerializer.create) открывает ее сам,
+    чтобы при ошибке корзина и список покупок откатились вместе.
+    """
+
+    if created:
+        shopping_list.add_recipe(instance.user_id, instance.recipe_id)
+
+
+@receiver(pre_delete, sender=ShoppingCart)
+def remove_from_shopping_list(sender, instance, **kwargs):
+    """Вычитает рецепт до удаления.
+
+    При каскадном удалении рецепта его ингредиенты к этому моменту
+    еще на месте.
+    """
+
+    shopping_list.remove_recipe(instance.user_id, instance.recipe_id)
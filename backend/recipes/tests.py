@@ -0,0 +1,328 @@
+import io
+import json
+import os
+import shutil
+import tempfile
+from unittest import mock, skipUnless
+
+from django.contrib.postgres.search import SearchQuery
+from django.core.management import call_command
+from django.db import DataError, connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TestCase, TransactionTestCase, override_settings
+
+from rest_framework.authtoken.models import Token
+
+from api.cache import RECIPE_COUNT_NAMESPACE, get_version
+from api.query_budgets import make_client
+from ingridients.models import Ingredient
+from recipes import shopping_list
+from recipes.management.commands import import_recipes
+from recipes.models import (
+    IngredientInRecipe,
+    Recipe,
+    ShoppingCart,
+    ShoppingListItem,
+)
+from recipes.search import SEARCH_CONFIG
+from tags.models import Tag
+from users.models import User
+
+
+class MigrationTestCase(TransactionTestCase):
+    """Прогон миграций recipes между migrate_from и migrate_to."""
+
+    migrate_from = None
+    migrate_to = None
+
+    def migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        # Остальные приложения остаются на последних миграциях.
+        targets = [
+            node for node in executor.loader.graph.leaf_nodes()
+            if node[0] != 'recipes'
+        ] + targets
+        executor.migrate(targets)
+        executor.loader.build_graph()
+        return executor.loader.project_state(targets).apps
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(executor.loader.graph.leaf_nodes())
+
+
+class BackfillShortLinksMigrationTests(MigrationTestCase):
+    """0008 выдает ссылки рецептам без них и разводит повторы."""
+
+    migrate_from = [('recipes', '0007_recipe_image_variants')]
+    migrate_to = [('recipes', '0009_unique_short_link')]
+
+    def test_backfill(self):
+        apps = self.migrate(self.migrate_from)
+        User = apps.get_model('users', 'User')
+        HistoricalRecipe = apps.get_model('recipes', 'Recipe')
+        author = User.objects.create(
+            username='author', email='author@example.com'
+        )
+        links = [None, '', 'same', 'same', 'unique']
+        pks = [
+            HistoricalRecipe.objects.create(
+                author=author, name=f'Рецепт {number}', text='Описание',
+                cooking_time=10, image='recipes/test.png',
+                short_link=short_link,
+            ).pk
+            for number, short_link in enumerate(links)
+        ]
+
+        self.migrate(self.migrate_to)
+
+        migrated = dict(
+            Recipe.objects.filter(pk__in=pks).values_list('pk', 'short_link')
+        )
+        self.assertEqual(len(set(migrated.values())), len(pks))
+        self.assertTrue(all(migrated.values()))
+        self.assertEqual(migrated[pks[2]], 'same')
+        self.assertNotEqual(migrated[pks[3]], 'same')
+        self.assertEqual(migrated[pks[4]], 'unique')
+
+
+@skipUnless(connection.vendor == 'postgresql', 'search_vector — PostgreSQL')
+class FillSearchVectorsMigrationTests(MigrationTestCase):
+    """0005 заполняет search_vector по историческим моделям."""
+
+    migrate_from = [('recipes', '0004_hot_path_indexes')]
+    migrate_to = [('recipes', '0005_recipe_search_vector')]
+
+    def test_fill(self):
+        apps = self.migrate(self.migrate_from)
+        author = apps.get_model('users', 'User').objects.create(
+            username='author', email='author@example.com'
+        )
+        recipe = apps.get_model('recipes', 'Recipe').objects.create(
+            author=author, name='Блины', text='Описание', cooking_time=10,
+            image='recipes/test.png', short_link='pancakes',
+        )
+        recipe.tags.add(
+            apps.get_model('tags', 'Tag').objects.create(name='Завтрак')
+        )
+        apps.get_model('recipes', 'IngredientInRecipe').objects.create(
+            recipe=recipe, amount=100,
+            ingredient=apps.get_model('ingridients', 'Ingredient')
+            .objects.create(name='мука', measurement_unit='г'),
+        )
+
+        self.migrate(self.migrate_to)
+
+        for term in ('блинами', 'завтраку', 'муки', 'описание'):
+            with self.subTest(term=term):
+                self.assertTrue(Recipe.objects.filter(
+                    search_vector=SearchQuery(term, config=SEARCH_CONFIG)
+                ).values('pk').exists())
+
+
+class ShoppingListTests(TestCase):
+    """Таблица списка покупок совпадает с корзинами после изменений."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(
+            username='author', email='author@example.com'
+        )
+        cls.buyer = User.objects.create(
+            username='buyer', email='buyer@example.com'
+        )
+        cls.tag = Tag.objects.create(name='Завтрак')
+        cls.flour, cls.milk, cls.eggs = Ingredient.objects.bulk_create([
+            Ingredient(name=name, measurement_unit='г')
+            for name in ('мука', 'молоко', 'яйца')
+        ])
+        cls.recipes = []
+        for number in range(2):
+            recipe = Recipe.objects.create(
+                author=cls.author, name=f'Блины {number}', text='Описание',
+                cooking_time=10, image='recipes/test.png',
+            )
+            recipe.tags.set([cls.tag])
+            IngredientInRecipe.objects.bulk_create([
+                IngredientInRecipe(
+                    recipe=recipe, ingredient=cls.flour, amount=100
+                ),
+                IngredientInRecipe(
+                    recipe=recipe, ingredient=cls.milk, amount=200
+                ),
+            ])
+            cls.recipes.append(recipe)
+
+    def setUp(self):
+        self.clients = {
+            user: make_client(Token.objects.create(user=user).key)
+            for user in (self.author, self.buyer)
+        }
+
+    def add_to_cart(self, recipe):
+        response = self.clients[self.buyer].post(
+            f'/api/recipes/{recipe.pk}/shopping_cart/'
+        )
+        self.assertEqual(response.status_code, 201)
+
+    def assert_consistent(self, expected):
+        self.assertEqual(shopping_list.find_mismatches(), {})
+        self.assertEqual(shopping_list.stored_totals(), {
+            (self.buyer.pk, ingredient.pk): amount
+            for ingredient, amount in expected.items()
+        })
+
+    def test_add(self):
+        for recipe in self.recipes:
+            self.add_to_cart(recipe)
+        self.assert_consistent({self.flour: 200, self.milk: 400})
+
+    def test_remove(self):
+        for recipe in self.recipes:
+            self.add_to_cart(recipe)
+        response = self.clients[self.buyer].delete(
+            f'/api/recipes/{self.recipes[0].pk}/shopping_cart/'
+        )
+        self.assertEqual(response.status_code, 204)
+        self.assert_consistent({self.flour: 100, self.milk: 200})
+
+    def test_edit(self):
+        for recipe in self.recipes:
+            self.add_to_cart(recipe)
+        response = self.clients[self.author].patch(
+            f'/api/recipes/{self.recipes[0].pk}/', {
+                'tags': [self.tag.pk],
+                'ingredients': [
+                    {'id': self.flour.pk, 'amount': 150},
+                    {'id': self.eggs.pk, 'amount': 2},
+                ],
+            }, content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assert_consistent(
+            {self.flour: 250, self.milk: 200, self.eggs: 2}
+        )
+
+    def test_delete_recipe(self):
+        for recipe in self.recipes:
+            self.add_to_cart(recipe)
+        self.recipes[1].delete()
+        self.assert_consistent({self.flour: 100, self.milk: 200})
+
+    def test_rebuild(self):
+        for recipe in self.recipes:
+            self.add_to_cart(recipe)
+        ShoppingListItem.objects.filter(ingredient=self.flour).delete()
+        ShoppingListItem.objects.filter(ingredient=self.milk).update(
+            amount=1
+        )
+        self.assertEqual(
+            shopping_list.find_mismatches(),
+            {self.buyer.pk: [
+                (self.flour.pk, 200, 0), (self.milk.pk, 400, 1),
+            ]},
+        )
+        shopping_list.rebuild(user_ids=[self.buyer.pk])
+        self.assert_consistent({self.flour: 200, self.milk: 400})
+
+    def test_drift_is_logged(self):
+        self.add_to_cart(self.recipes[0])
+        ShoppingListItem.objects.filter(ingredient=self.flour).update(
+            amount=10
+        )
+        with self.assertLogs('recipes.shopping_list', 'WARNING') as logs:
+            ShoppingCart.objects.get(
+                user=self.buyer, recipe=self.recipes[0]
+            ).delete()
+        self.assertEqual(len(logs.output), 1)
+        self.assert_consistent({})
+
+
+class ImportRecipesTests(TestCase):
+    """import_recipes отклоняет записи, которые не примет база."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.mkdtemp(prefix='foodgram-tests-')
+        cls.addClassCleanup(shutil.rmtree, cls.directory, ignore_errors=True)
+        media = override_settings(
+            MEDIA_ROOT=os.path.join(cls.directory, 'media')
+        )
+        media.enable()
+        cls.addClassCleanup(media.disable)
+        with open(os.path.join(cls.directory, 'image.png'), 'wb') as image:
+            image.write(b'image')
+        super().setUpClass()
+
+    @classmethod
+    def setUpTestData(cls):
+        User.objects.create(username='author', email='author@example.com')
+        Tag.objects.create(name='Завтрак', slug='breakfast')
+        Ingredient.objects.create(name='мука', measurement_unit='г')
+
+    def record(self, **fields):
+        return {
+            'name': 'Блины', 'text': 'Описание', 'cooking_time': 10,
+            'author': 'author@example.com', 'tags': ['breakfast'],
+            'ingredients': [
+                {'name': 'мука', 'measurement_unit': 'г', 'amount': 100},
+            ],
+            'image': 'image.png', 'short_link': 'abc-_XYZ09', **fields,
+        }
+
+    def run_import(self, records, **options):
+        with open(
+            os.path.join(self.directory, 'recipes.ndjson'), 'w',
+            encoding='utf-8',
+        ) as stream:
+            for record in records:
+                stream.write(json.dumps(record) + '\n')
+        stderr = io.StringIO()
+        call_command(
+            'import_recipes', self.directory, stdout=io.StringIO(),
+            stderr=stderr, **options,
+        )
+        return stderr.getvalue()
+
+    def test_imports_valid_record(self):
+        self.run_import([self.record()])
+        recipe = Recipe.objects.get()
+        self.assertEqual(recipe.short_link, 'abc-_XYZ09')
+        self.assertEqual(recipe.recipe_ingredients.get().amount, 100)
+
+    def test_rejects_values_outside_columns(self):
+        amount = import_recipes.MAX_SMALL_INTEGER + 1
+        records = {
+            'short_link': self.record(short_link='a' * 11),
+            'alphabet': self.record(short_link='abc/def'),
+            'cooking_time': self.record(cooking_time=amount),
+            'amount': self.record(ingredients=[
+                {'name': 'мука', 'measurement_unit': 'г', 'amount': amount},
+            ]),
+        }
+        for case, record in records.items():
+            with self.subTest(case=case):
+                errors = self.run_import([record])
+                self.assertIn('Строка 1:', errors)
+                self.assertFalse(Recipe.objects.exists())
+
+    def test_database_error_rejects_only_its_batch(self):
+        import_batch = import_recipes.Command.import_batch
+        failed = []
+
+        def fail_first_batch(command, items):
+            if not failed:
+                failed.append(items)
+                raise DataError('value too long')
+            return import_batch(command, items)
+
+        version = get_version(RECIPE_COUNT_NAMESPACE)
+        with mock.patch.object(
+            import_recipes.Command, 'import_batch', fail_first_batch
+        ):
+            errors = self.run_import(
+                [self.record(short_link=None)] * 3, batch_size=2
+            )
+        self.assertIn('Пачка со строки 1 не загружена', errors)
+        self.assertEqual(Recipe.objects.count(), 1)
+        self.assertNotEqual(get_version(RECIPE_COUNT_NAMESPACE), version)
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-17 05:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='subscriptions',
+            index=models.Index(fields=['author', 'user'], name='subscription_author_user_idx'),
+        ),
+    ]
@@ -26,6 +26,12 @@ class User(AbstractUser):
         blank=True,
         verbose_name='Аватар'
     )
+    avatar_variants = models.JSONField(
+        default=dict,
+        blank=True,
+        editable=False,
+        verbose_name='Варианты аватара'
+    )
 
     USERNAME_FIELD = "email"
     REQUIRED_FIELDS = ["username", "first_name", "last_name"]
@@ -59,6 +65,12 @@ class Subscriptions(models.Model):
                 name='no_self_subscription'
             )
         ]
+        indexes = [
+            models.Index(
+                fields=['author', 'user'],
+                name='subscription_author_user_idx'
+            ),
+        ]
 
     def __str__(self):
         return f'{self.user} подписан на {self.author}'